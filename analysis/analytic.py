@@ -0,0 +1,107 @@
+import numpy as np
+
+# Closed-form M/G/1 results for the simulated systems. Every function takes scalars or
+# NumPy arrays of parameters (broadcast against each other) and returns a dict of arrays
+# keyed by the names of the simulated run metrics, so a whole parameter grid is evaluated
+# at once. Unstable points (total load of 1 or more) are NaN. mu is 1/E[S]; the optional
+# Ssquared arguments are E[S^2] of each class (e.g. util.distributions' second_moment)
+# and default to exponential sizes.
+
+def stable(rho, values):
+	return {name: np.where(rho < 1, value, np.nan) for name, value in values.items()}
+
+def load(lambda1, lambda2, mu1, mu2):
+	lambda1, lambda2, mu1, mu2 = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (lambda1, lambda2, mu1, mu2)))
+	rho1 = lambda1/mu1
+	rho2 = lambda2/mu2
+	return lambda1, lambda2, mu1, mu2, rho1, rho2, rho1 + rho2
+
+def second_moment(mu, Ssquared=None):
+	if Ssquared is None:
+		return 2/(mu**2)
+	return np.asarray(Ssquared, dtype=float)
+
+def excess_size(lambda1, lambda2, mu1, mu2, Ssquared1=None, Ssquared2=None):
+	# Se = E[S^2]/(2E[S]) of the mixed size distribution
+	lambda_ = lambda1 + lambda2
+	Ssquared = lambda1/lambda_ * second_moment(mu1, Ssquared1) + lambda2/lambda_ * second_moment(mu2, Ssquared2)
+	S = lambda1/lambda_ * 1/mu1 + lambda2/lambda_ * 1/mu2
+	return Ssquared/(2*S)
+
+def fcfs(lambda_, mu, Ssquared=None):
+	lambda_, mu = np.broadcast_arrays(np.asarray(lambda_, dtype=float), np.asarray(mu, dtype=float))
+	rho = lambda_/mu
+	with np.errstate(divide='ignore', invalid='ignore'):
+		if Ssquared is None:
+			return stable(rho, {'T': 1/(mu - lambda_), 'N': rho/(1 - rho)})
+		# Pollaczek-Khinchine
+		T = lambda_*second_moment(mu, Ssquared)/(2*(1 - rho)) + 1/mu
+		return stable(rho, {'T': T, 'N': lambda_*T})
+
+def np_basic(lambda1, lambda2, mu1, mu2, Ssquared1=None, Ssquared2=None):
+	# Strict non-preemptive priority to class 1
+	lambda1, lambda2, mu1, mu2, rho1, rho2, rho = load(lambda1, lambda2, mu1, mu2)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		Se = excess_size(lambda1, lambda2, mu1, mu2, Ssquared1, Ssquared2)
+		TQ1 = rho*Se/(1 - rho1)
+		TQ2 = rho*Se/((1 - rho1)*(1 - rho))
+		T1 = TQ1 + 1/mu1
+		T2 = TQ2 + 1/mu2
+		# Time from the end of one run of class 2 (1) jobs to the next class 1 (2) job
+		job1MixingTime = (1 - rho1)*(1/lambda1 + rho2/mu2)
+		job2MixingTime = (1 - rho2)*(1/lambda2 + rho1/mu1)
+		return stable(rho, {'T1': T1, 'T2': T2, 'TQ1': TQ1, 'TQ2': TQ2, 'S1': 1/mu1, 'S2': 1/mu2,
+							'N1': lambda1*T1, 'N2': lambda2*T2, 'job1MixingTime': job1MixingTime, 'job2MixingTime': job2MixingTime})
+
+def switching(lambda1, lambda2, mu1, mu2, stay_prob, Ssquared1=None, Ssquared2=None):
+	# Arrival switching: a job keeps its class as its final priority class (A = 1, B = 2)
+	# with probability stay_prob and swaps it otherwise
+	lambda1, lambda2, mu1, mu2, rho1, rho2, rho = load(lambda1, lambda2, mu1, mu2)
+	stay_prob = np.asarray(stay_prob, dtype=float)
+	lambda_ = lambda1 + lambda2
+	with np.errstate(divide='ignore', invalid='ignore'):
+		Se = excess_size(lambda1, lambda2, mu1, mu2, Ssquared1, Ssquared2)
+		lambdaA = lambda1*stay_prob + lambda2*(1 - stay_prob)
+		lambdaB = lambda1*(1 - stay_prob) + lambda2*stay_prob
+		SA = ((lambda1*stay_prob)/lambdaA)*1/mu1 + ((lambda2*(1 - stay_prob))/lambdaA)*1/mu2
+		SB = ((lambda1*(1 - stay_prob))/lambdaB)*1/mu1 + ((lambda2*stay_prob)/lambdaB)*1/mu2
+		rhoA = stay_prob*rho1 + (1 - stay_prob)*rho2
+		rhoB = stay_prob*rho2 + (1 - stay_prob)*rho1
+
+		TAQ = rho*Se/(1 - rhoA)
+		TBQ = rho*Se/((1 - rho)*(1 - rhoA))
+		TA = TAQ + SA
+		TB = TBQ + SB
+		T1 = stay_prob*TAQ + (1 - stay_prob)*TBQ + 1/mu1
+		T2 = stay_prob*TBQ + (1 - stay_prob)*TAQ + 1/mu2
+
+		# Expected number of jobs served from one class 1 (2) job to the next
+		prob_job_1 = rhoA*(lambda1*stay_prob)/lambdaA + (1 - rhoA)*rhoB*(lambda1*(1 - stay_prob)/lambdaB) + (1 - rhoA)*(1 - rhoB)*lambda1/lambda_
+		prob_job_2 = rhoA*(lambda2*(1 - stay_prob)/lambdaA) + (1 - rhoA)*rhoB*(lambda2*stay_prob/lambdaB) + (1 - rhoA)*(1 - rhoB)*(lambda2/lambda_)
+		return stable(rho, {'T1': T1, 'T2': T2, 'TA': TA, 'TB': TB, 'SA': SA, 'SB': SB,
+							'N1': lambda1*T1, 'N2': lambda2*T2, 'NA': lambdaA*TA, 'NB': lambdaB*TB,
+							'job1MixingTime': 1/prob_job_1, 'job2MixingTime': 1/prob_job_2})
+
+def busy_period(lambda1, lambda2, mu1, mu2, class_1_prio_prob, Ssquared1=None, Ssquared2=None):
+	# Priority order re-drawn at the start of every busy period: class 1 first with
+	# probability class_1_prio_prob
+	lambda1, lambda2, mu1, mu2, rho1, rho2, rho = load(lambda1, lambda2, mu1, mu2)
+	p = np.asarray(class_1_prio_prob, dtype=float)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		Se = excess_size(lambda1, lambda2, mu1, mu2, Ssquared1, Ssquared2)
+		TQ1 = p*(rho*Se/(1 - rho1)) + (1 - p)*(rho*Se/((1 - rho)*(1 - rho2)))
+		TQ2 = p*(rho*Se/((1 - rho1)*(1 - rho))) + (1 - p)*(rho*Se/(1 - rho2))
+		T1 = TQ1 + 1/mu1
+		T2 = TQ2 + 1/mu2
+		return stable(rho, {'T1': T1, 'T2': T2, 'TQ1': TQ1, 'TQ2': TQ2, 'N1': lambda1*T1, 'N2': lambda2*T2, 'S1': 1/mu1, 'S2': 1/mu2})
+
+def scalars(values):
+	# Results at a single operating point as plain floats
+	return {name: float(value) for name, value in values.items()}
+
+# Sweep system name -> closed form over arrays of grid columns (see util/sweep.py)
+FORMULAS = {
+	'np_basic': lambda g: np_basic(g['lambda1'], g['lambda2'], g['mu1'], g['mu2']),
+	'switching': lambda g: switching(g['lambda1'], g['lambda2'], g['mu1'], g['mu2'], g['stay_prob']),
+	'bp': lambda g: busy_period(g['lambda1'], g['lambda2'], g['mu1'], g['mu2'], g['stay_prob']),
+}
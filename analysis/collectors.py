@@ -0,0 +1,163 @@
+import analysis.events as events
+import analysis.statistic as statistic
+
+# Statistics collectors. A system calls arrival(...) and depart(...) on each of its
+# collectors with plain values, in the same order as the constructor arguments of the
+# matching event classes in analysis/events.py, so no event objects are built unless a
+# TraceCollector is attached. stat_type is the accumulator used for every statistic,
+# e.g. statistic.BatchMeans for a single long run.
+#
+# The numbers in system are also integrated over time (statistic.TimeAverage): an arrival
+# reports the counts it found and a departure the counts it left behind, so every event
+# gives the exact levels since the previous one. mean_jobs() is this time average, or the
+# average seen by arrivals when stat_type needs one sample per event (batch means, MSER).
+# max_level keeps bounded histograms of the levels as well, e.g.
+# system.add_collector(PriorityCollector(max_level=50)).
+
+class FCFSCollector():
+	def __init__(self, stat_type=statistic.RunningStat, max_level=None):
+		self.response_times = stat_type()
+		self.num_jobs_seen = stat_type()
+		self.time_averaged = stat_type is statistic.RunningStat
+		self.num_jobs_time = statistic.TimeAverage(max_level)
+		self.num_jobs = 0
+
+	def arrival(self, time):
+		self.num_jobs_time.advance(time, self.num_jobs)
+		self.num_jobs += 1
+
+	def depart(self, curr_time, response_time, num_jobs_seen, job):
+		self.response_times.add(response_time)
+		self.num_jobs_seen.add(num_jobs_seen)
+		self.num_jobs_time.advance(curr_time, num_jobs_seen + 1)
+		self.num_jobs = num_jobs_seen
+
+	def mean_jobs(self):
+		return self.num_jobs_time.mean if self.time_averaged else self.num_jobs_seen.mean
+
+class PriorityCollector():
+	def __init__(self, stat_type=statistic.RunningStat, max_level=None):
+		self.response1_times = stat_type()
+		self.response2_times = stat_type()
+		self.waiting1_times = stat_type()
+		self.waiting2_times = stat_type()
+		self.job1_sizes = stat_type()
+		self.job2_sizes = stat_type()
+
+		self.num_jobs1_seen = stat_type()
+		self.num_jobs2_seen = stat_type()
+		self.time_averaged = stat_type is statistic.RunningStat
+		self.num_jobs1_time = statistic.TimeAverage(max_level)
+		self.num_jobs2_time = statistic.TimeAverage(max_level)
+
+		# Sampled inter-arrival times, a control variate with known mean 1/lambda; the first
+		# arrival event only starts the clock
+		self.interarrival_times = stat_type()
+		self.last_arrival_time = None
+
+	def arrival(self, time, num1_jobs, num2_jobs):
+		self.num_jobs1_seen.add(num1_jobs)
+		self.num_jobs2_seen.add(num2_jobs)
+		self.num_jobs1_time.advance(time, num1_jobs)
+		self.num_jobs2_time.advance(time, num2_jobs)
+		if self.last_arrival_time is not None:
+			self.interarrival_times.add(time - self.last_arrival_time)
+		self.last_arrival_time = time
+
+	def depart(self, curr_time, response_time, num1_jobs_seen, num2_jobs_seen, waiting_time, job):
+		self.num_jobs1_time.advance(curr_time, num1_jobs_seen + (job.priority == 1))
+		self.num_jobs2_time.advance(curr_time, num2_jobs_seen + (job.priority == 2))
+		if job.priority == 1:
+			self.response1_times.add(response_time)
+			self.waiting1_times.add(waiting_time)
+			self.job1_sizes.add(job.size)
+		else:
+			self.response2_times.add(response_time)
+			self.waiting2_times.add(waiting_time)
+			self.job2_sizes.add(job.size)
+
+	def mean_jobs(self):
+		# (N1, N2)
+		if self.time_averaged:
+			return self.num_jobs1_time.mean, self.num_jobs2_time.mean
+		return self.num_jobs1_seen.mean, self.num_jobs2_seen.mean
+
+class SwitchingCollector():
+	def __init__(self, stat_type=statistic.RunningStat, max_level=None):
+		# By class and by final class
+		self.response1_times = stat_type()
+		self.response2_times = stat_type()
+		self.responseA_times = stat_type()
+		self.responseB_times = stat_type()
+
+		self.jobA_sizes = stat_type()
+		self.jobB_sizes = stat_type()
+
+		self.num_jobs1_seen = stat_type()
+		self.num_jobs2_seen = stat_type()
+		self.num_jobsA_seen = stat_type()
+		self.num_jobsB_seen = stat_type()
+		self.time_averaged = stat_type is statistic.RunningStat
+		self.num_jobs1_time = statistic.TimeAverage(max_level)
+		self.num_jobs2_time = statistic.TimeAverage(max_level)
+		self.num_jobsA_time = statistic.TimeAverage(max_level)
+		self.num_jobsB_time = statistic.TimeAverage(max_level)
+
+		self.interarrival_times = stat_type()
+		self.last_arrival_time = None
+
+	def arrival(self, time, num1_jobs, num2_jobs, numA_jobs, numB_jobs):
+		self.num_jobs1_seen.add(num1_jobs)
+		self.num_jobs2_seen.add(num2_jobs)
+		self.num_jobsA_seen.add(numA_jobs)
+		self.num_jobsB_seen.add(numB_jobs)
+		self.num_jobs1_time.advance(time, num1_jobs)
+		self.num_jobs2_time.advance(time, num2_jobs)
+		self.num_jobsA_time.advance(time, numA_jobs)
+		self.num_jobsB_time.advance(time, numB_jobs)
+		if self.last_arrival_time is not None:
+			self.interarrival_times.add(time - self.last_arrival_time)
+		self.last_arrival_time = time
+
+	def depart(self, curr_time, response_time, num1_jobs_seen, num2_jobs_seen, numA_jobs_seen, numB_jobs_seen, waiting_time, job):
+		self.num_jobs1_time.advance(curr_time, num1_jobs_seen + (job.priority == 1))
+		self.num_jobs2_time.advance(curr_time, num2_jobs_seen + (job.priority == 2))
+		self.num_jobsA_time.advance(curr_time, numA_jobs_seen + (job.final_priority == 1))
+		self.num_jobsB_time.advance(curr_time, numB_jobs_seen + (job.final_priority == 2))
+		if job.priority == 1:
+			self.response1_times.add(response_time)
+		else:
+			self.response2_times.add(response_time)
+		if job.final_priority == 1:
+			self.responseA_times.add(response_time)
+			self.jobA_sizes.add(job.size)
+		else:
+			self.responseB_times.add(response_time)
+			self.jobB_sizes.add(job.size)
+
+	def mean_jobs(self):
+		# (N1, N2, NA, NB)
+		if self.time_averaged:
+			return self.num_jobs1_time.mean, self.num_jobs2_time.mean, self.num_jobsA_time.mean, self.num_jobsB_time.mean
+		return self.num_jobs1_seen.mean, self.num_jobs2_seen.mean, self.num_jobsA_seen.mean, self.num_jobsB_seen.mean
+
+def truncations(collector):
+	# Statistic name -> observations dropped as warm-up by MSER, or None when whole runs are averaged
+	truncated = {name: stat.truncation for name, stat in vars(collector).items() if isinstance(stat, statistic.MSERStat)}
+	return truncated or None
+
+# Records every event of a run as an object from analysis/events.py, for debugging and
+# inspecting individual runs (e.g. system.add_collector(TraceCollector(events.PriorityArrivalEvent,
+# events.PriorityDepartEvent)) before simulate_run()). Traces stay in the process that
+# ran the replication, so attach one only to serial runs.
+class TraceCollector():
+	def __init__(self, arrival_event=events.PriorityArrivalEvent, depart_event=events.PriorityDepartEvent):
+		self.arrival_event = arrival_event
+		self.depart_event = depart_event
+		self.events = []
+
+	def arrival(self, *args):
+		self.events.append(self.arrival_event(*args))
+
+	def depart(self, *args):
+		self.events.append(self.depart_event(*args))
@@ -0,0 +1,75 @@
+import math
+from statistics import NormalDist
+import numpy as np
+
+def t_quantile(p, dof):
+	# p-quantile of Student's t with dof degrees of freedom. Exact for 1 and 2 degrees of
+	# freedom, otherwise the Cornish-Fisher expansion around the normal quantile
+	# (Abramowitz & Stegun 26.7.5), within 0.005 of the exact value for dof >= 3
+	if dof == 1:
+		return math.tan(math.pi*(p - 0.5))
+	if dof == 2:
+		return (2*p - 1)/math.sqrt(2*p*(1 - p))
+	z = NormalDist().inv_cdf(p)
+	g1 = (z**3 + z)/4
+	g2 = (5*z**5 + 16*z**3 + 3*z)/96
+	g3 = (3*z**7 + 19*z**5 + 17*z**3 - 15*z)/384
+	g4 = (79*z**9 + 776*z**7 + 1482*z**5 - 1920*z**3 - 945*z)/92160
+	return z + g1/dof + g2/dof**2 + g3/dof**3 + g4/dof**4
+
+def mean_half_width(values, confidence=0.95):
+	# Sample mean and the half-width of its t confidence interval
+	n = len(values)
+	mean = sum(values)/n
+	if n < 2:
+		return mean, float('inf')
+	variance = sum((x - mean)**2 for x in values)/(n - 1)
+	return mean, t_quantile((1 + confidence)/2, n - 1)*math.sqrt(variance/n)
+
+def relative_half_width(mean, half_width):
+	if half_width == 0:
+		return 0.0
+	if mean == 0:
+		return float('inf')
+	return half_width/abs(mean)
+
+# Precision achieved by an ensemble: metric -> (mean, CI half-width, half-width relative to the mean)
+class PrecisionReport():
+	def __init__(self, num_runs, elapsed, confidence, targets, metrics):
+		self.num_runs = num_runs
+		self.elapsed = elapsed
+		self.confidence = confidence
+		self.targets = targets
+		self.metrics = metrics
+		# Whether every precision target was reached (False when there were none)
+		self.met = len(targets) > 0 and all(metrics[name][2] <= target for name, target in targets.items())
+
+	def __repr__(self):
+		status = "no precision targets" if len(self.targets) == 0 else "targets met" if self.met else "targets not met"
+		lines = ["{} runs in {:.1f}s, {:.0f}% CIs, {}".format(self.num_runs, self.elapsed, 100*self.confidence, status)]
+		for name, (mean, half_width, relative) in self.metrics.items():
+			target = self.targets.get(name)
+			lines.append("  {}: {:.6f} +/- {:.6f} ({:.2%}{})".format(name, mean, half_width, relative,
+						 "" if target is None else ", target {:.2%}".format(target)))
+		return "\n".join(lines)
+
+def paired_difference(a, b, confidence=0.95):
+	# Mean of a[i] - b[i] and its CI half-width. With common random numbers run i of both
+	# systems saw the same arrivals, so the differences vary far less than a and b do
+	return mean_half_width([x - y for x, y in zip(a, b)], confidence)
+
+def control_variate(values, controls, control_means, confidence=0.95):
+	# Mean of values with control variates (Lavenberg & Welch): values[i] is regressed on
+	# each controls[j][i] minus its known mean control_means[j], and the intercept is the
+	# controlled estimate. Returns (estimate, CI half-width); the half-width is infinite
+	# with no more runs than regression coefficients
+	y = np.asarray(values, dtype=float)
+	n = len(y)
+	design = np.column_stack([np.ones(n)] + [np.asarray(c, dtype=float) - m for c, m in zip(controls, control_means)])
+	coefficients = np.linalg.lstsq(design, y, rcond=None)[0]
+	dof = n - design.shape[1]
+	if dof < 1:
+		return float(coefficients[0]), float('inf')
+	residuals = y - design @ coefficients
+	variance = (residuals @ residuals)/dof*np.linalg.pinv(design.T @ design)[0, 0]
+	return float(coefficients[0]), t_quantile((1 + confidence)/2, dof)*math.sqrt(max(variance, 0.0))
@@ -1,5 +1,192 @@
+import math
+from statistics import NormalDist
+import numpy as np
+import analysis.confidence as confidence
+
+# Constant-memory running mean/variance (Welford); two accumulators over disjoint
+# samples merge exactly (Chan et al.), so partial results can be combined
+class RunningStat():
+	def __init__(self):
+		self.count = 0
+		self.mean = 0.0
+		self.m2 = 0.0
+
+	def add(self, x):
+		self.count += 1
+		delta = x - self.mean
+		self.mean += delta/self.count
+		self.m2 += delta*(x - self.mean)
+
+	def merge(self, other):
+		if other.count == 0:
+			return self
+		count = self.count + other.count
+		delta = other.mean - self.mean
+		self.mean += delta*other.count/count
+		self.m2 += other.m2 + delta*delta*self.count*other.count/count
+		self.count = count
+		return self
+
+	def variance(self):
+		# Population variance, like np.var
+		return 0.0 if self.count == 0 else self.m2/self.count
+
+	def __repr__(self):
+		return "RunningStat(count={}, mean={:.6f}, variance={:.6f})".format(self.count, self.mean, self.variance())
+
+# RunningStat over one long sample path that also keeps the sums of consecutive
+# batches of observations. When max_batches batches are complete, adjacent pairs are
+# merged and the batch size doubles, so memory stays constant however long the run.
+class BatchMeans(RunningStat):
+	def __init__(self, max_batches=128):
+		super().__init__()
+		self.max_batches = max_batches
+		self.batch_size = 1
+		self.batch_sums = []
+		self.partial_sum = 0.0
+		self.partial_count = 0
+
+	def add(self, x):
+		RunningStat.add(self, x)
+		self.partial_sum += x
+		self.partial_count += 1
+		if self.partial_count == self.batch_size:
+			self.batch_sums.append(self.partial_sum)
+			self.partial_sum = 0.0
+			self.partial_count = 0
+			if len(self.batch_sums) == self.max_batches:
+				self.batch_sums = [self.batch_sums[i] + self.batch_sums[i + 1] for i in range(0, self.max_batches, 2)]
+				self.batch_size *= 2
+
+	def interval(self, level=0.95, min_batches=10):
+		# (mean, CI half-width, batch size, number of batches)
+		means = [s/self.batch_size for s in self.batch_sums]
+		half_width, batch_size, num_batches = batch_means_interval(means, self.batch_size, level, min_batches)
+		return self.mean, half_width, batch_size, num_batches
+
+# Running mean of one run with the initial transient removed by MSER-5 (White, 1997):
+# observations are averaged in batches of 5, and the truncation point d minimizes the
+# squared deviations of the remaining batch means divided by their number squared,
+# searched over the first half of the run. mean is the mean after truncation and
+# truncation the number of observations discarded, both computed once per count.
+class MSERStat():
+	def __init__(self, batch=5):
+		self.batch = batch
+		self.count = 0
+		self.batch_means = []
+		self.partial_sum = 0.0
+		self.partial_count = 0
+		self.fitted_count = None
+		self.fitted = None
+
+	def add(self, x):
+		self.count += 1
+		self.partial_sum += x
+		self.partial_count += 1
+		if self.partial_count == self.batch:
+			self.batch_means.append(self.partial_sum/self.batch)
+			self.partial_sum = 0.0
+			self.partial_count = 0
+
+	def fit(self):
+		# (truncation in batches, mean after truncation)
+		if self.fitted_count != self.count:
+			y = np.array(self.batch_means)
+			k = len(y)
+			d = 0
+			if k >= 2:
+				remaining = k - np.arange(k)
+				tail_sums = np.cumsum(y[::-1])[::-1]
+				tail_squares = np.cumsum((y*y)[::-1])[::-1]
+				mser = (tail_squares - tail_sums*tail_sums/remaining)/(remaining*remaining)
+				d = int(np.argmin(mser[:k//2 + 1]))
+			total = float(y[d:].sum())*self.batch + self.partial_sum
+			count = (k - d)*self.batch + self.partial_count
+			self.fitted = (d, total/count if count > 0 else 0.0)
+			self.fitted_count = self.count
+		return self.fitted
+
+	@property
+	def mean(self):
+		return self.fit()[1]
+
+	@property
+	def truncation(self):
+		return self.fit()[0]*self.batch
+
+	def interval(self, level=0.95, min_batches=10):
+		# (mean, CI half-width, batch size, number of batches) over the truncated run,
+		# plus the truncation point
+		d, mean = self.fit()
+		half_width, batch_size, num_batches = batch_means_interval(self.batch_means[d:], self.batch, level, min_batches)
+		return mean, half_width, batch_size, num_batches, d*self.batch
+
+	def __repr__(self):
+		return "MSERStat(count={}, truncation={}, mean={:.6f})".format(self.count, self.truncation, self.mean)
+
+# Time average of a piecewise-constant level such as the number of jobs of a class in
+# the system: advance(time, level) adds the area level*(time - previous time), so the
+# mean is exact in O(1) memory. With max_level the time spent at each level
+# 0..max_level is also kept, plus one bucket for all higher levels.
+class TimeAverage():
+	def __init__(self, max_level=None):
+		self.area = 0.0
+		self.elapsed = 0.0
+		self.last_time = 0.0
+		self.max_level = max_level
+		self.time_at_level = None if max_level is None else np.zeros(max_level + 2)
+
+	def advance(self, time, level):
+		interval = time - self.last_time
+		self.area += level*interval
+		self.elapsed += interval
+		if self.time_at_level is not None:
+			self.time_at_level[min(level, self.max_level + 1)] += interval
+		self.last_time = time
+
+	@property
+	def mean(self):
+		return self.area/self.elapsed if self.elapsed > 0 else 0.0
+
+	def distribution(self):
+		# Fraction of time at each level 0..max_level, the last entry for all higher levels
+		return self.time_at_level/self.elapsed if self.elapsed > 0 else self.time_at_level
+
+	def __repr__(self):
+		return "TimeAverage(elapsed={:.6f}, mean={:.6f})".format(self.elapsed, self.mean)
+
+def batch_means_interval(means, batch_size, level=0.95, min_batches=10):
+	# CI half-width from consecutive batch means. Adjacent batches keep merging while their
+	# means are still significantly lag-1 autocorrelated and at least min_batches would
+	# remain, so the CI accounts for the correlation within the run.
+	# Returns (half-width, batch size, number of batches)
+	critical = NormalDist().inv_cdf((1 + level)/2)
+	while len(means) >= 2*min_batches and abs(lag1_autocorrelation(means)) > critical/math.sqrt(len(means)):
+		means = [(means[i] + means[i + 1])/2 for i in range(0, len(means) - 1, 2)]
+		batch_size *= 2
+	if len(means) < 2:
+		return float('inf'), batch_size, len(means)
+	_, half_width = confidence.mean_half_width(means, level)
+	return half_width, batch_size, len(means)
+
+def lag1_autocorrelation(values):
+	n = len(values)
+	mean = sum(values)/n
+	variance = sum((x - mean)**2 for x in values)
+	if variance == 0:
+		return 0.0
+	return sum((values[i] - mean)*(values[i + 1] - mean) for i in range(n - 1))/variance
+
+def controlled_estimates(runs, metrics, controls, level=0.95):
+	# Control-variate estimates of the given metrics from per-run lists: runs maps names to
+	# per-run values, controls maps names of sampled quantities with known means (sizes,
+	# inter-arrival times) to those means. Returns metric -> (estimate, CI half-width)
+	control_runs = [runs[name] for name in controls]
+	control_means = list(controls.values())
+	return {name: confidence.control_variate(runs[name], control_runs, control_means, level) for name in metrics}
+
 class BasicNPStatistic():
-	def __init__(self, T1, T2, TQ1, TQ2, S1, S2, N1, N2, job1MixingTime, job2MixingTime):
+	def __init__(self, T1, T2, TQ1, TQ2, S1, S2, N1, N2, job1MixingTime, job2MixingTime, A=None, truncated=None):
 		self.T1 = T1
 		self.T2 = T2
 		self.TQ1 = TQ1
@@ -10,9 +197,13 @@ class BasicNPStatistic():
 		self.N2 = N2
 		self.job1MixingTime = job1MixingTime
 		self.job2MixingTime = job2MixingTime
+		# Mean inter-arrival time of the run
+		self.A = A
+		# Warm-up observations dropped per statistic (see collectors.truncations), None without truncation
+		self.truncated = truncated
 
 class BasicNPResults():
-	def __init__(self, T1s, T2s, TQ1s, TQ2s, S1s, S2s, N1s, N2s, mixingTime1, mixingTime2):
+	def __init__(self, T1s, T2s, TQ1s, TQ2s, S1s, S2s, N1s, N2s, mixingTime1, mixingTime2, As=None, controlled=None, truncated=None):
 		self.T1s = T1s
 		self.T2s = T2s
 		self.TQ1s = TQ1s
@@ -23,9 +214,42 @@ class BasicNPResults():
 		self.N2s = N2s
 		self.mixingTime1 = mixingTime1
 		self.mixingTime2 = mixingTime2
+		self.As = As
+		# Control-variate estimates: metric -> (estimate, CI half-width), see controlled_estimates
+		self.controlled = controlled
+		# Per-run warm-up truncations, see BasicNPStatistic
+		self.truncated = truncated
+
+class BusyPeriodStatistic():
+	def __init__(self, T1, T2, TQ1, TQ2, N1, N2, S1, S2, job1MixingTime, job2MixingTime, varJ1, varJ2, truncated=None):
+		self.T1 = T1
+		self.T2 = T2
+		self.TQ1 = TQ1
+		self.TQ2 = TQ2
+		self.N1 = N1
+		self.N2 = N2
+		self.S1 = S1
+		self.S2 = S2
+		self.job1MixingTime = job1MixingTime
+		self.job2MixingTime = job2MixingTime
+		self.varJ1 = varJ1
+		self.varJ2 = varJ2
+		self.truncated = truncated
+
+class ServerSwitchStatistic():
+	def __init__(self, T1, T2, TQ1, TQ2, N1, N2, S1, S2, truncated=None):
+		self.T1 = T1
+		self.T2 = T2
+		self.TQ1 = TQ1
+		self.TQ2 = TQ2
+		self.N1 = N1
+		self.N2 = N2
+		self.S1 = S1
+		self.S2 = S2
+		self.truncated = truncated
 
 class SwitchingStatistic():
-	def __init__(self, T1, T2, TA, TB, SA, SB, N1, N2, NA, NB, job1MixingTime, job2MixingTime, varJ1, varJ2):
+	def __init__(self, T1, T2, TA, TB, SA, SB, N1, N2, NA, NB, job1MixingTime, job2MixingTime, varJ1, varJ2, A=None, truncated=None):
 		self.T1 = T1
 		self.T2 = T2
 		self.TA = TA
@@ -40,9 +264,11 @@ class SwitchingStatistic():
 		self.job2MixingTime = job2MixingTime
 		self.varJ1 = varJ1
 		self.varJ2 = varJ2
+		self.A = A
+		self.truncated = truncated
 
 class SwitchingResults():
-	def __init__(self, T1s, T2s, TAs, TBs, SAs, SBs, N1s, N2s, NAs, NBs, mixingTime1, mixingTime2, varJ1, varJ2):
+	def __init__(self, T1s, T2s, TAs, TBs, SAs, SBs, N1s, N2s, NAs, NBs, mixingTime1, mixingTime2, varJ1, varJ2, As=None, controlled=None, truncated=None):
 		self.T1s = T1s
 		self.T2s = T2s
 		self.TAs = TAs
@@ -56,4 +282,7 @@ class SwitchingResults():
 		self.mixingTime1 = mixingTime1
 		self.mixingTime2 = mixingTime2
 		self.varJ1 = varJ1
-		self.varJ2 = varJ2
\ No newline at end of file
+		self.varJ2 = varJ2
+		self.As = As
+		self.controlled = controlled
+		self.truncated = truncated
\ No newline at end of file
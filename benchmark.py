@@ -0,0 +1,128 @@
+import gc
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import util.ensemble as ensemble
+import systems.fcfs_system as fcfs_system
+import systems.basic_np_system as basic_np_system
+import systems.switching_np_system as switching_np_system
+import systems.bp_np_system as bp_np_system
+import systems.server_switch_np_system as server_switch_np_system
+
+# Benchmark of the event-driven systems at fixed seeds. Every (system, load, run length)
+# case runs a few replications; the timing pass is uninstrumented and a second pass under
+# tracemalloc gives the memory figures. Results go to a JSON file that later runs can be
+# compared against, flagging cases that got slower or use more memory.
+
+RHOS = [0.3, 0.6, 0.9, 0.97]
+NUM_JOBS = [1000, 10000]
+
+# name -> system with total load rho split evenly over the two classes, mu1 = mu2 = 1
+SYSTEMS = {
+	'fcfs': lambda rho, num_jobs: fcfs_system.FCFSSystem(1, num_jobs, rho, 1),
+	'np_basic': lambda rho, num_jobs: basic_np_system.NPPrioritySystem(1, num_jobs, rho/2, rho/2, 1, 1),
+	'switching': lambda rho, num_jobs: switching_np_system.SwitchingNPSystem(1, num_jobs, rho/2, rho/2, 1, 1, 0.8),
+	'bp': lambda rho, num_jobs: bp_np_system.BusyPeriodNPSystem(1, num_jobs, rho/2, rho/2, 1, 1, 0.5),
+	'server_switch': lambda rho, num_jobs: server_switch_np_system.ServerSwitchNPSystem(1, num_jobs, rho/2, rho/2, 1, 1, 0.5),
+}
+
+# Systems that start each run with a job already in service, which has no arrival event
+PRESEEDED_JOBS = {'bp': 1, 'server_switch': 1}
+
+def num_events(system, preseeded=0):
+	# Arrivals plus departures: every job drawn so far except the jobs still in the system has departed
+	jobs = system.arrivals.jid
+	in_system = system.servers.num_jobs() + sum(value.num_jobs() for value in vars(system).values() if hasattr(value, 'jobs_waiting'))
+	return 2*jobs - in_system - preseeded
+
+def run_case(system_name, rho, num_jobs, replications, seed):
+	system = SYSTEMS[system_name](rho, num_jobs)
+	seeds = ensemble.replication_seeds(seed, replications)
+
+	events = 0
+	wall = 0.0
+	gc_collections = 0
+	for rep_seed in seeds:
+		system.reset(rep_seed)
+		collections = sum(stats['collections'] for stats in gc.get_stats())
+		start = time.perf_counter()
+		system.simulate_run()
+		wall += time.perf_counter() - start
+		gc_collections += sum(stats['collections'] for stats in gc.get_stats()) - collections
+		events += num_events(system, PRESEEDED_JOBS.get(system_name, 0))
+
+	# Memory pass: peak traced memory of one replication, and the blocks it allocated that
+	# are still live at its end
+	tracemalloc.start()
+	system.reset(seeds[0])
+	system.simulate_run()
+	_, peak = tracemalloc.get_traced_memory()
+	retained_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+	tracemalloc.stop()
+
+	return {'system': system_name, 'rho': rho, 'num_jobs_per_run': num_jobs, 'replications': replications,
+			'events': events, 'events_per_sec': events/wall, 'wall_per_replication': wall/replications,
+			'gc_collections_per_replication': gc_collections/replications,
+			'peak_memory_kb': peak/1024, 'retained_blocks': retained_blocks}
+
+def case_key(result):
+	return "{}/rho={}/jobs={}".format(result['system'], result['rho'], result['num_jobs_per_run'])
+
+def run_suite(system_names=None, rhos=RHOS, num_jobs=NUM_JOBS, replications=3, seed=1, verbose=True):
+	results = {}
+	for system_name in system_names or list(SYSTEMS):
+		for rho in rhos:
+			for n in num_jobs:
+				result = run_case(system_name, rho, n, replications, seed)
+				results[case_key(result)] = result
+				if verbose:
+					print("{:40s} {:>12,.0f} events/s {:>9.3f} s/rep {:>10,.0f} KB peak".format(
+						  case_key(result), result['events_per_sec'], result['wall_per_replication'], result['peak_memory_kb']))
+	return {'python': platform.python_version(), 'platform': platform.platform(), 'seed': seed, 'results': results}
+
+def compare(baseline, current, tolerance=0.1):
+	# Cases more than tolerance slower (events/sec) or heavier (peak memory) than the
+	# baseline, as (case, metric, baseline value, current value)
+	regressions = []
+	for key, result in current['results'].items():
+		if key not in baseline['results']:
+			continue
+		base = baseline['results'][key]
+		if result['events_per_sec'] < base['events_per_sec']*(1 - tolerance):
+			regressions.append((key, 'events_per_sec', base['events_per_sec'], result['events_per_sec']))
+		if result['peak_memory_kb'] > base['peak_memory_kb']*(1 + tolerance):
+			regressions.append((key, 'peak_memory_kb', base['peak_memory_kb'], result['peak_memory_kb']))
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the simulated systems at fixed seeds')
+	parser.add_argument('--systems', nargs='+', choices=list(SYSTEMS), help = 'Systems to run (default all)', default = None)
+	parser.add_argument('--rhos', nargs='+', type=float, help = 'Total loads', default = RHOS)
+	parser.add_argument('--num_jobs_per_run', nargs='+', type=int, help = 'Run lengths', default = NUM_JOBS)
+	parser.add_argument('--replications', type=int, help = 'Replications per case', default = 3)
+	parser.add_argument('--seed', type=int, help = 'Master seed', default = 1)
+	parser.add_argument('--save', metavar='path', type=str, help = 'Write the results to this JSON file', default = None)
+	parser.add_argument('--baseline', metavar='path', type=str, help = 'Compare against this JSON file and exit with status 1 on regressions', default = None)
+	parser.add_argument('--tolerance', type=float, help = 'Allowed relative slowdown or memory growth', default = 0.1)
+	args = parser.parse_args()
+
+	current = run_suite(args.systems, args.rhos, args.num_jobs_per_run, args.replications, args.seed)
+	if args.save is not None:
+		with open(args.save, 'w') as f:
+			json.dump(current, f, indent=1)
+
+	if args.baseline is not None:
+		with open(args.baseline) as f:
+			baseline = json.load(f)
+		regressions = compare(baseline, current, args.tolerance)
+		for key, metric, before, after in regressions:
+			print("REGRESSION {}: {} {:.1f} -> {:.1f}".format(key, metric, before, after))
+		if regressions:
+			sys.exit(1)
+		print("No regressions against {}".format(args.baseline))
+
+if __name__ == "__main__":
+	main()
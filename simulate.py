@@ -1,45 +1,83 @@
 import argparse
+import numpy as np
+import analysis.confidence as confidence
+import analysis.analytic as analytic
+import util.checkpoint as checkpoints
+import util.profiling as profiling
+import util.distributions as distributions
 import systems.fcfs_system as fcfs_system
+import systems.fcfs_lindley_system as fcfs_lindley_system
 import systems.basic_np_system as basic_np_system
 import systems.switching_np_system as switching_np_system
 import systems.bp_np_system as bp_np_system
 import systems.server_switch_np_system as sever_np_system
 
-def run_fcfs_basic(num_runs, num_jobs_per_run, lambda_, mu):
+def run_fcfs_basic(num_runs, num_jobs_per_run, lambda_, mu, workers=1, seed=None, cache=None, rel_precision=None, time_budget=None, truncate_warmup=False, antithetic=False, checkpoint=None, profile=False, vectorized=False):
 	print("Running Basic FCFS Simulation...")
-	basic_system = fcfs_system.FCFSSystem(num_runs, num_jobs_per_run, lambda_, mu)
-	T_runs, N_runs = basic_system.simulate()
+	size = distributions.make(mu)
+	if vectorized:
+		# Whole runs as arrays via the Lindley recursion; much faster, single process
+		if not isinstance(size, distributions.Exponential):
+			raise ValueError("The vectorized FCFS engine only supports exponential sizes")
+		basic_system = fcfs_lindley_system.LindleyFCFSSystem(num_runs, num_jobs_per_run, lambda_, size.rate)
+		T_runs, N_runs = basic_system.simulate(seed=seed)
+	else:
+		basic_system = fcfs_system.FCFSSystem(num_runs, num_jobs_per_run, lambda_, size)
+		T_runs, N_runs = basic_system.simulate(workers=workers, seed=seed, cache=cache, rel_precision=rel_precision, time_budget=time_budget, truncate_warmup=truncate_warmup, antithetic=antithetic, checkpoint=checkpoint, profile=profile)
+		if basic_system.precision_report is not None:
+			print(basic_system.precision_report)
+		if basic_system.antithetic_report is not None:
+			print('Antithetic variance ratios:', basic_system.antithetic_report)
+		if basic_system.profile is not None:
+			print(profiling.format_report(basic_system.profile))
 
 	ET = sum(T_runs)/len(T_runs)
 	EN = sum(N_runs)/len(N_runs)
+	mu = size.rate
 	rho = lambda_/mu
+	expected = analytic.scalars(analytic.fcfs(lambda_, mu, size.second_moment))
 
 	print("Lambda: {}, mu: {}, rho: {}".format(lambda_, mu, rho))
 	print("E[T]: {}, E[N]: {}".format(ET, EN))
-	print("Expected E[T]: {}, Actual E[T]: {}".format(1/(mu - lambda_), ET))
-	print("Expected E[N]: {}, Actual E[N]: {}".format(rho/(1-rho), EN))
+	print("Expected E[T]: {}, Actual E[T]: {}".format(expected['T'], ET))
+	print("Expected E[N]: {}, Actual E[N]: {}".format(expected['N'], EN))
 	print("Little's Law holds? lambdaE[T]: {}, E[N]: {}".format(lambda_*ET, EN))
 
 
-def run_np_basic(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, verbose=True):
+def print_controlled(res, names):
+	# Control-variate estimates (sampled sizes and inter-arrival times as controls) with their CIs
+	for name in names:
+		estimate, half_width = res.controlled[name]
+		print("Controlled E[{}]: {} +/- {}".format(name, estimate, half_width))
+
+def run_np_basic(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, verbose=True, workers=1, seed=None, cache=None, rel_precision=None, time_budget=None, truncate_warmup=False, antithetic=False, checkpoint=None, profile=False):
 	if verbose:
 		print("Running Basic NonPreemptive Simulation...")
+	# mu1 and mu2 are service rates or util.distributions size distributions; the closed
+	# forms use their rates and second moments
+	size1, size2 = distributions.make(mu1), distributions.make(mu2)
+	mu1, mu2 = size1.rate, size2.rate
 
 	rho1 = lambda1/mu1
 	rho2 = lambda2/mu2
 	rho = rho1 + rho2
 
 	lambda_ = lambda1 + lambda2
-	Ssquared = lambda1/lambda_ * 2/(mu1**2) + lambda2/lambda_ * 2/(mu2**2)
-	S = lambda1/lambda_ * 1/mu1 + lambda2/lambda_ * 1/mu2
-	Se = Ssquared/(2*S)
+	Se = float(analytic.excess_size(lambda1, lambda2, mu1, mu2, size1.second_moment, size2.second_moment))
+	expected = analytic.scalars(analytic.np_basic(lambda1, lambda2, mu1, mu2, size1.second_moment, size2.second_moment))
 
 	if verbose:
 		print("Lambda1: {}, lambda2: {}, mu1: {}, mu2: {}, rho1: {}, rho2: {}, rho: {}".format(lambda1, lambda2, mu1, mu2, rho1, rho2, rho))
 		print("Se: {}".format(Se))
 
-	basic_system = basic_np_system.NPPrioritySystem(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2)
-	res = basic_system.simulate()
+	basic_system = basic_np_system.NPPrioritySystem(num_runs, num_jobs_per_run, lambda1, lambda2, size1, size2)
+	res = basic_system.simulate(workers=workers, seed=seed, cache=cache, rel_precision=rel_precision, time_budget=time_budget, truncate_warmup=truncate_warmup, antithetic=antithetic, checkpoint=checkpoint, profile=profile)
+	if verbose and basic_system.precision_report is not None:
+		print(basic_system.precision_report)
+	if verbose and basic_system.antithetic_report is not None:
+		print('Antithetic variance ratios:', basic_system.antithetic_report)
+	if verbose and basic_system.profile is not None:
+		print(profiling.format_report(basic_system.profile))
 
 	ES1 = sum(res.S1s)/len(res.S1s)
 	ES2 = sum(res.S2s)/len(res.S2s)
@@ -48,8 +86,8 @@ def run_np_basic(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, verbose
 		print("Expected E[S1]: {}, Actual E[S1]: {}".format(1/mu1, ES1))
 		print("Expected E[S2]: {}, Actual E[S2]: {}".format(1/mu2, ES2))
 	
-	expectedTQ1 = rho*Se/(1-rho1)
-	expectedTQ2 = rho*Se/((1-rho1)*(1-rho))
+	expectedTQ1 = expected['TQ1']
+	expectedTQ2 = expected['TQ2']
 
 	ETQ1 = sum(res.TQ1s)/len(res.TQ1s)
 	ETQ2 = sum(res.TQ2s)/len(res.TQ2s)
@@ -58,8 +96,8 @@ def run_np_basic(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, verbose
 		print("Expected E[TQ1]: {}, Actual E[TQ1]: {}".format(expectedTQ1, ETQ1))
 		print("Expected E[TQ2]: {}, Actual E[TQ2]: {}".format(expectedTQ2, ETQ2))
 
-	goalT1 = expectedTQ1 + 1/mu1
-	goalT2 = expectedTQ2 + 1/mu2
+	goalT1 = expected['T1']
+	goalT2 = expected['T2']
 
 	ET1 = sum(res.T1s)/len(res.T1s)
 	ET2 = sum(res.T2s)/len(res.T2s)
@@ -78,13 +116,12 @@ def run_np_basic(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, verbose
 		print("Little's Law holds for class 1? lambda1E[T1]: {}, E[N1]: {}".format(lambda1*ET1, EN1))
 		print("Little's Law holds for class 2? lambda2E[T2]: {}, E[N2]: {}".format(lambda2*ET2, EN2))
 		print("Little's Law holds overall? lambdaE[T]: {}, E[N]: {}".format(lambda_*ET, EN))
+		print_controlled(res, ['T1', 'T2', 'TQ1', 'TQ2', 'N1', 'N2'])
 
 		print("==============")
 
-	prob_class1_queue_empty = 1 - rho1
-	prob_class2_queue_empty = 1 - rho2
-	expectedMT1 = prob_class1_queue_empty*(1/lambda1 + rho2/mu2)
-	expectedMT2 = prob_class2_queue_empty*(1/lambda2 + rho1/mu1)
+	expectedMT1 = expected['job1MixingTime']
+	expectedMT2 = expected['job2MixingTime']
 
 	EMT1 = sum(res.mixingTime1)/len(res.mixingTime1)
 	EMT2 = sum(res.mixingTime2)/len(res.mixingTime2)
@@ -95,10 +132,14 @@ def run_np_basic(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, verbose
 
 	return (expectedMT1, EMT1, expectedMT2, EMT2)
 
-def run_switching_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, stay_prob, verbose=True):
+def run_switching_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, stay_prob, verbose=True, workers=1, seed=None, cache=None, rel_precision=None, time_budget=None, truncate_warmup=False, antithetic=False, checkpoint=None, profile=False):
 	if verbose:
 		print("Running Switching NonPreemptive Simulation...")
-	basic_system = switching_np_system.SwitchingNPSystem(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, stay_prob)
+	# mu1 and mu2 are service rates or util.distributions size distributions; the closed
+	# forms use their rates and second moments
+	size1, size2 = distributions.make(mu1), distributions.make(mu2)
+	mu1, mu2 = size1.rate, size2.rate
+	basic_system = switching_np_system.SwitchingNPSystem(num_runs, num_jobs_per_run, lambda1, lambda2, size1, size2, stay_prob)
 	
 	# System parameters
 	lambda_ = lambda1 + lambda2
@@ -110,16 +151,14 @@ def run_switching_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, sta
 	lambdaA = lambda1*stay_prob + lambda2*(1-stay_prob)
 	lambdaB = lambda1*(1-stay_prob) + lambda2*stay_prob
 
-	# Computing size distribution
-	expected_SA = ((lambda1*stay_prob)/lambdaA)*1/mu1 + ((lambda2*(1-stay_prob))/lambdaA)*1/mu2
-	expected_SB = ((lambda1*(1-stay_prob))/lambdaB)*1/mu1 + ((lambda2*stay_prob)/lambdaB)*1/mu2
-
 	rhoA = stay_prob*rho1 + (1-stay_prob)*rho2
 	rhoB = stay_prob*rho2 + (1-stay_prob)*rho1
 
-	Ssquared = lambda1/lambda_ * 2/(mu1**2) + lambda2/lambda_ * 2/(mu2**2)
 	S = lambda1/lambda_ * 1/mu1 + lambda2/lambda_ * 1/mu2
-	Se = Ssquared/(2*S)
+	Se = float(analytic.excess_size(lambda1, lambda2, mu1, mu2, size1.second_moment, size2.second_moment))
+	expected = analytic.scalars(analytic.switching(lambda1, lambda2, mu1, mu2, stay_prob, size1.second_moment, size2.second_moment))
+	expected_SA = expected['SA']
+	expected_SB = expected['SB']
 
 	if verbose:
 		print("Se: {:.6f}, S: {:.6f}".format(Se, S))
@@ -127,7 +166,13 @@ def run_switching_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, sta
 		print("Lambda1: {}, lambda2: {}, lambda: {}, mu1: {:.3f}, mu2: {:.3f}, rho1: {:.3f}, rho2: {:.3f}, stay prob: {}".format(lambda1, lambda2, lambda_, mu1, mu2, rho1, rho2, stay_prob))
 		print("LambdaA: {:.3f}, LambdaB: {:.3f}, rhoA: {:.3f}, rhoB: {:.3f}".format(lambdaA, lambdaB, rhoA, rhoB))
 
-	switching_res = basic_system.simulate()
+	switching_res = basic_system.simulate(workers=workers, seed=seed, cache=cache, rel_precision=rel_precision, time_budget=time_budget, truncate_warmup=truncate_warmup, antithetic=antithetic, checkpoint=checkpoint, profile=profile)
+	if verbose and basic_system.precision_report is not None:
+		print(basic_system.precision_report)
+	if verbose and basic_system.antithetic_report is not None:
+		print('Antithetic variance ratios:', basic_system.antithetic_report)
+	if verbose and basic_system.profile is not None:
+		print(profiling.format_report(basic_system.profile))
 
 	# Computing actual SA and SB
 	ESA = sum(switching_res.SAs)/len(switching_res.SAs)
@@ -137,12 +182,9 @@ def run_switching_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, sta
 		print("Expected SA: {}, Actual SA: {}".format(expected_SA, ESA))
 		print("Expected SB: {}, Actual SB: {}".format(expected_SB, ESB))
 
-	# Computing expected class A and B time
-	expected_TAQ = rho*Se/(1-rhoA)
-	expected_TBQ = rho*Se/((1-rho)*(1-rhoA))
-
-	expected_TA = expected_TAQ + expected_SA
-	expected_TB = expected_TBQ + expected_SB
+	# Expected class A and B time
+	expected_TA = expected['TA']
+	expected_TB = expected['TB']
 
 	ETA = sum(switching_res.TAs)/len(switching_res.TAs)
 	ETB = sum(switching_res.TBs)/len(switching_res.TBs)
@@ -151,10 +193,9 @@ def run_switching_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, sta
 		print("Expected TA: {}, Actual TA: {}".format(expected_TA, ETA))
 		print("Expected TB: {}, Actual TB: {}".format(expected_TB, ETB))
 
-	# Computing expected class 1 and 2 time
-
-	expected_T1 = stay_prob*expected_TAQ + (1-stay_prob)*expected_TBQ + 1/mu1
-	expected_T2 = stay_prob*expected_TBQ + (1-stay_prob)*expected_TAQ + 1/mu2
+	# Expected class 1 and 2 time
+	expected_T1 = expected['T1']
+	expected_T2 = expected['T2']
 
 	ET1 = sum(switching_res.T1s)/len(switching_res.T1s)
 	ET2 = sum(switching_res.T2s)/len(switching_res.T2s)
@@ -183,6 +224,7 @@ def run_switching_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, sta
 	EN = EN1 + EN2
 	if verbose:
 		print("Little's Law holds overall? lambdaE[T]: {}, E[N]: {}".format(lambda1*ET1 + lambda2*ET2, EN))
+		print_controlled(switching_res, ['T1', 'T2', 'TA', 'TB', 'N1', 'N2', 'NA', 'NB'])
 
 		print("=======================")
 
@@ -191,15 +233,9 @@ def run_switching_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, sta
 	EMT1 = sum(switching_res.mixingTime1)/len(switching_res.mixingTime1)
 	EMT2 = sum(switching_res.mixingTime2)/len(switching_res.mixingTime2)
 
-	# Theoretical time between class 1 jobs
-	prob_job_1 = rhoA*(lambda1*stay_prob)/(lambdaA) + (1-rhoA)*rhoB*(lambda1*(1-stay_prob)/lambdaB) + (1-rhoA)*(1-rhoB)*lambda1/lambda_
-	num_class_2_jobs_between_class_1 = 1/prob_job_1
-	expectedMT1 = num_class_2_jobs_between_class_1
-
-	# Theoretical time between class 2 jobs
-	prob_job_2 = rhoA*(lambda2*(1-stay_prob)/lambdaA) + (1-rhoA)*rhoB*(lambda2*stay_prob/lambdaB) + (1-rhoA)*(1-rhoB)*(lambda2/lambda_)
-	num_class_1_jobs_between_class_2 = 1/prob_job_2
-	expectedMT2 = num_class_1_jobs_between_class_2
+	# Theoretical time between class 1 jobs and between class 2 jobs
+	expectedMT1 = expected['job1MixingTime']
+	expectedMT2 = expected['job2MixingTime']
 
 	if verbose:
 		print("Time between class 1 jobs: expected: {:.5f}, actual: {:.5f}".format(expectedMT1, EMT1))
@@ -210,25 +246,33 @@ def run_switching_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, sta
 
 	return (EMT1, EMT2, VT1, VT2)
 
-def run_bp_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, class_1_prio_prob, verbose=True):
+def run_bp_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, class_1_prio_prob, verbose=True, workers=1, seed=None, cache=None, rel_precision=None, time_budget=None, truncate_warmup=False, antithetic=False, checkpoint=None, profile=False):
 	if verbose:
 		print("Running Busy Period Non-Preemptive Simulation...")
+	# mu1 and mu2 are service rates or util.distributions size distributions; the closed
+	# forms use their rates and second moments
+	size1, size2 = distributions.make(mu1), distributions.make(mu2)
+	mu1, mu2 = size1.rate, size2.rate
 	rho1 = lambda1/mu1
 	rho2 = lambda2/mu2
 	rho = rho1 + rho2
 
 	lambda_ = lambda1 + lambda2
-	Ssquared = lambda1/lambda_ * 2/(mu1**2) + lambda2/lambda_ * 2/(mu2**2)
-	S = lambda1/lambda_ * 1/mu1 + lambda2/lambda_ * 1/mu2
-	Se = Ssquared/(2*S)
+	Se = float(analytic.excess_size(lambda1, lambda2, mu1, mu2, size1.second_moment, size2.second_moment))
 
 	if verbose:
 		print("Lambda1: {}, lambda2: {}, mu1: {:.4f}, mu2: {:.4f}, rho1: {}, rho2: {}, class1 priority prob: {}".format(lambda1, lambda2, mu1, mu2, rho1, rho2, class_1_prio_prob))
 		print("Se: {:.5f}".format(Se))
 	
 
-	basic_system = bp_np_system.BusyPeriodNPSystem(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, class_1_prio_prob)
-	T1_runs, T2_runs, TQ1_runs, TQ2_runs, N1_runs, N2_runs, S1_runs, S2_runs, MT1_runs, MT2_runs, varJ1_runs, varJ2_runs = basic_system.simulate()
+	basic_system = bp_np_system.BusyPeriodNPSystem(num_runs, num_jobs_per_run, lambda1, lambda2, size1, size2, class_1_prio_prob)
+	T1_runs, T2_runs, TQ1_runs, TQ2_runs, N1_runs, N2_runs, S1_runs, S2_runs, MT1_runs, MT2_runs, varJ1_runs, varJ2_runs = basic_system.simulate(workers=workers, seed=seed, cache=cache, rel_precision=rel_precision, time_budget=time_budget, truncate_warmup=truncate_warmup, antithetic=antithetic, checkpoint=checkpoint, profile=profile)
+	if verbose and basic_system.precision_report is not None:
+		print(basic_system.precision_report)
+	if verbose and basic_system.antithetic_report is not None:
+		print('Antithetic variance ratios:', basic_system.antithetic_report)
+	if verbose and basic_system.profile is not None:
+		print(profiling.format_report(basic_system.profile))
 
 	ES1 = sum(S1_runs)/len(S1_runs)
 	ES2 = sum(S2_runs)/len(S2_runs)
@@ -243,11 +287,12 @@ def run_bp_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, class_1_pr
 	ETQ1 = sum(TQ1_runs)/len(TQ1_runs)
 	ETQ2 = sum(TQ2_runs)/len(TQ2_runs)
 
-	expectedTQ1 = class_1_prio_prob*(rho*Se/(1-rho1)) + (1-class_1_prio_prob)*(rho*Se/((1-rho)*(1-rho2)))
-	expectedTQ2 = class_1_prio_prob*(rho*Se/((1-rho1)*(1-rho))) + (1-class_1_prio_prob)*(rho*Se/(1-rho2))
+	expected = analytic.scalars(analytic.busy_period(lambda1, lambda2, mu1, mu2, class_1_prio_prob, size1.second_moment, size2.second_moment))
+	expectedTQ1 = expected['TQ1']
+	expectedTQ2 = expected['TQ2']
 
-	goalT1 = expectedTQ1 + 1/mu1
-	goalT2 = expectedTQ2 + 1/mu2
+	goalT1 = expected['T1']
+	goalT2 = expected['T2']
 
 	if verbose:
 		print("Expected E[T1]: {}, Actual E[T1]: {}".format(goalT1, ET1))
@@ -282,22 +327,34 @@ def run_bp_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, class_1_pr
 
 	return (EMT1, EMT2, VT1, VT2)
 
-def compare_server_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, class_1_prio_prob):
+def compare_server_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, class_1_prio_prob, workers=1, seed=None, cache=None, rel_precision=None, time_budget=None, truncate_warmup=False, antithetic=False, checkpoint=None, profile=False):
 	print("Running Basic Server Switching Non-Preemptive Simulation...")
+	# mu1 and mu2 are service rates or util.distributions size distributions; the closed
+	# forms use their rates and second moments
+	size1, size2 = distributions.make(mu1), distributions.make(mu2)
+	mu1, mu2 = size1.rate, size2.rate
+	# Both systems run on the same master seed, so run i of each sees the same arrivals,
+	# classes and sizes (common random numbers) and the runs can be compared in pairs
+	if seed is None:
+		seed = np.random.SeedSequence().entropy if checkpoint is None else checkpoint.master_seed(('compare_server_np', lambda1, lambda2, size1, size2, class_1_prio_prob))
 	rho1 = lambda1/mu1
 	rho2 = lambda2/mu2
 	rho = rho1 + rho2
 
 	lambda_ = lambda1 + lambda2
-	Ssquared = lambda1/lambda_ * 2/(mu1**2) + lambda2/lambda_ * 2/(mu2**2)
-	S = lambda1/lambda_ * 1/mu1 + lambda2/lambda_ * 1/mu2
-	Se = Ssquared/(2*S)
+	Se = float(analytic.excess_size(lambda1, lambda2, mu1, mu2, size1.second_moment, size2.second_moment))
 
 	print("Lambda1: {}, lambda2: {}, mu1: {:.4f}, mu2: {:.4f}, rho1: {}, rho2: {}, class1 priority prob: {}".format(lambda1, lambda2, mu1, mu2, rho1, rho2, class_1_prio_prob))
 	print("Se: {:.5f}".format(Se))
 
-	basic_system = sever_np_system.ServerSwitchNPSystem(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, class_1_prio_prob)
-	T1_runs, T2_runs, _, _, N1_runs, N2_runs, S1_runs, S2_runs = basic_system.simulate()
+	basic_system = sever_np_system.ServerSwitchNPSystem(num_runs, num_jobs_per_run, lambda1, lambda2, size1, size2, class_1_prio_prob)
+	T1_runs, T2_runs, _, _, N1_runs, N2_runs, S1_runs, S2_runs = basic_system.simulate(workers=workers, seed=seed, cache=cache, rel_precision=rel_precision, time_budget=time_budget, truncate_warmup=truncate_warmup, antithetic=antithetic, checkpoint=checkpoint, profile=profile)
+	if basic_system.precision_report is not None:
+		print(basic_system.precision_report)
+	if basic_system.antithetic_report is not None:
+		print('Antithetic variance ratios:', basic_system.antithetic_report)
+	if basic_system.profile is not None:
+		print(profiling.format_report(basic_system.profile))
 
 	ES1_server_switch = sum(S1_runs)/len(S1_runs)
 	ES2_server_switch = sum(S2_runs)/len(S2_runs)
@@ -319,8 +376,16 @@ def compare_server_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, cl
 	print("Little's Law holds overall? lambdaE[T]: {}, E[N]: {}".format(lambda_*ET_server_switch, EN_server_switch))
 
 	print("Running Switching Non-Preemptive Algo...")
-	basic_system2 = switching_np_system.SwitchingNPSystem(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, class_1_prio_prob)
-	switching_res = basic_system2.simulate()
+	# Exactly the runs the server-switch system made (a stopping rule may have ended it
+	# early), so every run has its common-random-numbers partner
+	num_paired_runs = 2*len(T1_runs) if antithetic else len(T1_runs)
+	basic_system2 = switching_np_system.SwitchingNPSystem(num_paired_runs, num_jobs_per_run, lambda1, lambda2, size1, size2, class_1_prio_prob)
+	switching_res = basic_system2.simulate(workers=workers, seed=seed, cache=cache, truncate_warmup=truncate_warmup, antithetic=antithetic, checkpoint=checkpoint, profile=profile)
+	assert len(switching_res.T1s) == len(T1_runs)
+	if basic_system2.antithetic_report is not None:
+		print('Antithetic variance ratios:', basic_system2.antithetic_report)
+	if basic_system2.profile is not None:
+		print(profiling.format_report(basic_system2.profile))
 
 	ET1_arrival_switch = sum(switching_res.T1s)/len(switching_res.T1s)
 	ET2_arrival_switch = sum(switching_res.T2s)/len(switching_res.T2s)
@@ -338,6 +403,16 @@ def compare_server_np(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, cl
 	print("Server switch E[N2]: {}, Arrival switch E[N2]: {}".format(EN2_server_switch, EN2_arrival_switch))
 	print("Server switch E[N]: {}, Arrival switch E[N]: {}".format(EN_server_switch, EN_arrival_switch))
 
+	# Paired differences, server switch minus arrival switch
+	T_server_switch = [lambda1/lambda_*t1 + lambda2/lambda_*t2 for t1, t2 in zip(T1_runs, T2_runs)]
+	T_arrival_switch = [lambda1/lambda_*t1 + lambda2/lambda_*t2 for t1, t2 in zip(switching_res.T1s, switching_res.T2s)]
+	N_server_switch = [n1 + n2 for n1, n2 in zip(N1_runs, N2_runs)]
+	N_arrival_switch = [n1 + n2 for n1, n2 in zip(switching_res.N1s, switching_res.N2s)]
+	for name, a, b in [('T1', T1_runs, switching_res.T1s), ('T2', T2_runs, switching_res.T2s), ('T', T_server_switch, T_arrival_switch),
+					   ('N1', N1_runs, switching_res.N1s), ('N2', N2_runs, switching_res.N2s), ('N', N_server_switch, N_arrival_switch)]:
+		diff, half_width = confidence.paired_difference(a, b)
+		print("Server switch - arrival switch E[{}]: {:.6f} +/- {:.6f} (95% paired CI)".format(name, diff, half_width))
+
 
 # Main
 def main():
@@ -356,8 +431,30 @@ def main():
 	parser.add_argument('--mu1', metavar='mu1', type=float, help = 'Service rate for class 1', default = 1)
 	parser.add_argument('--mu2', metavar='mu2', type=float, help = 'Service rate for class 2', default = 10)
 
+	parser.add_argument('--size', metavar='dist', type=distributions.parse, help = "Size distribution instead of exponential with rate mu, e.g. 'erlang:4,40', 'lognormal:0.1,4', 'bpareto:1.5,0.01,100', 'empirical:sizes.txt'", default = None)
+	parser.add_argument('--size1', metavar='dist', type=distributions.parse, help = 'Class 1 size distribution instead of exponential with rate mu1', default = None)
+	parser.add_argument('--size2', metavar='dist', type=distributions.parse, help = 'Class 2 size distribution instead of exponential with rate mu2', default = None)
+
 	parser.add_argument('--stay-prob', metavar='p', type=float, help = 'Routing probability', default = 0.8)
+
+	parser.add_argument('--workers', metavar='W', type=int, help = 'Number of worker processes for the replications', default = 1)
+	parser.add_argument('--seed', metavar='seed', type=int, help = 'Master seed; results are the same for any number of workers', default = None)
+	parser.add_argument('--rel-precision', metavar='eps', type=float, help = 'Add runs (up to num_runs) until every CI half-width is within this fraction of its mean', default = None)
+	parser.add_argument('--time-budget', metavar='secs', type=float, help = 'Stop adding runs after this many seconds', default = None)
+	parser.add_argument('--truncate-warmup', action='store_true', help = 'Drop the warm-up of each run (MSER-5) before averaging')
+	parser.add_argument('--antithetic', action='store_true', help = 'Run replications in antithetic pairs and average each pair')
+	parser.add_argument('--profile', action='store_true', help = 'Count and time events, RNG draws and statistics, and report throughput, peak queue lengths and memory')
+	parser.add_argument('--checkpoint', metavar='path', type=str, help = 'Save progress to this file; rerunning the same command resumes from it', default = None)
+	parser.add_argument('--vectorized', action='store_true', help = 'Use the vectorized Lindley-recursion engine (FCFS only)')
 	args = parser.parse_args()
+	run_checkpoint = None if args.checkpoint is None else checkpoints.Checkpoint(args.checkpoint)
+	# The systems take a size distribution wherever they take a service rate
+	if args.size is not None:
+		args.mu = args.size
+	if args.size1 is not None:
+		args.mu1 = args.size1
+	if args.size2 is not None:
+		args.mu2 = args.size2
 
 	FCFS = 0
 	NPBasic = 1
@@ -366,17 +463,17 @@ def main():
 	SERVERNP = 4
 
 	if args.system == FCFS:
-		run_fcfs_basic(args.num_runs, args.num_jobs_per_run, args.lambda_, args.mu)
+		run_fcfs_basic(args.num_runs, args.num_jobs_per_run, args.lambda_, args.mu, workers=args.workers, seed=args.seed, rel_precision=args.rel_precision, time_budget=args.time_budget, truncate_warmup=args.truncate_warmup, antithetic=args.antithetic, checkpoint=run_checkpoint, profile=args.profile, vectorized=args.vectorized)
 	elif args.system == NPBasic:
 		run_np_basic(args.num_runs, args.num_jobs_per_run, args.lambda1,
-					args.lambda2, args.mu1, args.mu2)
+					args.lambda2, args.mu1, args.mu2, workers=args.workers, seed=args.seed, rel_precision=args.rel_precision, time_budget=args.time_budget, truncate_warmup=args.truncate_warmup, antithetic=args.antithetic, checkpoint=run_checkpoint, profile=args.profile)
 	elif args.system == SWITCHING:
 		run_switching_np(args.num_runs, args.num_jobs_per_run, args.lambda1, args.lambda2,
-						args.mu1, args.mu2, args.stay_prob)
+						args.mu1, args.mu2, args.stay_prob, workers=args.workers, seed=args.seed, rel_precision=args.rel_precision, time_budget=args.time_budget, truncate_warmup=args.truncate_warmup, antithetic=args.antithetic, checkpoint=run_checkpoint, profile=args.profile)
 	elif args.system == BPNP:
-		run_bp_np(args.num_runs, args.num_jobs_per_run, args.lambda1, args.lambda2, args.mu1, args.mu2, args.stay_prob)
+		run_bp_np(args.num_runs, args.num_jobs_per_run, args.lambda1, args.lambda2, args.mu1, args.mu2, args.stay_prob, workers=args.workers, seed=args.seed, rel_precision=args.rel_precision, time_budget=args.time_budget, truncate_warmup=args.truncate_warmup, antithetic=args.antithetic, checkpoint=run_checkpoint, profile=args.profile)
 	elif args.system == SERVERNP:
-		compare_server_np(args.num_runs, args.num_jobs_per_run, args.lambda1, args.lambda2, args.mu1, args.mu2, args.stay_prob)
+		compare_server_np(args.num_runs, args.num_jobs_per_run, args.lambda1, args.lambda2, args.mu1, args.mu2, args.stay_prob, workers=args.workers, seed=args.seed, rel_precision=args.rel_precision, time_budget=args.time_budget, truncate_warmup=args.truncate_warmup, antithetic=args.antithetic, checkpoint=run_checkpoint, profile=args.profile)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,38 +1,56 @@
-from xmlrpc.client import Server
 import util.arrivals as arrivals
-import util.server as server
-import sys
+import util.server_pool as server_pool
 import util.queue as queue
-import analysis.events as events
+import util.ensemble as ensemble
+import util.profiling as profiling
+import analysis.collectors as collectors
 import analysis.statistic as statistic
 
-def progress(count, total, status=''):
-	bar_len = 60
-	filled_len = int(round(bar_len * count / float(total)))
-
-	percents = round(100.0 * count / float(total), 1)
-	bar = '=' * filled_len + '-' * (bar_len - filled_len)
-
-	sys.stdout.write('[%s] %s%s ...%s\r' % (bar, percents, '%', status))
-	sys.stdout.flush()  # As suggested by Rom Ruben (see: http://stackoverflow.com/questions/3173320/text-progress-bar-in-the-console/27871113#comment50529068_27871113)
-
-
 class NPPrioritySystem():
-	def __init__(self, num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2):
+	def __init__(self, num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, num_servers=1, seed=None, source=None):
 		self.num_runs = num_runs
 		self.num_jobs_per_run = num_jobs_per_run
-		self.server = server.Server()
+		self.num_servers = num_servers
+		# Model parameters, used to key cached results
+		self.params = (lambda1, lambda2, mu1, mu2, num_servers)
+		# Poisson arrivals with sampled sizes, or a replacement stream such as
+		# util.trace.TraceArrivals replaying recorded arrivals
+		if source is None:
+			self.arrivals = arrivals.PriorityArrivals(lambda1, lambda2, mu1, mu2)
+		else:
+			self.arrivals = source
+			self.params += (source,)
+		# Accumulator for the run statistics (statistic.BatchMeans in batch-means mode)
+		self.stat_type = statistic.RunningStat
+		# Collectors attached with add_collector (e.g. tracing), fed alongside the statistics
+		self.extra_collectors = []
+		# util.profiling.Profiler instrumenting the runs, if any (see simulate(profile=True))
+		self.profiler = None
+		self.reset(seed)
+
+	def reset(self, seed=None, pair_member=None):
+		# Empty system at time 0 driven by fresh random streams
+		# (pair_member 0 or 1: one run of an antithetic pair, see BlockArrivals.exponentials)
+		self.arrivals.reset(ensemble.spawn_streams(seed, 1)[0], pair_member)
+		self.servers = server_pool.ServerPool(self.num_servers)
 		self.queue1 = queue.FCFSQueue()
 		self.queue2 = queue.FCFSQueue()
-		self.arrivals = arrivals.PriorityArrivals(lambda1, lambda2, mu1, mu2)
+		# Running statistics, updated by the collector once per event
+		self.stats = collectors.PriorityCollector(self.stat_type)
+		self.collectors = [self.stats] + self.extra_collectors
 
-		self.time_between_job1 = []
-		self.time_between_job2 = []
+		self.time_between_job1 = statistic.RunningStat()
+		self.time_between_job2 = statistic.RunningStat()
 		self.last_served_class = None
 		self.last_served_class_time = None
 		self.have_seen_class2 = False
 		self.have_seen_class1 = False
 
+	def add_collector(self, collector):
+		# collector.arrival(...) and collector.depart(...) are called on every later event, this run and the next
+		self.extra_collectors.append(collector)
+		self.collectors.append(collector)
+
 	def get_next_job(self):
 		if (self.queue1.num_jobs() != 0):
 			return self.queue1.pop()
@@ -42,8 +60,8 @@ class NPPrioritySystem():
 
 	def handle_service(self):
 		# Get num jobs in system
-		curr_time = self.server.time_next_depart()
-		completed_job = self.server.complete()
+		curr_time = self.servers.time_next_depart()
+		completed_job = self.servers.complete()
 
 		response_time = curr_time - completed_job.arrival_time
 
@@ -59,26 +77,27 @@ class NPPrioritySystem():
 				if new_job_to_serve.priority == 1:
 					if self.have_seen_class1:
 						time_diff = curr_time - self.last_served_class_time
-						self.time_between_job1.append(time_diff)
+						self.time_between_job1.add(time_diff)
 					self.have_seen_class1 = True
 				else:
 					if self.have_seen_class2:
 						time_diff = curr_time - self.last_served_class_time
-						self.time_between_job2.append(time_diff)
+						self.time_between_job2.add(time_diff)
 					self.have_seen_class2 = True
 				
 				self.last_served_class_time = curr_time + new_job_to_serve.size
 				self.last_served_class = new_job_to_serve.priority
 
 			new_job_to_serve.start_service_time = curr_time
-			self.server.push(new_job_to_serve, curr_time)
+			self.servers.push(new_job_to_serve, curr_time)
 
-		num1_jobs = self.queue1.num_jobs() + self.server.num_jobs_priority(1)
-		num2_jobs = self.queue2.num_jobs() + self.server.num_jobs_priority(2)
+		num1_jobs = self.queue1.num_jobs() + self.servers.num_jobs_priority(1)
+		num2_jobs = self.queue2.num_jobs() + self.servers.num_jobs_priority(2)
 
 		waiting_time = completed_job.start_service_time - completed_job.arrival_time
 		assert(abs(waiting_time - (response_time - completed_job.size)) <= 0.001)
-		return events.PriorityDepartEvent(curr_time, response_time, num1_jobs, num2_jobs, waiting_time, completed_job)
+		for collector in self.collectors:
+			collector.depart(curr_time, response_time, num1_jobs, num2_jobs, waiting_time, completed_job)
 
 	def handle_arrival(self):
 		curr_time = self.arrivals.time_next_arrive
@@ -87,8 +106,8 @@ class NPPrioritySystem():
 		job_arrive = self.arrivals.arrive()
 
 		# Count number of jobs in the system for each class
-		num1_jobs = self.queue1.num_jobs() + self.server.num_jobs_priority(1)
-		num2_jobs = self.queue2.num_jobs() + self.server.num_jobs_priority(2)
+		num1_jobs = self.queue1.num_jobs() + self.servers.num_jobs_priority(1)
+		num2_jobs = self.queue2.num_jobs() + self.servers.num_jobs_priority(2)
 
 		# Put this arrival in the correct queue; class 1 has strict priority
 		if job_arrive.priority == 1:
@@ -96,14 +115,14 @@ class NPPrioritySystem():
 		else:
 			self.queue2.push(job_arrive)
 
-		# If the server is idle, try to grab a new job
-		if self.server.num_jobs() == 0:
+		# If a server is idle, try to grab a new job
+		if self.servers.has_idle():
 			# Pops job according to strict class 1 priority
 			next_job = self.get_next_job()
 
 			if next_job is not None:
 				next_job.start_service_time = curr_time
-				self.server.push(next_job, curr_time)
+				self.servers.push(next_job, curr_time)
 
 				# Update time between jobs
 				if next_job.priority != self.last_served_class:
@@ -111,89 +130,53 @@ class NPPrioritySystem():
 						# Finished a run of class 2 jobs
 						if self.have_seen_class1:
 							time_diff = curr_time - self.last_served_class_time
-							self.time_between_job1.append(time_diff)
+							self.time_between_job1.add(time_diff)
 						self.have_seen_class1 = True
 					
 					elif self.last_served_class == 1:
 						# Finished a run of class 1 jobs
 						if self.have_seen_class2:
 							time_diff = curr_time - self.last_served_class_time
-							self.time_between_job2.append(time_diff)
+							self.time_between_job2.add(time_diff)
 						self.have_seen_class2 = True
 
 					# New run starts after this job finishes, as it was the last time we served a job like it
 					self.last_served_class_time = curr_time + next_job.size
 					self.last_served_class = next_job.priority
 
-		return events.PriorityArrivalEvent(curr_time, num1_jobs, num2_jobs)
+		for collector in self.collectors:
+			collector.arrival(curr_time, num1_jobs, num2_jobs)
 
 	def step(self):
-		if self.arrivals.time_next_arrive <= self.server.time_next_depart():
+		if self.arrivals.time_next_arrive <= self.servers.time_next_depart():
 			# Arrival comes first
-			return self.handle_arrival()
-		if self.server.time_next_depart() <= self.arrivals.time_next_arrive:
+			self.handle_arrival()
+		else:
 			# Complete the job in the server before arrival can come
-			return self.handle_service()
+			self.handle_service()
 
 	def simulate_run(self):
-		self.server = server.Server()
-		self.queue1 = queue.FCFSQueue()
-		self.queue2 = queue.FCFSQueue()
-
-		num_completions1 = 0
-		num_completions2 = 0
-
-		responses = []
-		waiting_times = []
-
-		num_jobs1_seen = []
-		num_jobs2_seen = []
-
-		job1_sizes = []
-		job2_sizes = []
-
-		# Start with first job and set up final priority
-		self.time_between_job1 = []
-		self.time_between_job2 = []
-
-		while num_completions1 < self.num_jobs_per_run or num_completions2 < self.num_jobs_per_run or len(self.time_between_job1) < 300 or len(self.time_between_job2) < 300:
-			event = self.step()
-			if isinstance(event, events.PriorityDepartEvent):
-				if event.job.priority == 1:
-					num_completions1 += 1
-				else:
-					num_completions2 += 1
-				responses.append(event)
-				waiting_times.append(event)
-			else:
-				num_jobs1_seen.append(event.num1_jobs_seen)
-				num_jobs2_seen.append(event.num2_jobs_seen)
-
-		job1_sizes = [event.job.size for event in responses if event.job.priority == 1]
-		job2_sizes = [event.job.size for event in responses if event.job.priority == 2]
-
-		response1_times = [event.response_time for event in responses if event.job.priority == 1]
-		response2_times = [event.response_time for event in responses if event.job.priority == 2]
-		waiting1_times = [event.waiting_time for event in responses if event.job.priority == 1]
-		waiting2_times = [event.waiting_time for event in responses if event.job.priority == 2]
-
-		S1 = 0 if len(job1_sizes) == 0 else sum(job1_sizes)/len(job1_sizes)
-		S2 = 0 if len(job2_sizes) == 0 else sum(job2_sizes)/len(job2_sizes)
-
-		T1 = 0 if len(response1_times) == 0 else sum(response1_times)/len(response1_times)
-		T2 = 0 if len(response2_times) == 0 else sum(response2_times)/len(response2_times)
-
-		TQ1 = 0 if len(waiting1_times) == 0 else sum(waiting1_times)/len(waiting1_times)
-		TQ2 = 0 if len(waiting2_times) == 0 else sum(waiting2_times)/len(waiting2_times)
-
-		N1 = 0 if len(num_jobs1_seen) == 0 else sum(num_jobs1_seen)/len(num_jobs1_seen)
-		N2 = 0 if len(num_jobs2_seen) == 0 else sum(num_jobs2_seen)/len(num_jobs2_seen)
-
-		timeBetweenJob1 = 0 if len(self.server.time_between_job1s) == 0 else sum(self.server.time_between_job1s)/len(self.server.time_between_job1s)
-		timeBetweenJob2 = 0 if len(self.server.time_between_job2s) == 0 else sum(self.server.time_between_job2s)/len(self.server.time_between_job2s)
-
-		return statistic.BasicNPStatistic(T1, T2, TQ1, TQ2, S1, S2, N1, N2, timeBetweenJob1, timeBetweenJob2)
-	def simulate(self):
+		stats = self.stats
+		if self.profiler is not None:
+			self.profiler.start_run(self)
+		while stats.response1_times.count < self.num_jobs_per_run or stats.response2_times.count < self.num_jobs_per_run or self.time_between_job1.count < 300 or self.time_between_job2.count < 300:
+			self.step()
+		if self.profiler is not None:
+			self.profiler.end_run(self)
+
+		return statistic.BasicNPStatistic(stats.response1_times.mean, stats.response2_times.mean, stats.waiting1_times.mean, stats.waiting2_times.mean,
+										  stats.job1_sizes.mean, stats.job2_sizes.mean, *stats.mean_jobs(),
+										  self.servers.time_between_job1s.mean, self.servers.time_between_job2s.mean, stats.interarrival_times.mean,
+										  collectors.truncations(stats))
+	def precision_metrics(self, run_result):
+		# Metrics checked against a relative precision target
+		return {'T1': run_result.T1, 'T2': run_result.T2, 'mixingTime1': run_result.job1MixingTime, 'mixingTime2': run_result.job2MixingTime}
+
+	def simulate(self, workers=1, chunk_size=None, seed=None, cache=None, rel_precision=None, time_budget=None, truncate_warmup=False, antithetic=False, checkpoint=None, profile=False):
+		# Drop each run's warm-up (MSER-5) before averaging, or average whole runs
+		self.stat_type = statistic.MSERStat if truncate_warmup else statistic.RunningStat
+		# Per-replication and ensemble profile left in self.profile (None unless profile)
+		self.profiler = profiling.Profiler() if profile else None
 		t1_runs = []
 		t2_runs = []
 		tq1_runs = []
@@ -204,8 +187,9 @@ class NPPrioritySystem():
 		s2_runs = []
 		mt1_runs = []
 		mt2_runs = []
-		for i in range(self.num_runs):
-			res = self.simulate_run()
+		a_runs = []
+		truncated_runs = []
+		for res in ensemble.run_system(self, seed, workers, chunk_size, cache=cache, rel_precision=rel_precision, time_budget=time_budget, antithetic=antithetic, checkpoint=checkpoint):
 			t1_runs.append(res.T1)
 			t2_runs.append(res.T2)
 			tq1_runs.append(res.TQ1)
@@ -216,6 +200,14 @@ class NPPrioritySystem():
 			s2_runs.append(res.S2)
 			mt1_runs.append(res.job1MixingTime)
 			mt2_runs.append(res.job2MixingTime)
-			progress(i, self.num_runs)
-		
-		return statistic.BasicNPResults(t1_runs, t2_runs, tq1_runs, tq2_runs, s1_runs, s2_runs, n1_runs, n2_runs, mixingTime1=mt1_runs, mixingTime2=mt2_runs)
\ No newline at end of file
+			a_runs.append(res.A)
+			truncated_runs.append(res.truncated)
+		# Per-run MSER truncation points (None entries without truncate_warmup)
+		self.truncated = truncated_runs
+
+		# Response times and numbers in system controlled by the sampled sizes and inter-arrival times
+		runs = {'T1': t1_runs, 'T2': t2_runs, 'TQ1': tq1_runs, 'TQ2': tq2_runs, 'N1': n1_runs, 'N2': n2_runs, 'S1': s1_runs, 'S2': s2_runs, 'A': a_runs}
+		controls = {'S1': self.arrivals.size1.mean, 'S2': self.arrivals.size2.mean, 'A': 1/self.arrivals.arrival_rate}
+		controlled = statistic.controlled_estimates(runs, ['T1', 'T2', 'TQ1', 'TQ2', 'N1', 'N2'], controls)
+		return statistic.BasicNPResults(t1_runs, t2_runs, tq1_runs, tq2_runs, s1_runs, s2_runs, n1_runs, n2_runs, mixingTime1=mt1_runs, mixingTime2=mt2_runs,
+										As=a_runs, controlled=controlled, truncated=truncated_runs)
\ No newline at end of file
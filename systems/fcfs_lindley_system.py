@@ -0,0 +1,70 @@
+import numpy as np
+import util.arrivals as arrivals
+import util.ensemble as ensemble
+
+# Vectorized M/M/1 FCFS engine. With a single FCFS server the departure times follow
+# the Lindley recursion d_i = max(d_{i-1}, a_i) + s_i, which unrolls to
+# d_i = C_i + max_{k<=i}(a_k - C_{k-1}) with C the running sum of sizes, so a whole
+# run is a few cumulative array operations instead of a Python loop per event.
+# Many replications are computed at once as the rows of 2-D arrays.
+class LindleyFCFSSystem():
+	def __init__(self, num_runs, num_jobs_per_run, lambda_, mu, seed=None):
+		self.num_runs = num_runs
+		self.num_jobs_per_run = num_jobs_per_run
+		# Model parameters, used to key cached results
+		self.params = (lambda_, mu)
+		self.arrival_rate = lambda_
+		self.mu = mu
+		self.reset(seed)
+
+	def reset(self, seed=None):
+		self.seed = seed
+
+	def simulate_runs(self, num_runs, seed):
+		# Mean response time and time-average number in system over [0, last departure]
+		# for num_runs replications driven by one generator: all sizes are drawn as one
+		# (num_runs, num_jobs_per_run) array, then inter-arrival times as further columns
+		n = self.num_jobs_per_run
+		rng = arrivals.make_rng(ensemble.seed_sequence(seed))
+		sizes = rng.exponential(1.0/self.mu, (num_runs, n))
+
+		# Arrivals after the n-th only matter while they are in the system before the
+		# n-th departure; draw more until every run has an arrival past that point
+		extra = max(64, n//4)
+		interarrivals = rng.exponential(1.0/self.arrival_rate, (num_runs, n + extra))
+		size_sums = np.cumsum(sizes, axis=1)
+		while True:
+			arrival_times = np.zeros_like(interarrivals)
+			np.cumsum(interarrivals[:, :-1], axis=1, out=arrival_times[:, 1:])
+			depart_times = size_sums + np.maximum.accumulate(arrival_times[:, :n] - (size_sums - sizes), axis=1)
+			last_depart = depart_times[:, -1]
+			if np.all(arrival_times[:, -1] >= last_depart):
+				break
+			interarrivals = np.concatenate([interarrivals, rng.exponential(1.0/self.arrival_rate, (num_runs, extra))], axis=1)
+
+		response_times = depart_times - arrival_times[:, :n]
+
+		# Area under N(t): the first n jobs are in the system for their whole response
+		# time, later arrivals from their arrival until the n-th departure
+		late_time = np.clip(last_depart[:, None] - arrival_times[:, n:], 0.0, None)
+		area = response_times.sum(axis=1) + late_time.sum(axis=1)
+
+		return response_times.mean(axis=1), area/last_depart
+
+	def simulate_run(self):
+		T, N = self.simulate_runs(1, self.seed)
+		return (T[0], N[0])
+
+	def simulate(self, seed=None, runs_per_batch=256):
+		# Same (T_runs, N_runs) as FCFSSystem.simulate. Replications are computed
+		# runs_per_batch at a time, batch b on child b of the master seed, so the output
+		# is deterministic for a given seed and runs_per_batch.
+		master = ensemble.seed_sequence(seed)
+		T_runs = []
+		N_runs = []
+		for b, start in enumerate(range(0, self.num_runs, runs_per_batch)):
+			num_runs = min(runs_per_batch, self.num_runs - start)
+			T, N = self.simulate_runs(num_runs, ensemble.child_seed(master, b))
+			T_runs.extend(T.tolist())
+			N_runs.extend(N.tolist())
+		return T_runs, N_runs
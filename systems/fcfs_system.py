@@ -1,64 +1,107 @@
 import util.arrivals as arrivals
-import util.server as server
+import util.server_pool as server_pool
 import util.queue as queue
-import analysis.events as events
+import util.ensemble as ensemble
+import util.profiling as profiling
+import analysis.collectors as collectors
+import analysis.statistic as statistic
 
 class FCFSSystem():
-	def __init__(self, num_runs, num_jobs_per_run, lambda_, mu):
-		self.time = 0
+	def __init__(self, num_runs, num_jobs_per_run, lambda_, mu, num_servers=1, seed=None):
 		self.num_runs = num_runs
 		self.num_jobs_per_run = num_jobs_per_run
-		self.server = server.Server()
-		self.queue = queue.FCFSQueue()
+		self.num_servers = num_servers
+		# Model parameters, used to key cached results
+		self.params = (lambda_, mu, num_servers)
 		self.arrivals = arrivals.Arrivals(lambda_, mu)
+		# Accumulator for the run statistics (statistic.BatchMeans in batch-means mode)
+		self.stat_type = statistic.RunningStat
+		# Collectors attached with add_collector (e.g. tracing), fed alongside the statistics
+		self.extra_collectors = []
+		# util.profiling.Profiler instrumenting the runs, if any (see simulate(profile=True))
+		self.profiler = None
+		self.reset(seed)
 
-	def step(self):
-		if self.server.time_next_depart() <= self.arrivals.time_next_arrive:
-			# Complete the job in the server
-			self.time = self.server.time_next_depart()
-			completed_job = self.server.complete()
+	def reset(self, seed=None, pair_member=None):
+		# Empty system at time 0 driven by fresh random streams
+		# (pair_member 0 or 1: one run of an antithetic pair, see BlockArrivals.exponentials)
+		self.time = 0
+		self.arrivals.reset(ensemble.spawn_streams(seed, 1)[0], pair_member)
+		self.servers = server_pool.ServerPool(self.num_servers)
+		self.queue = queue.FCFSQueue()
+		# Running statistics, updated by the collector once per departure
+		self.stats = collectors.FCFSCollector(self.stat_type)
+		self.collectors = [self.stats] + self.extra_collectors
+
+	def add_collector(self, collector):
+		# collector.arrival(...) and collector.depart(...) are called on every later event, this run and the next
+		self.extra_collectors.append(collector)
+		self.collectors.append(collector)
 
-			# Pop job from queue and push to server
-			new_job_to_serve = self.queue.pop()
+	def handle_service(self):
+		# Complete the job in the server
+		self.time = self.servers.time_next_depart()
+		completed_job = self.servers.complete()
 
-			if new_job_to_serve is not None:
-				self.server.push(new_job_to_serve, self.time)
+		# Pop job from queue and push to server
+		new_job_to_serve = self.queue.pop()
 
-			# Get num jobs in system
-			num_jobs = self.queue.num_jobs() + self.server.num_jobs()
+		if new_job_to_serve is not None:
+			new_job_to_serve.start_service_time = self.time
+			self.servers.push(new_job_to_serve, self.time)
 
-			return events.DepartEvent(self.time, self.time - completed_job.arrival_time, num_jobs, completed_job)
-		# Otherwise is arrival
+		# Get num jobs in system
+		num_jobs = self.queue.num_jobs() + self.servers.num_jobs()
+
+		for collector in self.collectors:
+			collector.depart(self.time, self.time - completed_job.arrival_time, num_jobs, completed_job)
+
+	def handle_arrival(self):
 		self.time = self.arrivals.time_next_arrive
 		_, job_arrive = self.arrivals.arrive()
 
-		if self.server.num_jobs() == 0:
-			self.server.push(job_arrive, self.time)
+		if self.servers.has_idle():
+			job_arrive.start_service_time = self.time
+			self.servers.push(job_arrive, self.time)
 		else:
 			self.queue.push(job_arrive)
 
-		return events.ArrivalEvent(self.time)
+		for collector in self.collectors:
+			collector.arrival(self.time)
+
+	def step(self):
+		if self.servers.time_next_depart() <= self.arrivals.time_next_arrive:
+			self.handle_service()
+		else:
+			self.handle_arrival()
 
 	def simulate_run(self):
-		num_completions = 0
-		responses = []
-		while num_completions < self.num_jobs_per_run:
-			event = self.step()
-			if isinstance(event, events.DepartEvent):
-				num_completions += 1
-				responses.append(event)
+		stats = self.stats
+		if self.profiler is not None:
+			self.profiler.start_run(self)
+		while stats.response_times.count < self.num_jobs_per_run:
+			self.step()
+		if self.profiler is not None:
+			self.profiler.end_run(self)
 
-		response_times = [event.response_time for event in responses]
-		num_jobs_seen = [event.num_jobs_seen for event in responses]
+		return (stats.response_times.mean, stats.mean_jobs(), collectors.truncations(stats))
 
-		return (sum(response_times)/len(response_times),
-		 sum(num_jobs_seen)/len(num_jobs_seen))
+	def precision_metrics(self, run_result):
+		# Metrics checked against a relative precision target
+		return {'T': run_result[0], 'N': run_result[1]}
 
-	def simulate(self):
+	def simulate(self, workers=1, chunk_size=None, seed=None, cache=None, rel_precision=None, time_budget=None, truncate_warmup=False, antithetic=False, checkpoint=None, profile=False):
+		# Drop each run's warm-up (MSER-5) before averaging, or average whole runs
+		self.stat_type = statistic.MSERStat if truncate_warmup else statistic.RunningStat
+		# Per-replication and ensemble profile left in self.profile (None unless profile)
+		self.profiler = profiling.Profiler() if profile else None
 		T_runs = []
 		N_runs = []
-		for i in range(self.num_runs):
-			avg_response_time, avg_jobs_seen = self.simulate_run()
+		truncated_runs = []
+		for avg_response_time, avg_jobs_seen, truncated in ensemble.run_system(self, seed, workers, chunk_size, show_progress=False, cache=cache, rel_precision=rel_precision, time_budget=time_budget, antithetic=antithetic, checkpoint=checkpoint):
 			T_runs.append(avg_response_time)
 			N_runs.append(avg_jobs_seen)
+			truncated_runs.append(truncated)
+		# Per-run MSER truncation points (None entries without truncate_warmup)
+		self.truncated = truncated_runs
 		return T_runs, N_runs
\ No newline at end of file
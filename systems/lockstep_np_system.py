@@ -0,0 +1,294 @@
+import numpy as np
+import util.arrivals as arrivals
+import util.ensemble as ensemble
+import analysis.statistic as statistic
+import analysis.analytic as analytic
+
+INITIAL_QUEUE_CAPACITY = 64
+VARIATE_POOL_SIZE = 1 << 16
+
+# Advances num_runs independent replications of a two-class non-preemptive priority
+# queue together. All state (queue contents, server, clocks, running sums) is held in
+# arrays with one entry per replication, and every step processes the next event of
+# every unfinished replication with a fixed number of vectorized operations, so the
+# per-event interpreter overhead is paid once per step for the whole ensemble.
+#
+# Queue 0 has strict priority over queue 1. Without switching a job waits in the queue
+# of its class; with switching it waits in the queue of its final class (A or B).
+# Per-class arrays are indexed by class (1, 2), with row 0 unused.
+class LockstepEngine():
+	def __init__(self, num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, stay_prob=None, seed=None):
+		self.num_runs = num_runs
+		self.num_jobs_per_run = num_jobs_per_run
+		self.lambda_ = lambda1 + lambda2
+		self.is_class_1_prob = lambda1/self.lambda_
+		self.mean_sizes = np.array([np.nan, 1.0/mu1, 1.0/mu2])
+		self.params = (lambda1, lambda2, mu1, mu2, stay_prob)
+		self.stay_prob = stay_prob
+		self.switching = stay_prob is not None
+		self.seed = seed
+
+	def reset(self, seed=None):
+		R = self.num_runs
+		self.rng = arrivals.make_rng(ensemble.seed_sequence(seed))
+		self.pools = {}
+
+		self.time_next_arrive = np.zeros(R)
+		self.time_next_depart = np.full(R, np.inf)
+
+		# Job in service
+		self.serving_arrival = np.zeros(R)
+		self.serving_size = np.zeros(R)
+		self.serving_class = np.zeros(R, dtype=np.int64)
+		self.serving_final = np.zeros(R, dtype=np.int64)
+		self.serving_start = np.zeros(R)
+
+		# Ring-buffer FCFS queues indexed by (queue, replication, slot); the capacity is a
+		# power of two so wrapping is a bitwise and
+		self.capacity = INITIAL_QUEUE_CAPACITY
+		self.queue_arrival = np.zeros((2, R, self.capacity))
+		self.queue_size = np.zeros((2, R, self.capacity))
+		self.queue_class = np.zeros((2, R, self.capacity), dtype=np.int64)
+		self.heads = np.zeros((2, R), dtype=np.int64)
+		self.lengths = np.zeros((2, R), dtype=np.int64)
+
+		# Number in system: rows 1, 2 by class and rows 3, 4 by final class (A, B), integrated
+		# over time between events as in statistic.TimeAverage
+		self.num_in_system = np.zeros((5, R), dtype=np.int64)
+		self.num_in_system_area = np.zeros((5, R))
+		self.last_event_time = np.zeros(R)
+
+		# Arrivals so far and the time of the last one, for the mean inter-arrival time
+		self.arrivals_seen = np.zeros(R, dtype=np.int64)
+		self.last_arrival_time = np.zeros(R)
+
+		# Running sums by class and by final class
+		self.completions = np.zeros((3, R), dtype=np.int64)
+		self.response_sum = np.zeros((3, R))
+		self.waiting_sum = np.zeros((3, R))
+		self.size_sum = np.zeros((3, R))
+		self.completions_final = np.zeros((3, R), dtype=np.int64)
+		self.response_final_sum = np.zeros((3, R))
+		self.size_final_sum = np.zeros((3, R))
+
+		# Time between services of the same class (Server.time_between_job*s)
+		self.last_served = np.full((3, R), np.nan)
+		self.between_count = np.zeros((3, R), dtype=np.int64)
+		self.between_sum = np.zeros((3, R))
+		self.between_sum_squares = np.zeros((3, R))
+
+		# Changes of the served class, which NPPrioritySystem also waits for
+		self.last_served_class = np.zeros(R, dtype=np.int64)
+		self.have_seen_class = np.zeros((3, R), dtype=bool)
+		self.class_switches = np.zeros((3, R), dtype=np.int64)
+
+	def draw(self, kind, k):
+		# Next k variates of one kind ('uniform' or 'exponential' for each use), drawn
+		# from the ensemble's generator VARIATE_POOL_SIZE at a time
+		pool, pos = self.pools.get(kind, (None, VARIATE_POOL_SIZE))
+		if pos + k > VARIATE_POOL_SIZE:
+			if kind.endswith('uniform'):
+				pool = self.rng.random(VARIATE_POOL_SIZE)
+			else:
+				pool = self.rng.standard_exponential(VARIATE_POOL_SIZE)
+			pos = 0
+		self.pools[kind] = (pool, pos + k)
+		return pool[pos:pos + k]
+
+	def grow_queues(self):
+		# Double the ring buffers, unwrapping each row so its head moves to slot 0
+		order = (self.heads[:, :, None] + np.arange(self.capacity)) & (self.capacity - 1)
+		for name in ['queue_arrival', 'queue_size', 'queue_class']:
+			old = getattr(self, name)
+			grown = np.zeros(old.shape[:2] + (2*self.capacity,), dtype=old.dtype)
+			grown[:, :, :self.capacity] = np.take_along_axis(old, order, axis=2)
+			setattr(self, name, grown)
+		self.heads[:] = 0
+		self.capacity *= 2
+
+	def start_service(self, rows, now):
+		# Rows whose server is idle take the head of the highest-priority nonempty queue
+		start = np.isinf(self.time_next_depart[rows]) & (self.lengths[0, rows] + self.lengths[1, rows] > 0)
+		rows = rows[start]
+		if len(rows) == 0:
+			return
+		now = now[start]
+		q = (self.lengths[0, rows] == 0).astype(np.int64)
+		head = self.heads[q, rows]
+		size = self.queue_size[q, rows, head]
+		job_class = self.queue_class[q, rows, head]
+
+		self.serving_arrival[rows] = self.queue_arrival[q, rows, head]
+		self.serving_size[rows] = size
+		self.serving_class[rows] = job_class
+		self.serving_final[rows] = q + 1 if self.switching else job_class
+		self.serving_start[rows] = now
+		self.time_next_depart[rows] = now + size
+		self.heads[q, rows] = (head + 1) & (self.capacity - 1)
+		self.lengths[q, rows] -= 1
+
+		# Time since the last job of this class finished service
+		gap = now - self.last_served[job_class, rows]
+		seen = ~np.isnan(gap)
+		self.between_count[job_class, rows] += seen
+		self.between_sum[job_class, rows] += np.where(seen, gap, 0.0)
+		self.between_sum_squares[job_class, rows] += np.where(seen, gap*gap, 0.0)
+		self.last_served[job_class, rows] = now + size
+
+		if not self.switching:
+			# A new run of jobs of this class begins
+			previous = self.last_served_class[rows]
+			changed = (previous != job_class) & (previous != 0)
+			self.class_switches[job_class, rows] += changed & self.have_seen_class[job_class, rows]
+			self.have_seen_class[job_class, rows] |= changed
+			self.last_served_class[rows] = job_class
+
+	def advance(self, rows, now):
+		# Area under the numbers in system since the previous event of each row
+		self.num_in_system_area[:, rows] += self.num_in_system[:, rows]*(now - self.last_event_time[rows])
+		self.last_event_time[rows] = now
+
+	def handle_service(self, rows):
+		now = self.time_next_depart[rows]
+		self.advance(rows, now)
+		job_class = self.serving_class[rows]
+		job_final = self.serving_final[rows]
+		arrival = self.serving_arrival[rows]
+		response = now - arrival
+		size = self.serving_size[rows]
+
+		self.completions[job_class, rows] += 1
+		self.response_sum[job_class, rows] += response
+		self.waiting_sum[job_class, rows] += self.serving_start[rows] - arrival
+		self.size_sum[job_class, rows] += size
+		self.num_in_system[job_class, rows] -= 1
+		if self.switching:
+			self.completions_final[job_final, rows] += 1
+			self.response_final_sum[job_final, rows] += response
+			self.size_final_sum[job_final, rows] += size
+			self.num_in_system[job_final + 2, rows] -= 1
+
+		self.time_next_depart[rows] = np.inf
+		self.start_service(rows, now)
+
+	def handle_arrival(self, rows):
+		now = self.time_next_arrive[rows]
+		k = len(rows)
+
+		self.advance(rows, now)
+		self.arrivals_seen[rows] += 1
+		self.last_arrival_time[rows] = now
+
+		# Generate the new jobs and the next arrival times
+		job_class = np.where(self.draw('class uniform', k) < self.is_class_1_prob, 1, 2)
+		size = self.draw('size exponential', k)*self.mean_sizes[job_class]
+		self.time_next_arrive[rows] += self.draw('interarrival exponential', k)/self.lambda_
+		self.num_in_system[job_class, rows] += 1
+		if self.switching:
+			job_final = np.where(self.draw('stay uniform', k) < self.stay_prob, job_class, 3 - job_class)
+			self.num_in_system[job_final + 2, rows] += 1
+		else:
+			job_final = job_class
+
+		# Push to the back of the queue of the final class
+		q = job_final - 1
+		if np.any(self.lengths[q, rows] == self.capacity):
+			self.grow_queues()
+		tail = (self.heads[q, rows] + self.lengths[q, rows]) & (self.capacity - 1)
+		self.queue_arrival[q, rows, tail] = now
+		self.queue_size[q, rows, tail] = size
+		self.queue_class[q, rows, tail] = job_class
+		self.lengths[q, rows] += 1
+
+		self.start_service(rows, now)
+
+	def is_done(self, rows):
+		n = self.num_jobs_per_run
+		done = (self.completions[1, rows] >= n) & (self.completions[2, rows] >= n)
+		if not self.switching:
+			done &= (self.class_switches[1, rows] >= 300) & (self.class_switches[2, rows] >= 300)
+		return done
+
+	def run(self, seed=None):
+		self.reset(seed)
+		active = np.arange(self.num_runs)
+		while len(active) > 0:
+			# Arrivals come first on ties, as in the event-driven systems
+			is_arrival = self.time_next_arrive[active] <= self.time_next_depart[active]
+			arriving = active[is_arrival]
+			departing = active[~is_arrival]
+			if len(arriving) > 0:
+				self.handle_arrival(arriving)
+			if len(departing) > 0:
+				self.handle_service(departing)
+				done = self.is_done(departing)
+				if np.any(done):
+					active = np.setdiff1d(active, departing[done], assume_unique=True)
+
+	def means(self, sums, counts):
+		return np.where(counts > 0, sums/np.maximum(counts, 1), 0.0)
+
+	def mean_jobs(self):
+		# Time-average numbers in system over [0, last event] (rows as num_in_system)
+		return self.means(self.num_in_system_area, np.broadcast_to(self.last_event_time, self.num_in_system_area.shape))
+
+	def mean_interarrival(self):
+		# Mean of the inter-arrival times sampled by each run; the first arrival is at time 0
+		return self.means(self.last_arrival_time, self.arrivals_seen - 1)
+
+	def between_stats(self, c):
+		# Mean and population variance of the time between class c services
+		count = self.between_count[c]
+		mean = self.means(self.between_sum[c], count)
+		variance = self.means(self.between_sum_squares[c], count) - mean*mean
+		return mean, np.maximum(variance, 0.0)
+
+class LockstepNPSystem(LockstepEngine):
+	def __init__(self, num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, seed=None):
+		super().__init__(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, None, seed)
+
+	def simulate(self, seed=None):
+		# Same BasicNPResults as NPPrioritySystem.simulate; deterministic for a given seed and num_runs
+		self.run(self.seed if seed is None else seed)
+		T = self.means(self.response_sum, self.completions)
+		TQ = self.means(self.waiting_sum, self.completions)
+		S = self.means(self.size_sum, self.completions)
+		N = self.mean_jobs()
+		A = self.mean_interarrival()
+		mixing_time1, _ = self.between_stats(1)
+		mixing_time2, _ = self.between_stats(2)
+
+		# Control-variate estimates as in NPPrioritySystem.simulate
+		runs = {'T1': T[1].tolist(), 'T2': T[2].tolist(), 'TQ1': TQ[1].tolist(), 'TQ2': TQ[2].tolist(), 'N1': N[1].tolist(), 'N2': N[2].tolist(),
+				'S1': S[1].tolist(), 'S2': S[2].tolist(), 'A': A.tolist()}
+		controls = {'S1': self.mean_sizes[1], 'S2': self.mean_sizes[2], 'A': 1/self.lambda_}
+		controlled = statistic.controlled_estimates(runs, ['T1', 'T2', 'TQ1', 'TQ2', 'N1', 'N2'], controls)
+		return statistic.BasicNPResults(runs['T1'], runs['T2'], runs['TQ1'], runs['TQ2'], runs['S1'], runs['S2'], runs['N1'], runs['N2'],
+										mixingTime1=mixing_time1.tolist(), mixingTime2=mixing_time2.tolist(), As=runs['A'], controlled=controlled)
+
+class LockstepSwitchingSystem(LockstepEngine):
+	def __init__(self, num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, stay_prob, seed=None):
+		super().__init__(num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, stay_prob, seed)
+
+	def simulate(self, seed=None):
+		# Same SwitchingResults as SwitchingNPSystem.simulate; deterministic for a given seed and num_runs
+		self.run(self.seed if seed is None else seed)
+		T = self.means(self.response_sum, self.completions)
+		T_final = self.means(self.response_final_sum, self.completions_final)
+		S_final = self.means(self.size_final_sum, self.completions_final)
+		N = self.mean_jobs()
+		A = self.mean_interarrival()
+		mixing_time1, var1 = self.between_stats(1)
+		mixing_time2, var2 = self.between_stats(2)
+
+		# Control-variate estimates as in SwitchingNPSystem.simulate
+		runs = {'T1': T[1].tolist(), 'T2': T[2].tolist(), 'TA': T_final[1].tolist(), 'TB': T_final[2].tolist(),
+				'N1': N[1].tolist(), 'N2': N[2].tolist(), 'NA': N[3].tolist(), 'NB': N[4].tolist(),
+				'SA': S_final[1].tolist(), 'SB': S_final[2].tolist(), 'A': A.tolist()}
+		lambda1, lambda2, mu1, mu2, stay_prob = self.params
+		expected = analytic.scalars(analytic.switching(lambda1, lambda2, mu1, mu2, stay_prob))
+		controls = {'SA': expected['SA'], 'SB': expected['SB'], 'A': 1/self.lambda_}
+		controlled = statistic.controlled_estimates(runs, ['T1', 'T2', 'TA', 'TB', 'N1', 'N2', 'NA', 'NB'], controls)
+		return statistic.SwitchingResults(runs['T1'], runs['T2'], runs['TA'], runs['TB'], runs['SA'], runs['SB'],
+										  runs['N1'], runs['N2'], runs['NA'], runs['NB'], mixing_time1.tolist(), mixing_time2.tolist(),
+										  var1.tolist(), var2.tolist(), As=runs['A'], controlled=controlled)
@@ -1,51 +1,67 @@
-from os import stat
 import util.arrivals as arrivals
-import util.server as server
-import sys
+import util.server_pool as server_pool
 import util.queue as queue
-import analysis.events as events
+import util.ensemble as ensemble
+import util.profiling as profiling
+import analysis.collectors as collectors
 import numpy as np
 import analysis.statistic as statistic
-
-def progress(count, total, status=''):
-	bar_len = 60
-	filled_len = int(round(bar_len * count / float(total)))
-
-	percents = round(100.0 * count / float(total), 1)
-	bar = '=' * filled_len + '-' * (bar_len - filled_len)
-
-	sys.stdout.write('[%s] %s%s ...%s\r' % (bar, percents, '%', status))
-	sys.stdout.flush()  # As suggested by Rom Ruben (see: http://stackoverflow.com/questions/3173320/text-progress-bar-in-the-console/27871113#comment50529068_27871113)
-
+import analysis.analytic as analytic
 
 class SwitchingNPSystem():
-	def __init__(self, num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, stay_prob):
+	def __init__(self, num_runs, num_jobs_per_run, lambda1, lambda2, mu1, mu2, stay_prob, num_servers=1, seed=None, source=None):
 		self.num_runs = num_runs
 		self.num_jobs_per_run = num_jobs_per_run
-		self.server = server.Server()
+		self.num_servers = num_servers
+		# Model parameters, used to key cached results
+		self.params = (lambda1, lambda2, mu1, mu2, stay_prob, num_servers)
+		# Poisson arrivals with sampled sizes, or a replacement stream such as
+		# util.trace.TraceArrivals replaying recorded arrivals
+		if source is None:
+			self.arrivals = arrivals.SwitchingPriorityArrivals(lambda1, lambda2, mu1, mu2, stay_prob)
+		else:
+			self.arrivals = source
+			self.params += (source,)
+		self.stay_prob = stay_prob
+		# Known mean sizes of final class A and B jobs, the controls of the control-variate estimates
+		expected = analytic.scalars(analytic.switching(lambda1, lambda2, self.arrivals.size1.rate, self.arrivals.size2.rate, stay_prob))
+		self.expected_SA = expected['SA']
+		self.expected_SB = expected['SB']
+		# Accumulator for the run statistics (statistic.BatchMeans in batch-means mode)
+		self.stat_type = statistic.RunningStat
+		# Collectors attached with add_collector (e.g. tracing), fed alongside the statistics
+		self.extra_collectors = []
+		# util.profiling.Profiler instrumenting the runs, if any (see simulate(profile=True))
+		self.profiler = None
+		self.reset(seed)
+
+	def reset(self, seed=None, pair_member=None):
+		# Empty system at time 0 driven by fresh random streams
+		# (pair_member 0 or 1: one run of an antithetic pair, see BlockArrivals.exponentials)
+		self.arrivals.reset(ensemble.spawn_streams(seed, 1)[0], pair_member)
+		self.servers = server_pool.ServerPool(self.num_servers)
 		self.queueA = queue.FCFSQueue()
 		self.queueB = queue.FCFSQueue()
-		self.arrivals = arrivals.SwitchingPriorityArrivals(lambda1, lambda2, mu1, mu2, stay_prob)
-		self.stay_prob = stay_prob
+		# Running statistics by class and by final class, updated by the collector once per event
+		self.stats = collectors.SwitchingCollector(self.stat_type)
+		self.collectors = [self.stats] + self.extra_collectors
 
-		self.time_between_job1 = []
-		self.time_between_job2 = []
+		self.time_between_job1 = statistic.RunningStat()
+		self.time_between_job2 = statistic.RunningStat()
 		self.last_served_class = None
 		self.last_served_class_time = None
 		self.have_seen_class2 = False
 		self.have_seen_class1 = False
 
-	def handle_service(self):
-		# Get num jobs in system by adding up across the queues
-		num1_jobs = self.queueA.num_jobs_priority(1) + self.queueB.num_jobs_priority(1)
-		num2_jobs = self.queueA.num_jobs_priority(2) + self.queueB.num_jobs_priority(2)
-
-		numA_jobs = self.queueA.num_jobs()
-		numB_jobs = self.queueB.num_jobs()
+	def add_collector(self, collector):
+		# collector.arrival(...) and collector.depart(...) are called on every later event, this run and the next
+		self.extra_collectors.append(collector)
+		self.collectors.append(collector)
 
+	def handle_service(self):
 		# Finish job
-		curr_time = self.server.time_next_depart()
-		completed_job = self.server.complete()
+		curr_time = self.servers.time_next_depart()
+		completed_job = self.servers.complete()
 
 		# Pop job from queue and push to server; class A has strict priority so try popping from there first
 		if (self.queueA.num_jobs() != 0):
@@ -63,14 +79,14 @@ class SwitchingNPSystem():
 					# Finished a run of class 2 jobs
 					if self.have_seen_class1:
 						time_diff = curr_time - self.last_served_class_time
-						self.time_between_job1.append(time_diff)
+						self.time_between_job1.add(time_diff)
 					self.have_seen_class1 = True
 				
 				elif self.last_served_class == 1:
 					# Finished a run of class 1 jobs
 					if self.have_seen_class2:
 						time_diff = curr_time - self.last_served_class_time
-						self.time_between_job2.append(time_diff)
+						self.time_between_job2.add(time_diff)
 					self.have_seen_class2 = True
 
 				# New run starts after this job finishes, as it was the last time we served a job like it
@@ -78,13 +94,20 @@ class SwitchingNPSystem():
 				self.last_served_class = new_job_to_serve.priority
 			
 			new_job_to_serve.start_service_time = curr_time
-			self.server.push(new_job_to_serve, curr_time)
+			self.servers.push(new_job_to_serve, curr_time)
+
+		# Num jobs left in system by adding up across the queues and servers
+		num1_jobs = self.queueA.num_jobs_priority(1) + self.queueB.num_jobs_priority(1) + self.servers.num_jobs_priority(1)
+		num2_jobs = self.queueA.num_jobs_priority(2) + self.queueB.num_jobs_priority(2) + self.servers.num_jobs_priority(2)
+
+		numA_jobs = self.queueA.num_jobs() + self.servers.num_jobs_final_priority(1)
+		numB_jobs = self.queueB.num_jobs() + self.servers.num_jobs_final_priority(2)
 
 		waiting_time = completed_job.start_service_time - completed_job.arrival_time
 		assert(abs(waiting_time - (curr_time - completed_job.arrival_time - completed_job.size)) <= 0.001)
 
-		return events.SwitchingPriorityDepartEvent(curr_time, curr_time - completed_job.arrival_time, num1_jobs,
-			   num2_jobs, numA_jobs, numB_jobs, waiting_time, completed_job)
+		for collector in self.collectors:
+			collector.depart(curr_time, curr_time - completed_job.arrival_time, num1_jobs, num2_jobs, numA_jobs, numB_jobs, waiting_time, completed_job)
 
 	def handle_arrival(self):
 		curr_time = self.arrivals.time_next_arrive
@@ -92,20 +115,20 @@ class SwitchingNPSystem():
 		job_arrive = self.arrivals.arrive()
 
 		# Get class 1 jobs and class 2 jobs across both queues
-		num1_jobs = self.queueA.num_jobs_priority(1) + self.queueB.num_jobs_priority(1) + self.server.num_jobs_priority(1)
-		num2_jobs = self.queueA.num_jobs_priority(2) + self.queueB.num_jobs_priority(2) + self.server.num_jobs_priority(2)
+		num1_jobs = self.queueA.num_jobs_priority(1) + self.queueB.num_jobs_priority(1) + self.servers.num_jobs_priority(1)
+		num2_jobs = self.queueA.num_jobs_priority(2) + self.queueB.num_jobs_priority(2) + self.servers.num_jobs_priority(2)
 
 		# Get class A jobs and class B jobs
-		numA_jobs = self.queueA.num_jobs() + self.server.num_jobs_final_priority(1)
-		numB_jobs = self.queueB.num_jobs() + self.server.num_jobs_final_priority(2)
+		numA_jobs = self.queueA.num_jobs() + self.servers.num_jobs_final_priority(1)
+		numB_jobs = self.queueB.num_jobs() + self.servers.num_jobs_final_priority(2)
 
 		if job_arrive.final_priority == 1:
 			self.queueA.push(job_arrive)
 		else:
 			self.queueB.push(job_arrive)
 
-		if self.server.num_jobs() == 0:
-			# Server is idle right now, so take a new job if possible
+		if self.servers.has_idle():
+			# A server is idle right now, so take a new job if possible
 			# class A has strict priority
 			next_job = None
 			if self.queueA.num_jobs() != 0:
@@ -115,7 +138,7 @@ class SwitchingNPSystem():
 
 			if next_job is not None:
 				next_job.start_service_time = curr_time
-				self.server.push(next_job, curr_time)
+				self.servers.push(next_job, curr_time)
 
 				# Update time between jobs
 				if next_job.priority != self.last_served_class:
@@ -123,125 +146,57 @@ class SwitchingNPSystem():
 						# Finished a run of class 2 jobs
 						if self.have_seen_class1:
 							time_diff = curr_time - self.last_served_class_time
-							self.time_between_job1.append(time_diff)
+							self.time_between_job1.add(time_diff)
 						self.have_seen_class1 = True
 					
 					elif self.last_served_class == 1:
 						# Finished a run of class 1 jobs
 						if self.have_seen_class2:
 							time_diff = curr_time - self.last_served_class_time
-							self.time_between_job2.append(time_diff)
+							self.time_between_job2.add(time_diff)
 						self.have_seen_class2 = True
 
 					# New run starts after this job finishes, as it was the last time we served a job like it
 					self.last_served_class_time = curr_time + next_job.size
 					self.last_served_class = next_job.priority
 
-		return events.SwitchingPriorityArrivalEvent(curr_time, num1_jobs, num2_jobs, numA_jobs, numB_jobs)
+		for collector in self.collectors:
+			collector.arrival(curr_time, num1_jobs, num2_jobs, numA_jobs, numB_jobs)
 
 	def step(self):
-		if self.arrivals.time_next_arrive <= self.server.time_next_depart():
+		if self.arrivals.time_next_arrive <= self.servers.time_next_depart():
 			# Arrival comes first
-			return self.handle_arrival()
-		if self.server.time_next_depart() <= self.arrivals.time_next_arrive:
+			self.handle_arrival()
+		else:
 			# Complete the job in the server before arrival can come
-			return self.handle_service()
+			self.handle_service()
 		
 
 	def simulate_run(self):
-		self.server = server.Server()
-		num_completions1 = 0
-		num_completions2 = 0
-
-		num_completionsA = 0
-		num_completionsB = 0
-
-		responses = []
-		waiting_times = []
-
-		num_jobs1_seen = []
-		num_jobs2_seen = []
-
-		num_jobsA_seen = []
-		num_jobsB_seen = []
-
-		jobA_sizes = []
-		jobB_sizes = []
-
-		# Start with first job and set up final priority
-		# new_job = self.arrivals.arrive()
-		# new_job.start_service_time = new_job.arrival_time
-		# self.last_served_class = new_job.priority
-		# self.last_served_class_time += new_job.size
-		# self.server.push(new_job, new_job.arrival_time)
-
-		self.time_between_job1 = []
-		self.time_between_job2 = []
-		self.last_served_class = None
-		self.last_served_class_time = None
-		self.have_seen_class2 = False
-		self.have_seen_class1 = False
-
-		while num_completions1 < self.num_jobs_per_run or num_completions2 < self.num_jobs_per_run:
-			event = self.step()
-			if isinstance(event, events.SwitchingPriorityDepartEvent):
-				if event.job.priority == 1:
-					num_completions1 += 1
-				else:
-					num_completions2 += 1
-				if event.job.final_priority == 1:
-					num_completionsA += 1
-				else:
-					num_completionsB += 1
-				responses.append(event)
-				waiting_times.append(event)
-			else:
-				num_jobs1_seen.append(event.num1_jobs_seen)
-				num_jobs2_seen.append(event.num2_jobs_seen)
-				num_jobsA_seen.append(event.numA_jobs_seen)
-				num_jobsB_seen.append(event.numB_jobs_seen)
-		
-
-		# Computing SA and SB
-		jobA_sizes = [event.job.size for event in responses if event.job.final_priority == 1]
-		jobB_sizes = [event.job.size for event in responses if event.job.final_priority == 2]
-
-		SA = 0 if len(jobA_sizes) == 0 else sum(jobA_sizes)/len(jobA_sizes)
-		SB = 0 if len(jobB_sizes) == 0 else sum(jobB_sizes)/len(jobB_sizes)
-
-		# Computing T1 and T2
-		response1_times = [event.response_time for event in responses if event.job.priority == 1]
-		response2_times = [event.response_time for event in responses if event.job.priority == 2]
-
-		T1 = 0 if len(response1_times) == 0 else sum(response1_times)/len(response1_times)
-		T2 = 0 if len(response2_times) == 0 else sum(response2_times)/len(response2_times)
-
-		# Computing TA and TB
-		responseA_times = [event.response_time for event in responses if event.job.final_priority == 1]
-		responseB_times = [event.response_time for event in responses if event.job.final_priority == 2]
-
-		TA = 0 if len(responseA_times) == 0 else sum(responseA_times)/len(responseA_times)
-		TB = 0 if len(responseB_times) == 0 else sum(responseB_times)/len(responseB_times)
-
-		# Computing N1 and N2
-		N1 = 0 if len(num_jobs1_seen) == 0 else sum(num_jobs1_seen)/len(num_jobs1_seen)
-		N2 = 0 if len(num_jobs2_seen) == 0 else sum(num_jobs2_seen)/len(num_jobs2_seen)
-
-		# Computing NA and NB
-		NA = 0 if len(num_jobsA_seen) == 0 else sum(num_jobsA_seen)/len(num_jobsA_seen)
-		NB = 0 if len(num_jobsB_seen) == 0 else sum(num_jobsB_seen)/len(num_jobsB_seen)
-
-		job1times = np.array(self.server.time_between_job1s)
-		job2times = np.array(self.server.time_between_job2s)
-
-		timeBetweenJob1 = np.mean(job1times)
-		timeBetweenJob2 = np.mean(job2times)
-
-		varTimeBetweenJob1 = np.var(job1times)
-		varTimeBetweenJob2 = np.var(job2times)
-
-		return statistic.SwitchingStatistic(T1, T2, TA, TB, SA, SB, N1, N2, NA, NB, timeBetweenJob1, timeBetweenJob2, varTimeBetweenJob1, varTimeBetweenJob2)
-	def simulate(self):
+		stats = self.stats
+		if self.profiler is not None:
+			self.profiler.start_run(self)
+		while stats.response1_times.count < self.num_jobs_per_run or stats.response2_times.count < self.num_jobs_per_run:
+			self.step()
+		if self.profiler is not None:
+			self.profiler.end_run(self)
+
+		job1times = self.servers.time_between_job1s
+		job2times = self.servers.time_between_job2s
+
+		return statistic.SwitchingStatistic(stats.response1_times.mean, stats.response2_times.mean, stats.responseA_times.mean, stats.responseB_times.mean,
+											stats.jobA_sizes.mean, stats.jobB_sizes.mean, *stats.mean_jobs(), job1times.mean, job2times.mean,
+											job1times.variance(), job2times.variance(), stats.interarrival_times.mean, collectors.truncations(stats))
+	def precision_metrics(self, run_result):
+		# Metrics checked against a relative precision target
+		return {'T1': run_result.T1, 'T2': run_result.T2, 'TA': run_result.TA, 'TB': run_result.TB,
+				'mixingTime1': run_result.job1MixingTime, 'mixingTime2': run_result.job2MixingTime}
+
+	def simulate(self, workers=1, chunk_size=None, seed=None, cache=None, rel_precision=None, time_budget=None, truncate_warmup=False, antithetic=False, checkpoint=None, profile=False):
+		# Drop each run's warm-up (MSER-5) before averaging, or average whole runs
+		self.stat_type = statistic.MSERStat if truncate_warmup else statistic.RunningStat
+		# Per-replication and ensemble profile left in self.profile (None unless profile)
+		self.profiler = profiling.Profiler() if profile else None
 		t1_runs = []
 		t2_runs = []
 		tA_runs = []
@@ -256,8 +211,9 @@ class SwitchingNPSystem():
 		mt2_runs = []
 		var_mt1_runs = []
 		var_mt2_runs = []
-		for i in range(self.num_runs):
-			run_result = self.simulate_run()
+		a_runs = []
+		truncated_runs = []
+		for run_result in ensemble.run_system(self, seed, workers, chunk_size, cache=cache, rel_precision=rel_precision, time_budget=time_budget, antithetic=antithetic, checkpoint=checkpoint):
 			t1_runs.append(run_result.T1)
 			t2_runs.append(run_result.T2)
 			n1_runs.append(run_result.N1)
@@ -272,5 +228,15 @@ class SwitchingNPSystem():
 			mt2_runs.append(run_result.job2MixingTime)
 			var_mt1_runs.append(run_result.varJ1)
 			var_mt2_runs.append(run_result.varJ2)
-			progress(i, self.num_runs)
-		return statistic.SwitchingResults(t1_runs, t2_runs, tA_runs, tB_runs, sA_runs, sB_runs, n1_runs, n2_runs, nA_runs, nB_runs, mt1_runs, mt2_runs, var_mt1_runs, var_mt2_runs)
\ No newline at end of file
+			a_runs.append(run_result.A)
+			truncated_runs.append(run_result.truncated)
+		# Per-run MSER truncation points (None entries without truncate_warmup)
+		self.truncated = truncated_runs
+
+		# Response times and numbers in system controlled by the sampled final-class sizes and inter-arrival times
+		runs = {'T1': t1_runs, 'T2': t2_runs, 'TA': tA_runs, 'TB': tB_runs, 'N1': n1_runs, 'N2': n2_runs, 'NA': nA_runs, 'NB': nB_runs,
+				'SA': sA_runs, 'SB': sB_runs, 'A': a_runs}
+		controls = {'SA': self.expected_SA, 'SB': self.expected_SB, 'A': 1/self.arrivals.arrival_rate}
+		controlled = statistic.controlled_estimates(runs, ['T1', 'T2', 'TA', 'TB', 'N1', 'N2', 'NA', 'NB'], controls)
+		return statistic.SwitchingResults(t1_runs, t2_runs, tA_runs, tB_runs, sA_runs, sB_runs, n1_runs, n2_runs, nA_runs, nB_runs, mt1_runs, mt2_runs, var_mt1_runs, var_mt2_runs,
+										  As=a_runs, controlled=controlled, truncated=truncated_runs)
\ No newline at end of file
@@ -0,0 +1,25 @@
+import numpy as np
+import analysis.analytic as analytic
+
+def test_grid_evaluation_matches_single_points():
+	lambda1 = np.array([0.1, 0.3, 0.5])
+	grid = analytic.np_basic(lambda1, 0.2, 1, 2)
+	for i, l1 in enumerate(lambda1):
+		point = analytic.scalars(analytic.np_basic(l1, 0.2, 1, 2))
+		assert all(np.isclose(grid[name][i], value) for name, value in point.items())
+
+def test_unstable_points_are_nan():
+	values = analytic.np_basic(np.array([0.3, 0.9]), 0.4, 1, 2)
+	assert np.isfinite(values['T1'][0]) and np.isnan(values['T1'][1])
+
+def test_special_cases():
+	# Pollaczek-Khinchine with exponential sizes is M/M/1
+	exact = analytic.scalars(analytic.fcfs(0.7, 1))
+	assert np.isclose(exact['T'], 1/0.3)
+	assert np.isclose(analytic.scalars(analytic.fcfs(0.7, 1, 2.0))['T'], exact['T'])
+	# Every job keeping its class, or class 1 always first, is strict priority
+	strict = analytic.scalars(analytic.np_basic(0.3, 0.4, 1, 2))
+	switching = analytic.scalars(analytic.switching(0.3, 0.4, 1, 2, 1.0))
+	busy_period = analytic.scalars(analytic.busy_period(0.3, 0.4, 1, 2, 1.0))
+	for name in ('T1', 'T2', 'N1', 'N2'):
+		assert np.isclose(switching[name], strict[name]) and np.isclose(busy_period[name], strict[name])
@@ -0,0 +1,28 @@
+import numpy as np
+import analysis.statistic as statistic
+import systems.fcfs_system as fcfs_system
+import util.arrivals as arrivals
+import util.ensemble as ensemble
+
+def test_pair_members_use_complementary_uniforms():
+	source = arrivals.Arrivals(1.0, 1.0)
+	source.reset(3, 0)
+	u0, e0 = source.uniforms('size', 100), source.exponentials('interarrival', 100)
+	source.reset(3, 1)
+	u1, e1 = source.uniforms('size', 100), source.exponentials('interarrival', 100)
+	np.testing.assert_allclose(u0 + u1, 1.0)
+	# Both exponentials are inverse transforms of the same uniforms, so they move in opposite directions
+	assert np.corrcoef(e0, e1)[0, 1] < -0.5
+
+def test_average_pair():
+	assert ensemble.average_pair(((1.0, 3.0, None), (3.0, 5.0, None))) == (2.0, 4.0, None)
+	first = statistic.ServerSwitchStatistic(1, 2, 3, 4, 5, 6, 7, 8, {'response1_times': 10})
+	second = statistic.ServerSwitchStatistic(3, 4, 5, 6, 7, 8, 9, 10, {'response1_times': 20})
+	average = ensemble.average_pair((first, second))
+	assert (average.T1, average.S2, average.truncated) == (2, 9, {'response1_times': 15})
+
+def test_antithetic_pairs_reduce_variance():
+	system = fcfs_system.FCFSSystem(40, 2000, 0.5, 1)
+	T_runs, _ = system.simulate(seed=2, antithetic=True)
+	assert len(T_runs) == 20
+	assert system.antithetic_report['T'] < 0.9
@@ -0,0 +1,38 @@
+import numpy as np
+import util.arrivals as arrivals
+
+def draw(source, n):
+	jobs = [source.arrive() for _ in range(n)]
+	return [(job.arrival_time, job.size, job.priority) for job in jobs]
+
+def test_same_seed_same_jobs():
+	source = arrivals.PriorityArrivals(0.3, 0.4, 1, 2)
+	source.reset(7)
+	first = draw(source, 500)
+	source.reset(7)
+	assert draw(source, 500) == first
+	source.reset(8)
+	assert draw(source, 500) != first
+
+def test_block_size_does_not_change_the_stream():
+	small = arrivals.PriorityArrivals(0.3, 0.4, 1, 2, seed=3, block_size=7)
+	large = arrivals.PriorityArrivals(0.3, 0.4, 1, 2, seed=3, block_size=4096)
+	np.testing.assert_allclose(draw(small, 1000), draw(large, 1000), rtol=1e-12)
+
+def test_common_random_numbers_across_arrival_types():
+	# The routing draws of the switching stream come from their own substream, so both
+	# streams see the same arrival times, classes and sizes
+	priority = arrivals.PriorityArrivals(0.3, 0.4, 1, 2, seed=11)
+	switching = arrivals.SwitchingPriorityArrivals(0.3, 0.4, 1, 2, 0.5, seed=11)
+	assert draw(priority, 1000) == draw(switching, 1000)
+
+def test_rates_and_class_mix():
+	source = arrivals.PriorityArrivals(0.3, 0.4, 1, 2, seed=5)
+	jobs = [source.arrive() for _ in range(50000)]
+	times = np.array([job.arrival_time for job in jobs])
+	classes = np.array([job.priority for job in jobs])
+	sizes = np.array([job.size for job in jobs])
+	assert abs(np.mean(np.diff(times)) - 1/0.7) < 0.03
+	assert abs(np.mean(classes == 1) - 0.3/0.7) < 0.01
+	assert abs(sizes[classes == 1].mean() - 1) < 0.03
+	assert abs(sizes[classes == 2].mean() - 0.5) < 0.015
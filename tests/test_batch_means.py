@@ -0,0 +1,29 @@
+import numpy as np
+import analysis.statistic as statistic
+import systems.fcfs_system as fcfs_system
+import util.ensemble as ensemble
+
+def test_batch_sums_cover_every_observation():
+	values = np.random.default_rng(3).exponential(1, 1000)
+	stat = statistic.BatchMeans(max_batches=16)
+	for x in values:
+		stat.add(x)
+	assert np.isclose(stat.mean, values.mean())
+	assert len(stat.batch_sums) < 16
+	assert np.isclose(sum(stat.batch_sums) + stat.partial_sum, values.sum())
+	mean, half_width, batch_size, num_batches = stat.interval()
+	assert batch_size >= stat.batch_size and num_batches >= 2 and half_width > 0
+
+def test_long_run_interval_covers_mm1():
+	system = fcfs_system.FCFSSystem(1, 100, 0.5, 1)
+	_, intervals = ensemble.run_batch_means(system, 100000, seed=1)
+	mean, half_width, _, _ = intervals['response_times']
+	assert abs(mean - 2.0) <= half_width
+
+def test_system_settings_are_restored():
+	system = fcfs_system.FCFSSystem(1, 100, 0.5, 1)
+	system.stat_type = statistic.MSERStat
+	_, intervals = ensemble.run_batch_means(system, 5000, seed=1, truncate_warmup=True)
+	assert len(intervals['response_times']) == 5
+	assert system.num_jobs_per_run == 100
+	assert system.stat_type is statistic.MSERStat
@@ -0,0 +1,29 @@
+import benchmark
+import util.ensemble as ensemble
+
+class EventCounter():
+	def __init__(self):
+		self.events = 0
+
+	def arrival(self, *args):
+		self.events += 1
+
+	def depart(self, *args):
+		self.events += 1
+
+def test_event_counts_match_the_events_seen_by_collectors():
+	for name, make in benchmark.SYSTEMS.items():
+		system = make(0.6, 500)
+		counter = EventCounter()
+		system.add_collector(counter)
+		system.reset(ensemble.child_seed(1, 0))
+		system.simulate_run()
+		assert benchmark.num_events(system, benchmark.PRESEEDED_JOBS.get(name, 0)) == counter.events, name
+
+def test_case_and_comparison():
+	result = benchmark.run_case('fcfs', 0.5, 500, 2, 1)
+	assert result['events'] > 2*2*500 - 10 and result['retained_blocks'] >= 0
+	current = {'results': {benchmark.case_key(result): result}}
+	slower = dict(result, events_per_sec=result['events_per_sec']/2)
+	assert benchmark.compare(current, current) == []
+	assert [metric for _, metric, _, _ in benchmark.compare(current, {'results': {benchmark.case_key(result): slower}})] == ['events_per_sec']
@@ -0,0 +1,48 @@
+import os
+import analysis.statistic as statistic
+import systems.basic_np_system as basic_np_system
+import util.cache as cache
+import util.ensemble as ensemble
+
+def make_system():
+	return basic_np_system.NPPrioritySystem(4, 200, 0.3, 0.4, 1, 2)
+
+def results(runs):
+	return [vars(run) for run in runs]
+
+def test_round_trip_returns_the_same_results(tmp_path, monkeypatch):
+	system = make_system()
+	first = ensemble.run_ensemble(system, 4, 3, show_progress=False, cache=cache.ResultCache(str(tmp_path)))
+	assert results(first) == results(ensemble.run_ensemble(system, 4, 3, show_progress=False))
+
+	# A fresh cache on the same directory serves every replication from disk
+	def fail(*args):
+		raise AssertionError("cached replication simulated again")
+	monkeypatch.setattr(ensemble, 'run_replications', fail)
+	again = ensemble.run_ensemble(make_system(), 4, 3, show_progress=False, cache=cache.ResultCache(str(tmp_path)))
+	assert results(again) == results(first)
+
+def test_only_missing_replications_are_simulated(tmp_path):
+	system = make_system()
+	result_cache = cache.ResultCache(str(tmp_path))
+	ensemble.run_ensemble(system, 2, 3, show_progress=False, cache=result_cache)
+	grown = ensemble.run_ensemble(system, 4, 3, show_progress=False, cache=result_cache)
+	assert results(grown) == results(ensemble.run_ensemble(system, 4, 3, show_progress=False))
+	assert sorted(result_cache.load(result_cache.key(system, 3, system.num_jobs_per_run))) == [0, 1, 2, 3]
+
+def test_keys_separate_experiments():
+	system = make_system()
+	key = cache.result_key(system, 3, 200)
+	assert key == cache.result_key(make_system(), 3, 200)
+	assert key != cache.result_key(system, 4, 200)
+	assert key != cache.result_key(system, 3, 300)
+	assert key != cache.result_key(system, 3, 200, antithetic=True)
+	assert key != cache.result_key(basic_np_system.NPPrioritySystem(4, 200, 0.3, 0.5, 1, 2), 3, 200)
+	system.stat_type = statistic.MSERStat
+	assert key != cache.result_key(system, 3, 200)
+
+def test_eviction_keeps_the_cache_under_its_size(tmp_path):
+	result_cache = cache.ResultCache(str(tmp_path), max_bytes=1)
+	result_cache.store('a', {0: 1.0})
+	result_cache.store('b', {0: 2.0})
+	assert os.listdir(str(tmp_path)) == ['b.pkl']
@@ -0,0 +1,51 @@
+import pytest
+import systems.basic_np_system as basic_np_system
+import util.checkpoint as checkpoint
+import util.ensemble as ensemble
+import util.sweep as sweep
+
+def make_system(num_runs=6):
+	return basic_np_system.NPPrioritySystem(num_runs, 200, 0.3, 0.4, 1, 2)
+
+def results(runs):
+	return [vars(run) for run in runs]
+
+def test_interrupted_ensemble_resumes_with_the_same_results(tmp_path, monkeypatch):
+	path = str(tmp_path/'run.ckpt')
+	system = make_system()
+	expected = results(ensemble.run_ensemble(system, 6, 5, show_progress=False))
+
+	# Stop after four replications; the finished ones are saved on the way out
+	run_replications = ensemble.run_replications
+	calls = []
+	def interrupted(*args):
+		calls.append(1)
+		if len(calls) > 4:
+			raise KeyboardInterrupt
+		return run_replications(*args)
+	monkeypatch.setattr(ensemble, 'run_replications', interrupted)
+	with pytest.raises(KeyboardInterrupt):
+		ensemble.run_ensemble(system, 6, 5, show_progress=False, checkpoint=checkpoint.Checkpoint(path))
+	monkeypatch.undo()
+	assert checkpoint.resume(path).num_runs() == 4
+
+	resumed = ensemble.run_ensemble(system, 6, 5, workers=2, chunk_size=1, show_progress=False, checkpoint=checkpoint.resume(path))
+	assert results(resumed) == expected
+	assert checkpoint.resume(path).num_runs() == 6
+
+def test_unseeded_experiment_keeps_its_master_seed(tmp_path):
+	path = str(tmp_path/'run.ckpt')
+	first = make_system().simulate(checkpoint=checkpoint.Checkpoint(path))
+	again = make_system().simulate(checkpoint=checkpoint.Checkpoint(path))
+	assert again.T1s == first.T1s
+
+def test_sweep_resumes_from_a_checkpoint(tmp_path):
+	path = str(tmp_path/'sweep.ckpt')
+	points = sweep.make_grid([(0.2, 0.3)], [0.5], 1, 2)
+	table = sweep.sweep(points, ['np_basic', 'bp'], 3, 200, seed=2, checkpoint=checkpoint.Checkpoint(path))
+	assert checkpoint.resume(path).num_runs() == 6
+	assert sweep.sweep(points, ['np_basic', 'bp'], 3, 200, seed=2, checkpoint=checkpoint.resume(path)) == table
+
+def test_resume_needs_an_existing_checkpoint(tmp_path):
+	with pytest.raises(FileNotFoundError):
+		checkpoint.resume(str(tmp_path/'missing.ckpt'))
@@ -0,0 +1,29 @@
+import analysis.confidence as confidence
+import systems.basic_np_system as basic_np_system
+import systems.server_switch_np_system as server_switch_np_system
+import systems.switching_np_system as switching_np_system
+import util.ensemble as ensemble
+
+def jobs(system, seed, n):
+	system.reset(seed)
+	return [(job.arrival_time, job.size, job.priority) for job in (system.arrivals.arrive() for _ in range(n))]
+
+def test_systems_on_one_seed_see_the_same_jobs():
+	seed = ensemble.child_seed(8, 0)
+	basic = basic_np_system.NPPrioritySystem(1, 100, 0.3, 0.4, 1, 2)
+	switching = switching_np_system.SwitchingNPSystem(1, 100, 0.3, 0.4, 1, 2, 0.5)
+	assert jobs(basic, seed, 200) == jobs(switching, seed, 200)
+
+def test_paired_differences_are_tighter_than_independent_runs():
+	server_switch = server_switch_np_system.ServerSwitchNPSystem(20, 500, 0.3, 0.4, 1, 2, 0.5)
+	switching = switching_np_system.SwitchingNPSystem(20, 500, 0.3, 0.4, 1, 2, 0.5)
+	T1_runs = server_switch.simulate(seed=6)[0]
+	paired = switching.simulate(seed=6).T1s
+	independent = switching.simulate(seed=7).T1s
+	_, paired_half_width = confidence.paired_difference(T1_runs, paired)
+	_, independent_half_width = confidence.paired_difference(T1_runs, independent)
+	assert paired_half_width < independent_half_width/2
+
+def test_paired_difference():
+	mean, half_width = confidence.paired_difference([3.0, 4.0, 5.0], [1.0, 2.0, 3.0])
+	assert mean == 2.0 and half_width == 0.0
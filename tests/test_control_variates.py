@@ -0,0 +1,26 @@
+import numpy as np
+import analysis.confidence as confidence
+import analysis.statistic as statistic
+import systems.basic_np_system as basic_np_system
+
+def test_control_variate_removes_the_controlled_noise():
+	rng = np.random.default_rng(1)
+	x = rng.exponential(1.0, 200)
+	y = 2 + 3*(x - 1) + rng.normal(0, 0.1, 200)
+	estimate, half_width = confidence.control_variate(y, [x], [1.0])
+	_, plain_half_width = confidence.mean_half_width(y)
+	assert abs(estimate - 2) <= half_width
+	assert half_width < plain_half_width/5
+
+def test_controlled_estimates_by_name():
+	runs = {'T': [1.0, 2.0, 3.0, 4.0], 'S': [0.5, 1.0, 1.5, 2.0]}
+	estimate, _ = statistic.controlled_estimates(runs, ['T'], {'S': 1.0})['T']
+	assert np.isclose(estimate, 2.0)
+
+def test_system_controls():
+	results = basic_np_system.NPPrioritySystem(20, 1000, 0.3, 0.4, 1, 2).simulate(seed=5)
+	# The first arrival only starts the inter-arrival clock, so A is unbiased for 1/lambda
+	assert abs(np.mean(results.As) - 1/0.7) < 0.02
+	_, plain_half_width = confidence.mean_half_width(results.T2s)
+	_, controlled_half_width = results.controlled['T2']
+	assert controlled_half_width < plain_half_width
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+import util.arrivals as arrivals
+import util.distributions as distributions
+
+DISTRIBUTIONS = [
+	distributions.Exponential(2.0),
+	distributions.Deterministic(0.5),
+	distributions.Erlang(4, 8.0),
+	distributions.HyperExponential([0.9, 0.1], [10.0, 0.5]),
+	distributions.LogNormal(1.0, 4.0),
+	distributions.BoundedPareto(1.5, 0.1, 100.0),
+	distributions.Empirical([0.5, 1.0, 2.0, 4.0]),
+]
+
+@pytest.mark.parametrize('size', DISTRIBUTIONS, ids=repr)
+def test_sample_moments(size):
+	source = arrivals.Arrivals(1.0, size, seed=2)
+	samples = size.sample(source, 'size', 200000)
+	assert abs(samples.mean() - size.mean) < 0.02*size.mean
+	if size.scv < 5:
+		assert abs(np.mean(samples**2) - size.second_moment) < 0.05*size.second_moment
+
+def test_equal_distributions_compare_and_hash_equal():
+	assert distributions.Erlang(4, 8.0) == distributions.Erlang(4, 8.0)
+	assert hash(distributions.LogNormal(1.0, 4.0)) == hash(distributions.LogNormal(1.0, 4.0))
+	assert distributions.Exponential(2.0) != distributions.Erlang(1, 2.0)
+
+def test_parse_and_make():
+	assert distributions.parse('erlang:4,8') == distributions.Erlang(4, 8.0)
+	assert distributions.parse('hyperexp:0.9,0.1,10,0.5') == distributions.HyperExponential([0.9, 0.1], [10.0, 0.5])
+	assert distributions.make(2.0) == distributions.Exponential(2.0)
+	with pytest.raises(ValueError):
+		distributions.parse('weibull:1,2')
+
+def test_antithetic_sizes_are_negatively_correlated():
+	size = distributions.LogNormal(1.0, 1.0)
+	source = arrivals.Arrivals(1.0, size)
+	source.reset(3, 0)
+	first = size.sample(source, 'size', 5000)
+	source.reset(3, 1)
+	second = size.sample(source, 'size', 5000)
+	assert np.corrcoef(first, second)[0, 1] < -0.3
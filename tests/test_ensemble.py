@@ -0,0 +1,25 @@
+import systems.basic_np_system as basic_np_system
+import systems.fcfs_system as fcfs_system
+import util.ensemble as ensemble
+
+def results(system, num_runs, seed, workers, chunk_size=None):
+	return [vars(run) for run in ensemble.run_ensemble(system, num_runs, seed, workers, chunk_size, show_progress=False)]
+
+def test_results_do_not_depend_on_workers_or_chunks():
+	system = basic_np_system.NPPrioritySystem(6, 300, 0.3, 0.4, 1, 2)
+	serial = results(system, 6, 42, 1)
+	assert results(system, 6, 42, 3) == serial
+	assert results(system, 6, 42, 2, chunk_size=1) == serial
+
+def test_replication_i_is_the_same_in_every_ensemble():
+	system = basic_np_system.NPPrioritySystem(6, 300, 0.3, 0.4, 1, 2)
+	assert results(system, 3, 42, 1) == results(system, 6, 42, 1)[:3]
+	assert results(system, 3, 43, 1) != results(system, 3, 42, 1)
+
+def test_child_seeds_do_not_mutate_the_parent():
+	assert ensemble.child_seed(5, 2).generate_state(4).tolist() == ensemble.child_seed(5, 2).generate_state(4).tolist()
+	assert [seed.spawn_key for seed in ensemble.replication_seeds(5, 3, start=2)] == [(2,), (3,), (4,)]
+
+def test_simulate_is_reproducible_in_parallel():
+	system = fcfs_system.FCFSSystem(4, 300, 0.7, 1)
+	assert system.simulate(workers=2, seed=9) == system.simulate(workers=1, seed=9)
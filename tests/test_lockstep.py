@@ -0,0 +1,32 @@
+import math
+import analysis.analytic as analytic
+import analysis.confidence as confidence
+import systems.basic_np_system as basic_np_system
+import systems.switching_np_system as switching_np_system
+import systems.lockstep_np_system as lockstep_np_system
+
+def agree(a, b):
+	# Independent ensembles agree if their means are within the combined 99% CI
+	mean_a, half_a = confidence.mean_half_width(a, 0.99)
+	mean_b, half_b = confidence.mean_half_width(b, 0.99)
+	return abs(mean_a - mean_b) <= math.hypot(half_a, half_b)
+
+def test_lockstep_np_agrees_with_event_driven():
+	lockstep = lockstep_np_system.LockstepNPSystem(200, 500, 0.3, 0.4, 1, 2).simulate(seed=1)
+	event_driven = basic_np_system.NPPrioritySystem(30, 500, 0.3, 0.4, 1, 2).simulate(seed=2)
+	for name in ('T1s', 'T2s', 'TQ1s', 'TQ2s', 'N1s', 'N2s'):
+		assert agree(getattr(lockstep, name), getattr(event_driven, name)), name
+
+def test_lockstep_np_matches_closed_form():
+	lockstep = lockstep_np_system.LockstepNPSystem(200, 500, 0.3, 0.4, 1, 2).simulate(seed=3)
+	expected = analytic.scalars(analytic.np_basic(0.3, 0.4, 1, 2))
+	for name in ('T1', 'T2', 'N1', 'N2'):
+		mean, half_width = confidence.mean_half_width(getattr(lockstep, name + 's'), 0.99)
+		assert abs(mean - expected[name]) <= half_width, name
+	assert abs(sum(lockstep.As)/len(lockstep.As) - 1/0.7) < 0.01
+
+def test_lockstep_switching_agrees_with_event_driven():
+	lockstep = lockstep_np_system.LockstepSwitchingSystem(200, 500, 0.3, 0.4, 1, 2, 0.8).simulate(seed=1)
+	event_driven = switching_np_system.SwitchingNPSystem(30, 500, 0.3, 0.4, 1, 2, 0.8).simulate(seed=2)
+	for name in ('T1s', 'T2s', 'TAs', 'TBs', 'NAs', 'NBs'):
+		assert agree(getattr(lockstep, name), getattr(event_driven, name)), name
@@ -0,0 +1,31 @@
+import math
+import analysis.confidence as confidence
+import systems.fcfs_system as fcfs_system
+import util.ensemble as ensemble
+
+def erlang_c_response_time(lambda_, mu, k):
+	# Mean response time of the M/M/k FCFS queue
+	a = lambda_/mu
+	rho = a/k
+	tail = a**k/(math.factorial(k)*(1 - rho))
+	wait_prob = tail/(sum(a**n/math.factorial(n) for n in range(k)) + tail)
+	return wait_prob/(k*mu - lambda_) + 1/mu
+
+def test_fcfs_k_servers_matches_erlang_c():
+	for lambda_, k in ((1.6, 2), (2.4, 3)):
+		T_runs, _ = fcfs_system.FCFSSystem(30, 4000, lambda_, 1, num_servers=k).simulate(seed=k)
+		mean, half_width = confidence.mean_half_width(T_runs, 0.99)
+		assert abs(mean - erlang_c_response_time(lambda_, 1, k)) <= half_width, k
+
+def test_one_server_pool_is_mm1():
+	T_runs, N_runs = fcfs_system.FCFSSystem(30, 4000, 0.7, 1).simulate(seed=1)
+	mean, half_width = confidence.mean_half_width(T_runs, 0.99)
+	assert abs(mean - 1/(1 - 0.7)) <= half_width
+	assert abs(sum(N_runs)/len(N_runs) - 0.7*mean) < 0.05*0.7*mean
+
+def test_reset_gives_identical_runs():
+	system = fcfs_system.FCFSSystem(1, 500, 1.6, 1, num_servers=2)
+	system.reset(ensemble.child_seed(4, 0))
+	first = system.simulate_run()
+	system.reset(ensemble.child_seed(4, 0))
+	assert system.simulate_run() == first
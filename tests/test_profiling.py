@@ -0,0 +1,45 @@
+import types
+import systems.switching_np_system as switching_np_system
+import util.profiling as profiling
+
+class EventCounter():
+	def __init__(self):
+		self.arrivals = 0
+		self.departures = 0
+
+	def arrival(self, *args):
+		self.arrivals += 1
+
+	def depart(self, *args):
+		self.departures += 1
+
+def make_system():
+	return switching_np_system.SwitchingNPSystem(2, 300, 0.3, 0.4, 1, 2, 0.8)
+
+def test_profile_counts_events_without_changing_results():
+	plain = make_system().simulate(seed=4)
+	system = make_system()
+	counter = EventCounter()
+	system.add_collector(counter)
+	profiled = system.simulate(seed=4, profile=True)
+	assert profiled.T1s == plain.T1s
+	ensemble = system.profile['ensemble']
+	assert ensemble['num_runs'] == 2
+	assert ensemble['events'] == {'arrival': counter.arrivals, 'service': counter.departures}
+	assert set(ensemble['peak_queue']) == {'queueA', 'queueB'}
+	# The instrumentation is removed after every replication
+	assert 'handle_arrival' not in vars(system) and system.profiler is None
+	assert profiling.format_report(system.profile).startswith("2 replications")
+
+def test_profiles_come_back_from_workers():
+	system = make_system()
+	system.simulate(seed=4, workers=2, profile=True)
+	assert system.profile['ensemble']['num_runs'] == 2
+
+def test_peak_rss_is_in_kilobytes_on_macos(monkeypatch):
+	usage = types.SimpleNamespace(ru_maxrss=3*1024*1024)
+	monkeypatch.setattr(profiling, 'resource', types.SimpleNamespace(RUSAGE_SELF=0, getrusage=lambda who: usage))
+	monkeypatch.setattr(profiling.sys, 'platform', 'darwin')
+	assert profiling.peak_rss_kb() == 3*1024
+	monkeypatch.setattr(profiling.sys, 'platform', 'linux')
+	assert profiling.peak_rss_kb() == 3*1024*1024
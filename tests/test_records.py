@@ -0,0 +1,39 @@
+import numpy as np
+import util.records as records
+import systems.basic_np_system as basic_np_system
+import systems.fcfs_system as fcfs_system
+
+def test_records_of_np_runs(tmp_path):
+	system = basic_np_system.NPPrioritySystem(3, 400, 0.3, 0.4, 1, 2)
+	sink = records.attach(system, str(tmp_path), block_size=100)
+	results = system.simulate(seed=1)
+	sink.close()
+
+	store = records.RecordStore(str(tmp_path))
+	rows = store.read()
+	assert len(store) == len(rows['jid'])
+	assert sorted(set(rows['run'].tolist())) == [0, 1, 2]
+	assert np.all(rows['arrival'] <= rows['start'])
+	assert np.all(rows['start'] <= rows['departure'])
+	assert np.all(rows['num_seen'] >= 0)
+	assert set(rows['class'].tolist()) == {1, 2}
+	# Each run's T1 averages the response times of its class-1 departures
+	for run in range(3):
+		in_run = (rows['run'] == run) & (rows['class'] == 1)
+		response = (rows['departure'] - rows['arrival'])[in_run]
+		assert abs(response.mean() - results.T1s[run]) < 1e-9 * results.T1s[run]
+
+def test_chunked_reads(tmp_path):
+	system = fcfs_system.FCFSSystem(1, 1000, 0.7, 1)
+	sink = records.attach(system, str(tmp_path), block_size=128)
+	system.simulate(seed=2)
+	sink.close()
+
+	store = records.RecordStore(str(tmp_path))
+	assert len(store.index['chunks']) > 1
+	whole = store.read(['jid', 'departure'])
+	part = store.read(['jid', 'departure'], 200, 700)
+	np.testing.assert_array_equal(part['jid'], whole['jid'][200:700])
+	firsts = [first for first, _ in store.chunks(['jid'], 200, 700)]
+	assert firsts[0] == 200 and firsts == sorted(firsts)
+	assert np.all(np.diff(whole['departure']) >= 0)
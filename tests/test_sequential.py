@@ -0,0 +1,23 @@
+import systems.fcfs_system as fcfs_system
+import util.ensemble as ensemble
+
+def make_system(num_runs=200):
+	return fcfs_system.FCFSSystem(num_runs, 300, 0.5, 1)
+
+def test_stops_at_the_precision_target():
+	system = make_system()
+	results, report = ensemble.run_sequential(system, rel_precision=0.05, max_runs=200, seed=1)
+	assert report.num_runs == len(results) < 200
+	assert report.met
+	# The same replications as a fixed ensemble of that size
+	assert results == ensemble.run_ensemble(system, len(results), 1, show_progress=False)
+
+def test_stops_at_max_runs():
+	results, _ = ensemble.run_sequential(make_system(), rel_precision=1e-6, max_runs=25, seed=1)
+	assert len(results) == 25
+
+def test_time_budget_with_no_measured_time(monkeypatch):
+	# Runs served without measurable time (e.g. from a cache) must not break the budget extrapolation
+	monkeypatch.setattr(ensemble.time, 'time', lambda: 0.0)
+	results, _ = ensemble.run_sequential(make_system(), rel_precision=1e-6, time_budget=5.0, max_runs=40, seed=1)
+	assert len(results) == 40
@@ -0,0 +1,63 @@
+import numpy as np
+import analysis.statistic as statistic
+import systems.fcfs_system as fcfs_system
+
+def running(values):
+	stat = statistic.RunningStat()
+	for x in values:
+		stat.add(x)
+	return stat
+
+def test_running_stat_matches_numpy():
+	values = np.random.default_rng(1).exponential(2.0, 1000)
+	stat = running(values)
+	assert stat.count == 1000
+	assert np.isclose(stat.mean, values.mean())
+	assert np.isclose(stat.variance(), np.var(values))
+
+def test_merged_running_stat_matches_concatenated_data():
+	rng = np.random.default_rng(2)
+	a, b, c = rng.normal(5, 1, 300), rng.normal(-1, 3, 17), rng.exponential(1, 1000)
+	merged = running(a).merge(running(b)).merge(running(c))
+	whole = running(np.concatenate([a, b, c]))
+	assert merged.count == whole.count
+	assert np.isclose(merged.mean, whole.mean)
+	assert np.isclose(merged.variance(), whole.variance())
+
+def test_merging_an_empty_stat():
+	stat = running([1.0, 2.0, 4.0])
+	assert statistic.RunningStat().merge(stat).mean == stat.mean
+	assert stat.merge(statistic.RunningStat()).count == 3
+
+def mser(values):
+	stat = statistic.MSERStat()
+	for x in values:
+		stat.add(x)
+	return stat
+
+def test_mser_drops_an_initial_transient():
+	rng = np.random.default_rng(4)
+	values = np.concatenate([10 + rng.normal(0, 1, 200), rng.normal(0, 1, 1800)])
+	stat = mser(values)
+	assert 190 <= stat.truncation <= 250
+	assert abs(stat.mean) < 0.1
+
+def test_mser_keeps_a_stationary_series():
+	stat = mser(np.random.default_rng(5).normal(3, 1, 2000))
+	assert stat.truncation < 500
+	assert abs(stat.mean - 3) < 0.1
+	assert stat.interval()[4] == stat.truncation
+
+def test_time_average_integrates_the_level():
+	stat = statistic.TimeAverage(max_level=2)
+	# Level 0 on [0, 1), 3 on [1, 3), 1 on [3, 7)
+	stat.advance(1.0, 0)
+	stat.advance(3.0, 3)
+	stat.advance(7.0, 1)
+	assert np.isclose(stat.mean, (0*1 + 3*2 + 1*4)/7)
+	np.testing.assert_allclose(stat.distribution(), [1/7, 4/7, 0, 2/7])
+
+def test_time_averaged_numbers_in_system_satisfy_littles_law():
+	system = fcfs_system.FCFSSystem(1, 20000, 0.7, 1)
+	T_runs, N_runs = system.simulate(seed=3)
+	assert abs(N_runs[0] - 0.7*T_runs[0]) < 0.02*N_runs[0]
@@ -0,0 +1,28 @@
+import util.sweep as sweep
+
+POINTS = sweep.make_grid([(0.2, 0.3), (0.4, 0.3)], [0.5], 1, 2)
+
+def values(table):
+	return {(row['system'], row['rho1'], row['metric']): (row['mean'], row['std_err'], row['num_runs']) for row in table}
+
+def test_grid_points():
+	assert len(POINTS) == 2
+	assert POINTS[1]['lambda1'] == 0.4 and POINTS[1]['lambda2'] == 0.6
+
+def test_sweep_does_not_depend_on_workers():
+	serial = sweep.sweep(POINTS, ['np_basic', 'bp'], 3, 200, seed=4)
+	parallel = sweep.sweep(POINTS, ['np_basic', 'bp'], 3, 200, seed=4, workers=2)
+	assert values(parallel) == values(serial)
+
+def test_sweep_rows_are_named_metrics():
+	table = sweep.sweep(POINTS[:1], ['bp', 'server_switch'], 2, 200, seed=4)
+	assert {row['metric'] for row in sweep.select(table, 'server_switch', 'T1')} == {'T1'}
+	assert {row['metric'] for row in table if row['system'] == 'bp'} == {'T1', 'T2', 'TQ1', 'TQ2', 'N1', 'N2', 'S1', 'S2', 'job1MixingTime',
+																		 'job2MixingTime', 'varJ1', 'varJ2'}
+	assert all(row['num_runs'] == 2 for row in table)
+
+def test_analytic_only_skips_simulation_of_closed_forms():
+	table = sweep.sweep(POINTS, ['np_basic', 'server_switch'], 2, 200, seed=4, analytic_only=True)
+	exact = [row for row in table if row['system'] == 'np_basic']
+	assert all(row['num_runs'] == 0 and row['std_err'] == 0.0 for row in exact)
+	assert all(row['num_runs'] == 2 for row in table if row['system'] == 'server_switch')
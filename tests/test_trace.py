@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import util.distributions as distributions
+import util.trace as trace
+
+def write_csv(path, n=2000, seed=0, header=True):
+	rng = np.random.default_rng(seed)
+	times = np.cumsum(rng.exponential(1/0.7, n))
+	sizes = rng.exponential(1.0, n)
+	classes = np.where(rng.random(n) < 0.4, 1, 2)
+	with open(path, 'w') as f:
+		if header:
+			f.write("size,class,arrival_time\n")
+		for t, s, c in zip(times, sizes, classes):
+			f.write("{!r},{},{!r}\n".format(float(s), int(c), float(t)) if header else "{!r},{!r},{}\n".format(float(t), float(s), int(c)))
+	return times, sizes, classes
+
+def test_replay_returns_the_recorded_jobs(tmp_path):
+	times, sizes, classes = write_csv(tmp_path/'jobs.csv')
+	recorded = trace.convert_csv(str(tmp_path/'jobs.csv'), str(tmp_path/'trace'), chunk_rows=300)
+	assert recorded.num_jobs == 2000
+	assert recorded.class_counts() == (int(np.sum(classes == 1)), int(np.sum(classes == 2)))
+	assert recorded.class_counts(1500) == (int(np.sum(classes[1500:] == 1)), int(np.sum(classes[1500:] == 2)))
+
+	source = trace.TraceArrivals(str(tmp_path/'trace'), start=10, block_size=64)
+	source.reset(1)
+	jobs = [source.arrive() for _ in range(1990)]
+	np.testing.assert_allclose([job.arrival_time for job in jobs], times[10:] - times[10])
+	np.testing.assert_allclose([job.size for job in jobs], sizes[10:])
+	assert [job.priority for job in jobs] == classes[10:].tolist()
+	with pytest.raises(EOFError):
+		source.arrive()
+
+def test_headerless_csv_and_validation(tmp_path):
+	write_csv(tmp_path/'plain.csv', header=False)
+	assert trace.convert_csv(str(tmp_path/'plain.csv'), str(tmp_path/'plain')).num_jobs == 2000
+	with open(tmp_path/'unsorted.csv', 'w') as f:
+		f.write("2.0,1.0,1\n1.0,1.0,2\n")
+	with pytest.raises(ValueError):
+		trace.convert_csv(str(tmp_path/'unsorted.csv'), str(tmp_path/'unsorted'))
+
+def test_replayed_systems(tmp_path):
+	write_csv(tmp_path/'jobs.csv', n=5000)
+	trace.convert_csv(str(tmp_path/'jobs.csv'), str(tmp_path/'trace'))
+	system = trace.replay_np(str(tmp_path/'trace'), 1000, num_runs=2)
+	results = system.simulate(seed=1)
+	# Every replication replays the same trace
+	assert results.T1s[0] == results.T1s[1]
+	switching = trace.replay_switching(str(tmp_path/'trace'), 0.7, 1000, num_runs=2).simulate(seed=1)
+	assert switching.TAs[0] != switching.TAs[1]
+	# The trace's size moments are not a distribution to sample from
+	assert not isinstance(system.arrivals.size1, distributions.Distribution)
+	assert system.arrivals.size1.rate == 1/system.arrivals.size1.mean
@@ -0,0 +1,18 @@
+import systems.basic_np_system as basic_np_system
+import systems.bp_np_system as bp_np_system
+import systems.fcfs_system as fcfs_system
+
+def test_simulate_returns_the_truncation_of_every_run():
+	system = basic_np_system.NPPrioritySystem(3, 300, 0.3, 0.4, 1, 2)
+	results = system.simulate(seed=1, truncate_warmup=True)
+	assert len(results.truncated) == 3 and system.truncated == results.truncated
+	assert all(0 <= run['response1_times'] <= 150 for run in results.truncated)
+	assert system.simulate(seed=1).truncated == [None, None, None]
+
+def test_systems_returning_run_lists_keep_truncations_on_the_system():
+	system = bp_np_system.BusyPeriodNPSystem(2, 300, 0.3, 0.4, 1, 2, 0.5)
+	system.simulate(seed=1, truncate_warmup=True, antithetic=True)
+	assert len(system.truncated) == 1 and 'response2_times' in system.truncated[0]
+	fcfs = fcfs_system.FCFSSystem(2, 300, 0.5, 1)
+	fcfs.simulate(seed=1, truncate_warmup=True)
+	assert set(fcfs.truncated[0]) == {'response_times', 'num_jobs_seen'}
@@ -1,114 +1,188 @@
 import numpy as np
 import util.jobs as jobs
-
-# Basic Poisson Arrivals
-class Arrivals():
-	def __init__(self, lambda_, mu):
+import util.ensemble as ensemble
+import util.distributions as distributions
+
+# Number of jobs' worth of random variates drawn per refill
+DEFAULT_BLOCK_SIZE = 4096
+
+def make_rng(seed=None):
+	# Accepts an existing Generator, a SeedSequence, an int or None (fresh entropy)
+	if isinstance(seed, np.random.Generator):
+		return seed
+	return np.random.default_rng(seed)
+
+# Kinds of random variates, each drawn from its own substream of the arrival seed
+STREAMS = ('interarrival', 'class', 'size', 'routing')
+
+def make_streams(seed=None):
+	# One generator per kind of variate. Systems driven by the same seed then see the same
+	# inter-arrival times, classes and sizes even if only some of them also draw routing
+	# decisions (common random numbers). A Generator passed in drives every kind.
+	if isinstance(seed, np.random.Generator):
+		return {name: seed for name in STREAMS}
+	master = ensemble.seed_sequence(seed)
+	return {name: np.random.default_rng(ensemble.child_seed(master, i)) for i, name in enumerate(STREAMS)}
+
+# Base class for the arrival streams: all the random variates a job needs are drawn
+# block_size jobs at a time with vectorized numpy calls and handed out one by one
+class BlockArrivals():
+	def __init__(self, lambda_, seed=None, block_size=DEFAULT_BLOCK_SIZE):
 		self.time_next_arrive = 0.0
 		self.arrival_rate = lambda_
-		self.mu = mu
 		self.jid = 0
+		self.block_size = block_size
+		self.streams = make_streams(seed)
+		self.pair_member = None
+		self.index = block_size
 
 	def time_next_arrive(self):
 		return self.time_next_arrive
 
+	def reset(self, seed=None, pair_member=None):
+		# Restart the stream at time 0 with new generators. pair_member 0 or 1 makes this
+		# one run of an antithetic pair on the same seed (see exponentials)
+		self.time_next_arrive = 0.0
+		self.jid = 0
+		self.streams = make_streams(seed)
+		self.pair_member = pair_member
+		self.index = self.block_size
+
+	def exponentials(self, stream, n):
+		# Standard exponentials. In an antithetic pair both runs use inverse transforms of
+		# the same uniforms, -log(1 - U) for member 0 and -log(U) for member 1, so a long
+		# inter-arrival time or size in one run is a short one in the other
+		if self.pair_member is None:
+			return self.streams[stream].standard_exponential(n)
+		u = self.streams[stream].random(n)
+		if self.pair_member == 0:
+			return -np.log1p(-u)
+		return -np.log(np.maximum(u, np.finfo(float).tiny))
+
+	def uniforms(self, stream, n):
+		# Uniforms for inverse transforms, U for member 0 of an antithetic pair and 1 - U for member 1
+		u = self.streams[stream].random(n)
+		if self.pair_member == 1:
+			return 1 - u
+		return u
+
+	def normals(self, stream, n):
+		# Standard normals, negated for member 1 of an antithetic pair
+		z = self.streams[stream].standard_normal(n)
+		if self.pair_member == 1:
+			return -z
+		return z
+
+	def class_sizes(self, is_class_1, size1, size2):
+		# Sizes of a block of jobs of two classes. Exponential sizes take one scaled draw
+		# per job; otherwise each class's distribution samples its own jobs in one call
+		n = len(is_class_1)
+		if isinstance(size1, distributions.Exponential) and isinstance(size2, distributions.Exponential):
+			return self.exponentials('size', n) / np.where(is_class_1, size1.mu, size2.mu)
+		sizes = np.empty(n)
+		num_class_1 = int(np.count_nonzero(is_class_1))
+		sizes[is_class_1] = size1.sample(self, 'size', num_class_1)
+		sizes[~is_class_1] = size2.sample(self, 'size', n - num_class_1)
+		return sizes
+
+	def draw_block(self, n):
+		raise NotImplementedError
+
+	def next_variates(self):
+		# Index of the next unused job in the current block, refilling lazily
+		i = self.index
+		if i == self.block_size:
+			self.draw_block(self.block_size)
+			i = 0
+		self.index = i + 1
+		return i
+
+# Basic Poisson Arrivals. mu is an exponential service rate or a util.distributions size distribution
+class Arrivals(BlockArrivals):
+	def __init__(self, lambda_, mu, seed=None, block_size=DEFAULT_BLOCK_SIZE):
+		super().__init__(lambda_, seed, block_size)
+		self.size = distributions.make(mu)
+
+	def draw_block(self, n):
+		self.interarrivals = (self.exponentials('interarrival', n)/self.arrival_rate).tolist()
+		self.sizes = self.size.sample(self, 'size', n).tolist()
+
 	def arrive(self):
 		# New job arrives
+		i = self.next_variates()
 		curr_time = self.time_next_arrive
 		jid = self.jid
-		next_arrival = np.random.exponential(1.0/self.arrival_rate)
-		size = np.random.exponential(1.0/self.mu)
 
 		self.jid += 1
-		self.time_next_arrive += next_arrival
+		self.time_next_arrive += self.interarrivals[i]
 
-		return (curr_time, jobs.Job(size, curr_time, jid))
+		return (curr_time, jobs.Job(self.sizes[i], curr_time, jid))
 
-class PriorityArrivals():
-	def __init__(self, lambda1, lambda2, mu1, mu2):
+# mu1 and mu2 are exponential service rates or util.distributions size distributions
+class PriorityArrivals(BlockArrivals):
+	def __init__(self, lambda1, lambda2, mu1, mu2, seed=None, block_size=DEFAULT_BLOCK_SIZE):
 		lambda_ = lambda1 + lambda2
-		self.time_next_arrive = 0.0
+		super().__init__(lambda_, seed, block_size)
 		self.is_class_1_prob = lambda1/lambda_
-		self.arrival_rate = lambda_
-		self.mu1 = mu1
-		self.mu2 = mu2
-		self.jid = 0
+		self.size1 = distributions.make(mu1)
+		self.size2 = distributions.make(mu2)
 
-	def time_next_arrive(self):
-		return self.time_next_arrive
+	def draw_block(self, n):
+		self.interarrivals = (self.exponentials('interarrival', n)/self.arrival_rate).tolist()
+		is_class_1 = self.streams['class'].random(n) < self.is_class_1_prob
+		sizes = self.class_sizes(is_class_1, self.size1, self.size2)
+		self.classes = np.where(is_class_1, 1, 2).tolist()
+		self.sizes = sizes.tolist()
 
 	def arrive(self):
 		# New job arrives
+		i = self.next_variates()
 		curr_time = self.time_next_arrive
 
-		# Generate next arrival time
-		next_arrival = np.random.exponential(1.0/self.arrival_rate)
-
 		# Generate this new job's information
 		jid = self.jid
-		is_class_1 = np.random.binomial(1, self.is_class_1_prob)
-
-		if is_class_1 == 1:
-			new_job_class = 1
-			size = np.random.exponential(1.0/self.mu1)
-		else:
-			new_job_class = 2
-			size = np.random.exponential(1.0/self.mu2)
 
 		# Update info for next arrival
 		self.jid += 1
-		self.time_next_arrive += next_arrival
+		self.time_next_arrive += self.interarrivals[i]
 
 		# Create and return new job
-		new_job = jobs.Job(size, curr_time, jid, new_job_class)
+		new_job = jobs.Job(self.sizes[i], curr_time, jid, self.classes[i])
 		return new_job
 
-class SwitchingPriorityArrivals():
-	def __init__(self, lambda1, lambda2, mu1, mu2, stay_prob):
+class SwitchingPriorityArrivals(BlockArrivals):
+	def __init__(self, lambda1, lambda2, mu1, mu2, stay_prob, seed=None, block_size=DEFAULT_BLOCK_SIZE):
 		lambda_ = lambda1 + lambda2
-		self.time_next_arrive = 0.0
+		super().__init__(lambda_, seed, block_size)
 		self.is_class_1_prob = lambda1/lambda_
 		self.stay_prob = stay_prob
-		self.arrival_rate = lambda_
-		self.mu1 = mu1
-		self.mu2 = mu2
-		self.jid = 0
+		self.size1 = distributions.make(mu1)
+		self.size2 = distributions.make(mu2)
 
-	def time_next_arrive(self):
-		return self.time_next_arrive
+	def draw_block(self, n):
+		self.interarrivals = (self.exponentials('interarrival', n)/self.arrival_rate).tolist()
+		is_class_1 = self.streams['class'].random(n) < self.is_class_1_prob
+		sizes = self.class_sizes(is_class_1, self.size1, self.size2)
+		classes = np.where(is_class_1, 1, 2)
+
+		# Might switch the assigned class
+		do_stay = self.streams['routing'].random(n) < self.stay_prob
+		self.classes = classes.tolist()
+		self.final_classes = np.where(do_stay, classes, 3 - classes).tolist()
+		self.sizes = sizes.tolist()
 
 	def arrive(self):
 		# New job arrives
+		i = self.next_variates()
 		curr_time = self.time_next_arrive
 
-		# Generate next arrival time
-		next_arrival = np.random.exponential(1.0/self.arrival_rate)
-
 		# Generate this new job's information
 		jid = self.jid
-		is_class_1 = np.random.binomial(1, self.is_class_1_prob)
 
 		# Update info for next arrival
 		self.jid += 1
-		self.time_next_arrive += next_arrival
-		# print("Next arrival will be at {:.3f}, is class 1? {}".format(self.time_next_arrive, bool(is_class_1)))
+		self.time_next_arrive += self.interarrivals[i]
 
 		# Create and return new job
-		if is_class_1 == 1:
-			new_job_class = 1
-			size = np.random.exponential(1.0/self.mu1)
-		else:
-			new_job_class = 2
-			size = np.random.exponential(1.0/self.mu2)
-
-		final_class = new_job_class
-		# Might switch the assigned class
-		do_stay = np.random.binomial(1, self.stay_prob)
-		if do_stay == 0:
-			if final_class == 1:
-				final_class = 2
-			else:
-				final_class = 1
-		
-		new_job = jobs.Job(size=size, arrival_time=curr_time, jid=jid, priority=new_job_class, final_priority=final_class)
-		return new_job
\ No newline at end of file
+		new_job = jobs.Job(size=self.sizes[i], arrival_time=curr_time, jid=jid, priority=self.classes[i], final_priority=self.final_classes[i])
+		return new_job
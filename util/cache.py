@@ -0,0 +1,102 @@
+import os
+import glob
+import pickle
+import hashlib
+from collections import OrderedDict
+import util.ensemble as ensemble
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.path.join(REPO_ROOT, '.sim_cache')
+
+code_fingerprint = None
+
+def fingerprint():
+	# Hash of all simulator source, so results are never reused across code changes
+	global code_fingerprint
+	if code_fingerprint is None:
+		h = hashlib.sha256()
+		for package in ['util', 'systems', 'analysis']:
+			for path in sorted(glob.glob(os.path.join(REPO_ROOT, package, '*.py'))):
+				h.update(os.path.relpath(path, REPO_ROOT).encode())
+				with open(path, 'rb') as f:
+					h.update(f.read())
+		code_fingerprint = h.hexdigest()
+	return code_fingerprint
+
+def result_key(system, seed, num_jobs_per_run, antithetic=False):
+	# Identifies the replications of one experiment: system class, parameters, master
+	# seed, run length, accumulator (e.g. MSER truncation), pairing and code version
+	seed = ensemble.seed_sequence(seed)
+	parts = (type(system).__module__, type(system).__name__, system.params,
+			 seed.entropy, seed.spawn_key, num_jobs_per_run, getattr(system, 'stat_type', None).__name__, antithetic, fingerprint())
+	return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+# Persistent store of per-replication simulate_run() results. An entry covers one
+# (system class, parameters, master seed, num_jobs_per_run, code version); replication i
+# is stored under index i, so ensembles of different num_runs on the same seed share
+# their common replications. A small LRU of entries is kept in memory in front of the
+# disk, and the disk is trimmed back to max_bytes by evicting least recently used entries.
+class ResultCache():
+	def __init__(self, path=DEFAULT_CACHE_DIR, max_bytes=1 << 30, memory_entries=64):
+		self.path = path
+		self.max_bytes = max_bytes
+		self.memory_entries = memory_entries
+		self.memory = OrderedDict()
+		os.makedirs(path, exist_ok=True)
+
+	def key(self, system, seed, num_jobs_per_run, antithetic=False):
+		return result_key(system, seed, num_jobs_per_run, antithetic)
+
+	def entry_path(self, key):
+		return os.path.join(self.path, key + '.pkl')
+
+	def load(self, key):
+		# Dict of replication index -> result; empty if nothing is cached
+		if key in self.memory:
+			self.memory.move_to_end(key)
+			return self.memory[key]
+		path = self.entry_path(key)
+		try:
+			with open(path, 'rb') as f:
+				runs = pickle.load(f)
+			os.utime(path)
+		except (OSError, EOFError, pickle.UnpicklingError):
+			runs = {}
+		self.remember(key, runs)
+		return runs
+
+	def store(self, key, runs):
+		self.remember(key, runs)
+		# Write to a temporary file first so a crash never leaves a truncated entry
+		path = self.entry_path(key)
+		tmp_path = path + '.tmp'
+		with open(tmp_path, 'wb') as f:
+			pickle.dump(runs, f, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp_path, path)
+		self.evict(keep=path)
+
+	def remember(self, key, runs):
+		self.memory[key] = runs
+		self.memory.move_to_end(key)
+		while len(self.memory) > self.memory_entries:
+			self.memory.popitem(last=False)
+
+	def evict(self, keep=None):
+		entries = []
+		for path in glob.glob(os.path.join(self.path, '*.pkl')):
+			stat = os.stat(path)
+			entries.append((stat.st_mtime, stat.st_size, path))
+		total = sum(size for _, size, _ in entries)
+		for _, size, path in sorted(entries):
+			if total <= self.max_bytes:
+				break
+			if path == keep:
+				continue
+			os.remove(path)
+			self.memory.pop(os.path.basename(path)[:-len('.pkl')], None)
+			total -= size
+
+	def clear(self):
+		self.memory.clear()
+		for path in glob.glob(os.path.join(self.path, '*.pkl')):
+			os.remove(path)
@@ -0,0 +1,71 @@
+import os
+import time
+import pickle
+import numpy as np
+import util.cache as cache
+
+# Progress of long ensembles and sweeps, kept in one pickle file so an interrupted
+# experiment can pick up where it stopped. Replication i of an experiment runs on the
+# i-th child of its master seed, so the seeds are the whole random state: the file holds
+# the results of the finished replications of every experiment plus the master seeds
+# drawn for experiments started without one, and rerunning the same calls with the same
+# checkpoint only simulates the missing replications, with the same results as an
+# uninterrupted run. Replications in progress when the run stopped are redone.
+# The file is rewritten atomically at most every interval seconds and when an
+# experiment finishes.
+class Checkpoint():
+	def __init__(self, path, interval=30.0):
+		self.path = path
+		self.interval = interval
+		self.state = {'seeds': {}, 'runs': {}}
+		if os.path.exists(path):
+			with open(path, 'rb') as f:
+				self.state = pickle.load(f)
+		# How often each seed label was asked for in this session
+		self.seen = {}
+		self.last_save = time.time()
+
+	def master_seed(self, label, seed=None):
+		# seed, or for seed=None the master seed drawn for the same experiment (label) the
+		# last time; the k-th experiment with a label in a session gets the k-th seed drawn
+		# for it, so repeated identical calls do not share replications
+		if seed is not None:
+			return seed
+		occurrence = self.seen.get(label, 0)
+		self.seen[label] = occurrence + 1
+		key = (label, occurrence)
+		if key not in self.state['seeds']:
+			self.state['seeds'][key] = np.random.SeedSequence().entropy
+			self.save()
+		return self.state['seeds'][key]
+
+	def key(self, system, seed, num_jobs_per_run, antithetic=False):
+		return cache.result_key(system, seed, num_jobs_per_run, antithetic)
+
+	def runs(self, key):
+		# Dict of replication index -> result finished so far
+		return self.state['runs'].get(key, {})
+
+	def update(self, key, new_runs):
+		self.state['runs'].setdefault(key, {}).update(new_runs)
+		if time.time() - self.last_save >= self.interval:
+			self.save()
+
+	def save(self):
+		# Write to a temporary file first so an interruption never leaves a truncated checkpoint
+		tmp_path = self.path + '.tmp'
+		with open(tmp_path, 'wb') as f:
+			pickle.dump(self.state, f, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp_path, self.path)
+		self.last_save = time.time()
+
+	def num_runs(self):
+		return sum(len(runs) for runs in self.state['runs'].values())
+
+def resume(path, interval=30.0):
+	# Reopen an existing checkpoint; pass it as checkpoint= to the same calls as before
+	if not os.path.exists(path):
+		raise FileNotFoundError("No checkpoint at {}".format(path))
+	checkpoint = Checkpoint(path, interval)
+	print("Resuming from {}: {} finished replications in {} experiments".format(path, checkpoint.num_runs(), len(checkpoint.state['runs'])))
+	return checkpoint
@@ -0,0 +1,198 @@
+import numpy as np
+
+# Job size distributions for the arrival streams. Each one knows its mean and second
+# moment, which is all the M/G/1 closed forms in analysis/analytic.py need (through
+# Se = E[S^2]/(2E[S])), and samples a whole block of sizes in one vectorized call.
+# Sizes are drawn through the arrival stream's exponentials/uniforms/normals on a named
+# substream, so common random numbers and antithetic pairs work for every distribution.
+# A plain number where a distribution is expected is an exponential service rate.
+
+class Distribution():
+	def sample(self, source, stream, n):
+		raise NotImplementedError
+
+	@property
+	def rate(self):
+		return 1.0/self.mean
+
+	@property
+	def excess(self):
+		# Mean of the equilibrium (excess) size, Se
+		return self.second_moment/(2*self.mean)
+
+	@property
+	def scv(self):
+		# Squared coefficient of variation
+		return self.second_moment/self.mean**2 - 1
+
+	def params(self):
+		raise NotImplementedError
+
+	# Compared and hashed by value, so systems built on equal distributions share cached
+	# results and checkpoint entries
+	def __repr__(self):
+		return "{}{}".format(type(self).__name__, self.params())
+
+	def __eq__(self, other):
+		return type(self) is type(other) and self.params() == other.params()
+
+	def __hash__(self):
+		return hash(repr(self))
+
+class Exponential(Distribution):
+	def __init__(self, rate):
+		self.mu = rate
+		self.mean = 1.0/rate
+		self.second_moment = 2.0/rate**2
+
+	@property
+	def rate(self):
+		return self.mu
+
+	def sample(self, source, stream, n):
+		return source.exponentials(stream, n)/self.mu
+
+	def params(self):
+		return (self.mu,)
+
+class Deterministic(Distribution):
+	def __init__(self, value):
+		self.value = value
+		self.mean = float(value)
+		self.second_moment = float(value)**2
+
+	def sample(self, source, stream, n):
+		return np.full(n, self.mean)
+
+	def params(self):
+		return (self.value,)
+
+class Erlang(Distribution):
+	# Sum of k exponential phases of the given rate each
+	def __init__(self, k, rate):
+		self.k = int(k)
+		self.phase_rate = rate
+		self.mean = self.k/rate
+		self.second_moment = self.k*(self.k + 1)/rate**2
+
+	def sample(self, source, stream, n):
+		return source.exponentials(stream, n*self.k).reshape(n, self.k).sum(axis=1)/self.phase_rate
+
+	def params(self):
+		return (self.k, self.phase_rate)
+
+class Mixture(Distribution):
+	# Component i with probability probs[i]; each block draws the component of every job,
+	# then each component's sizes in one call
+	def __init__(self, probs, components):
+		probs = np.asarray(probs, dtype=float)
+		self.probs = probs/probs.sum()
+		self.components = list(components)
+		self.cumulative = np.cumsum(self.probs)[:-1]
+		self.mean = float(sum(p*c.mean for p, c in zip(self.probs, self.components)))
+		self.second_moment = float(sum(p*c.second_moment for p, c in zip(self.probs, self.components)))
+
+	def sample(self, source, stream, n):
+		which = np.searchsorted(self.cumulative, source.uniforms(stream, n), side='right')
+		sizes = np.empty(n)
+		for i, component in enumerate(self.components):
+			chosen = which == i
+			sizes[chosen] = component.sample(source, stream, int(np.count_nonzero(chosen)))
+		return sizes
+
+	def params(self):
+		return (tuple(self.probs.tolist()), tuple(self.components))
+
+class HyperExponential(Mixture):
+	def __init__(self, probs, rates):
+		super().__init__(probs, [Exponential(rate) for rate in rates])
+		self.rates = np.asarray(rates, dtype=float)
+
+	def sample(self, source, stream, n):
+		which = np.searchsorted(self.cumulative, source.uniforms(stream, n), side='right')
+		return source.exponentials(stream, n)/self.rates[which]
+
+	def params(self):
+		return (tuple(self.probs.tolist()), tuple(self.rates.tolist()))
+
+class LogNormal(Distribution):
+	# Parameterized by its mean and squared coefficient of variation
+	def __init__(self, mean, scv):
+		self.sigma = np.sqrt(np.log1p(scv))
+		self.mu = np.log(mean) - self.sigma**2/2
+		self.mean = float(mean)
+		self.second_moment = float(mean)**2*(1 + scv)
+		self.given_scv = scv
+
+	def sample(self, source, stream, n):
+		return np.exp(self.mu + self.sigma*source.normals(stream, n))
+
+	def params(self):
+		return (self.mean, self.given_scv)
+
+class BoundedPareto(Distribution):
+	# Pareto with shape alpha truncated to [low, high], sampled by inversion
+	def __init__(self, alpha, low, high):
+		self.alpha = alpha
+		self.low = low
+		self.high = high
+		self.tail = 1 - (low/high)**alpha
+		self.mean = self.moment(1)
+		self.second_moment = self.moment(2)
+
+	def moment(self, k):
+		a, L, H = self.alpha, self.low, self.high
+		if a == k:
+			return a*L**a*np.log(H/L)/self.tail
+		return a*L**a*(H**(k - a) - L**(k - a))/((k - a)*self.tail)
+
+	def sample(self, source, stream, n):
+		return self.low/(1 - source.uniforms(stream, n)*self.tail)**(1/self.alpha)
+
+	def params(self):
+		return (self.alpha, self.low, self.high)
+
+class Empirical(Distribution):
+	# Inverse-CDF table over observed sizes (or distinct values with probabilities)
+	def __init__(self, values, probs=None):
+		values = np.asarray(values, dtype=float)
+		probs = np.full(len(values), 1.0/len(values)) if probs is None else np.asarray(probs, dtype=float)/np.sum(probs)
+		order = np.argsort(values, kind='stable')
+		self.values = values[order]
+		self.probs = probs[order]
+		self.cumulative = np.cumsum(self.probs)[:-1]
+		self.mean = float(np.dot(self.probs, self.values))
+		self.second_moment = float(np.dot(self.probs, self.values**2))
+
+	def sample(self, source, stream, n):
+		return self.values[np.searchsorted(self.cumulative, source.uniforms(stream, n), side='right')]
+
+	def params(self):
+		return (tuple(self.values.tolist()), tuple(self.probs.tolist()))
+
+def make(size):
+	# A distribution, or a number taken as an exponential service rate
+	if isinstance(size, Distribution):
+		return size
+	return Exponential(size)
+
+# Names accepted by parse, with the constructor arguments in order
+KINDS = {
+	'exp': Exponential,
+	'det': Deterministic,
+	'erlang': Erlang,
+	'hyperexp': lambda *args: HyperExponential(args[:len(args)//2], args[len(args)//2:]),
+	'lognormal': LogNormal,
+	'bpareto': BoundedPareto,
+}
+
+def parse(spec):
+	# Command-line form, e.g. 'exp:2', 'det:0.5', 'erlang:4,8', 'hyperexp:0.9,0.1,10,0.5'
+	# (probabilities then rates), 'lognormal:1,4' (mean, SCV), 'bpareto:1.5,0.1,1000'
+	# or 'empirical:sizes.txt' (one observed size per line)
+	kind, _, args = spec.partition(':')
+	if kind == 'empirical':
+		return Empirical(np.loadtxt(args, ndmin=1))
+	if kind not in KINDS:
+		raise ValueError("Unknown size distribution {!r}, expected one of {}".format(kind, ', '.join(list(KINDS) + ['empirical'])))
+	return KINDS[kind](*(float(x) for x in args.split(',')))
@@ -0,0 +1,296 @@
+import sys
+import copy
+import math
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import analysis.confidence as confidence
+import analysis.statistic as statistic
+
+def progress(count, total, status=''):
+	bar_len = 60
+	filled_len = int(round(bar_len * count / float(total)))
+
+	percents = round(100.0 * count / float(total), 1)
+	bar = '=' * filled_len + '-' * (bar_len - filled_len)
+
+	sys.stdout.write('[%s] %s%s ...%s\r' % (bar, percents, '%', status))
+	sys.stdout.flush()  # As suggested by Rom Ruben (see: http://stackoverflow.com/questions/3173320/text-progress-bar-in-the-console/27871113#comment50529068_27871113)
+
+def seed_sequence(seed=None):
+	# Accepts a SeedSequence, an int or None (fresh entropy)
+	if isinstance(seed, np.random.SeedSequence):
+		return seed
+	return np.random.SeedSequence(seed)
+
+def child_seed(seed, i):
+	# Child i of a seed depends only on (seed, i). Unlike SeedSequence.spawn this does
+	# not mutate the parent, so the same parent always yields the same children.
+	master = seed_sequence(seed)
+	return np.random.SeedSequence(master.entropy, spawn_key=master.spawn_key + (i,), pool_size=master.pool_size)
+
+def replication_seeds(seed, num_runs, start=0):
+	# Replication i is the same in every ensemble built from this master seed
+	master = seed_sequence(seed)
+	return [child_seed(master, i) for i in range(start, start + num_runs)]
+
+def spawn_streams(seed, n):
+	# Split one replication's seed into n independent streams (arrivals, policy coin flips, ...)
+	master = seed_sequence(seed)
+	return [child_seed(master, i) for i in range(n)]
+
+def run_replications(system, seeds, antithetic=False):
+	# Worker entry point: one fresh replication of the system per seed, or with antithetic
+	# an (original, antithetic) pair of runs per seed
+	results = []
+	for seed in seeds:
+		if antithetic:
+			system.reset(seed, 0)
+			first = system.simulate_run()
+			system.reset(seed, 1)
+			results.append((first, system.simulate_run()))
+		else:
+			system.reset(seed)
+			results.append(system.simulate_run())
+	return results
+
+def run_profiled_replications(system, seeds, antithetic=False):
+	# Worker entry point with a profiler attached: the worker's profiles go back with the results
+	system.profiler.runs = []
+	return run_replications(system, seeds, antithetic), system.profiler.runs
+
+def average_values(x, y):
+	# Truncation points come as dicts (None without truncation)
+	if x is None:
+		return None
+	if isinstance(x, dict):
+		return {name: (value + y[name])/2 for name, value in x.items()}
+	return (x + y)/2
+
+def average_pair(pair):
+	# Field-by-field average of the two runs of an antithetic pair
+	first, second = pair
+	if isinstance(first, tuple):
+		return tuple(average_values(x, y) for x, y in zip(first, second))
+	average = copy.copy(first)
+	for name, value in vars(first).items():
+		setattr(average, name, average_values(value, getattr(second, name)))
+	return average
+
+def run_seeds(system, seeds, workers=1, chunk_size=None, show_progress=True, antithetic=False):
+	# simulate_run() results (or antithetic pairs of them) for the given replication seeds, in the same order
+	num_runs = len(seeds)
+	if workers is None or workers <= 1:
+		results = []
+		for i, rep_seed in enumerate(seeds):
+			results.extend(run_replications(system, [rep_seed], antithetic))
+			if show_progress:
+				progress(i, num_runs)
+		return results
+
+	if chunk_size is None:
+		# A few chunks per worker keeps the pool busy without much pickling overhead
+		chunk_size = max(1, -(-num_runs // (4*workers)))
+	chunks = [seeds[i:i + chunk_size] for i in range(0, num_runs, chunk_size)]
+
+	profiler = getattr(system, 'profiler', None)
+	results = []
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		worker = run_replications if profiler is None else run_profiled_replications
+		for chunk_results in pool.map(worker, [system]*len(chunks), chunks, [antithetic]*len(chunks)):
+			if profiler is not None:
+				chunk_results, profiles = chunk_results
+				profiler.runs.extend(profiles)
+			results.extend(chunk_results)
+			if show_progress:
+				progress(len(results) - 1, num_runs)
+	return results
+
+def completed_chunks(system, seeds, workers=1, chunk_size=None, antithetic=False):
+	# Yields (positions in seeds, results) for each chunk of seeds as soon as it finishes,
+	# in completion order, from one pool kept open until every chunk is done
+	if workers is None or workers <= 1:
+		for i, rep_seed in enumerate(seeds):
+			yield [i], run_replications(system, [rep_seed], antithetic)
+		return
+
+	if chunk_size is None:
+		chunk_size = max(1, -(-len(seeds) // (4*workers)))
+	profiler = getattr(system, 'profiler', None)
+	worker = run_replications if profiler is None else run_profiled_replications
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		futures = {pool.submit(worker, system, seeds[i:i + chunk_size], antithetic): list(range(i, min(i + chunk_size, len(seeds))))
+				   for i in range(0, len(seeds), chunk_size)}
+		for future in as_completed(futures):
+			chunk_results = future.result()
+			if profiler is not None:
+				chunk_results, profiles = chunk_results
+				profiler.runs.extend(profiles)
+			yield futures[future], chunk_results
+
+def run_ensemble(system, num_runs, seed=None, workers=1, chunk_size=None, show_progress=True, cache=None, antithetic=False,
+				 checkpoint=None):
+	# Returns the simulate_run() result of every replication, in replication order.
+	# Replication i always runs on the i-th child of the master seed, so the output
+	# does not depend on the number of workers or the chunk size.
+	# With a cache (util/cache.py) and an explicit seed, only replications that are
+	# not cached yet are simulated. With antithetic every replication is a pair of runs.
+	# With a checkpoint (util/checkpoint.py) and an explicit seed, replications already in
+	# the checkpoint are reused and each new chunk is added to it as it finishes.
+	if (cache is None and checkpoint is None) or seed is None:
+		return run_seeds(system, replication_seeds(seed, num_runs), workers, chunk_size, show_progress, antithetic)
+
+	runs = {}
+	if cache is not None:
+		key = cache.key(system, seed, system.num_jobs_per_run, antithetic)
+		runs.update(cache.load(key))
+	if checkpoint is not None:
+		checkpoint_key = checkpoint.key(system, seed, system.num_jobs_per_run, antithetic)
+		runs.update(checkpoint.runs(checkpoint_key))
+	missing = [i for i in range(num_runs) if i not in runs]
+	if len(missing) > 0:
+		master = seed_sequence(seed)
+		if checkpoint is None:
+			new_results = run_seeds(system, [child_seed(master, i) for i in missing], workers, chunk_size, show_progress, antithetic)
+			runs.update(zip(missing, new_results))
+		else:
+			# The checkpoint saves itself every interval seconds; an interruption still saves
+			# what has finished
+			done = 0
+			try:
+				for positions, chunk_results in completed_chunks(system, [child_seed(master, i) for i in missing], workers, chunk_size, antithetic):
+					new_runs = {missing[j]: result for j, result in zip(positions, chunk_results)}
+					runs.update(new_runs)
+					checkpoint.update(checkpoint_key, new_runs)
+					done += len(new_runs)
+					if show_progress:
+						progress(done - 1, len(missing))
+			finally:
+				checkpoint.save()
+		if cache is not None:
+			cache.store(key, runs)
+	return [runs[i] for i in range(num_runs)]
+
+def precision(runs, metrics, level):
+	# metric -> (mean, half-width, relative half-width) over the per-run metric dicts
+	report = {}
+	for name in metrics:
+		mean, half_width = confidence.mean_half_width([run[name] for run in runs], level)
+		report[name] = (mean, half_width, confidence.relative_half_width(mean, half_width))
+	return report
+
+def run_sequential(system, rel_precision=None, time_budget=None, max_runs=None, seed=None, workers=1, chunk_size=None,
+				   cache=None, min_runs=10, level=0.95, antithetic=False, checkpoint=None):
+	# Adds replications until the confidence interval of every targeted metric is within
+	# rel_precision of its mean, the wall-clock budget (seconds) is spent or max_runs is
+	# reached. rel_precision is one target for all of system.precision_metrics(run) or a
+	# dict of per-metric targets. Replication i runs on the i-th child of the master seed,
+	# exactly as in run_ensemble (as an antithetic pair with antithetic, in which case
+	# precision is judged on the pair averages). Returns (run results, confidence.PrecisionReport).
+	start_time = time.time()
+	master = seed_sequence(seed)
+	if rel_precision is None:
+		targets = {}
+	elif isinstance(rel_precision, dict):
+		targets = dict(rel_precision)
+	else:
+		targets = None
+	workers = max(1, workers or 1)
+
+	results = []
+	metric_runs = []
+	num_runs = min_runs if max_runs is None else min(min_runs, max_runs)
+	while True:
+		if (cache is not None or checkpoint is not None) and seed is not None:
+			results = run_ensemble(system, num_runs, seed, workers, chunk_size, False, cache, antithetic, checkpoint)
+		else:
+			results.extend(run_seeds(system, replication_seeds(master, num_runs - len(results), len(results)), workers, chunk_size, False, antithetic))
+		for run in results[len(metric_runs):]:
+			metric_runs.append(system.precision_metrics(average_pair(run) if antithetic else run))
+		if targets is None:
+			targets = {name: rel_precision for name in metric_runs[0]}
+		report = precision(metric_runs, metric_runs[0].keys(), level)
+		elapsed = time.time() - start_time
+
+		done = len(targets) > 0 and all(report[name][2] <= target for name, target in targets.items())
+		if done or (max_runs is not None and num_runs >= max_runs) or (time_budget is not None and elapsed >= time_budget):
+			break
+
+		# Runs needed for the worst metric if its variance estimate holds, growing at most
+		# twofold per round so a noisy pilot does not overshoot
+		needed = num_runs
+		for name, target in targets.items():
+			if target > 0 and math.isfinite(report[name][2]):
+				needed = max(needed, math.ceil(num_runs*(report[name][2]/target)**2))
+		next_runs = min(max(needed, num_runs + workers), 2*num_runs)
+		if time_budget is not None and elapsed > 0:
+			# Only as many as fit in the remaining budget at the rate seen so far (no rate
+			# yet if every run so far came from the cache or checkpoint)
+			per_run = elapsed/num_runs
+			next_runs = min(next_runs, num_runs + max(1, int((time_budget - elapsed)/per_run)))
+		if max_runs is not None:
+			next_runs = min(next_runs, max_runs)
+		num_runs = next_runs
+
+	return results, confidence.PrecisionReport(len(results), time.time() - start_time, level, targets, report)
+
+def run_system(system, seed=None, workers=1, chunk_size=None, show_progress=True, cache=None, rel_precision=None, time_budget=None,
+			   antithetic=False, checkpoint=None):
+	# Entry point of the systems' simulate(): system.num_runs replications, or with a
+	# precision target or time budget a sequential ensemble of at most system.num_runs.
+	# The achieved precision is left in system.precision_report (None for fixed ensembles).
+	# With antithetic the num_runs runs are made in num_runs/2 antithetic pairs and the
+	# pair averages are returned; system.antithetic_report gives, per precision metric,
+	# the variance of the pair averages relative to that of two independent runs
+	# (below 1 means the pairing reduced variance). With a profiler attached
+	# (util/profiling.py) its report is left in system.profile. With a checkpoint, an experiment
+	# started without a seed gets its master seed from the checkpoint so it can resume.
+	if checkpoint is not None:
+		label = (type(system).__name__, system.params, system.num_runs, system.num_jobs_per_run, system.stat_type.__name__, antithetic)
+		seed = checkpoint.master_seed(label, seed)
+	num_pairs = -(-system.num_runs // 2) if antithetic else system.num_runs
+	if rel_precision is None and time_budget is None:
+		system.precision_report = None
+		results = run_ensemble(system, num_pairs, seed, workers, chunk_size, show_progress, cache, antithetic, checkpoint)
+	else:
+		results, system.precision_report = run_sequential(system, rel_precision, time_budget, num_pairs, seed, workers, chunk_size, cache,
+														  antithetic=antithetic, checkpoint=checkpoint)
+	system.profile = None
+	if getattr(system, 'profiler', None) is not None:
+		system.profile = system.profiler.report()
+		system.profiler = None
+	system.antithetic_report = None
+	if not antithetic:
+		return results
+
+	averages = [average_pair(pair) for pair in results]
+	if len(results) > 1:
+		single_runs = [system.precision_metrics(run) for pair in results for run in pair]
+		pair_runs = [system.precision_metrics(run) for run in averages]
+		system.antithetic_report = {}
+		for name in pair_runs[0]:
+			single_variance = np.var([run[name] for run in single_runs], ddof=1)
+			pair_variance = np.var([run[name] for run in pair_runs], ddof=1)
+			system.antithetic_report[name] = pair_variance/(single_variance/2) if single_variance > 0 else float('nan')
+	return averages
+
+def run_batch_means(system, num_jobs, seed=None, level=0.95, truncate_warmup=False):
+	# Batch-means mode: one long run of the system (num_jobs completions of each class)
+	# instead of independent replications, so the start-up transient is paid once.
+	# Returns the run's simulate_run() result and, for each statistic the run collects
+	# (e.g. response1_times), (mean, CI half-width, batch size, number of batches) with
+	# the batch size grown until the batch means are no longer autocorrelated. With
+	# truncate_warmup the MSER-5 warm-up is dropped first and the number of discarded
+	# observations is appended to each tuple.
+	num_jobs_per_run = system.num_jobs_per_run
+	stat_type = system.stat_type
+	system.num_jobs_per_run = num_jobs
+	system.stat_type = statistic.MSERStat if truncate_warmup else statistic.BatchMeans
+	try:
+		system.reset(seed)
+		result = system.simulate_run()
+	finally:
+		system.num_jobs_per_run = num_jobs_per_run
+		system.stat_type = stat_type
+	intervals = {name: stat.interval(level) for name, stat in vars(system.stats).items() if hasattr(stat, 'interval')}
+	return result, intervals
@@ -1,5 +1,9 @@
 # Basic job class
 class Job():
+	# Fixed attribute slots instead of a per-job __dict__: much smaller jobs and less
+	# allocation and garbage collection work over long runs
+	__slots__ = ('size', 'arrival_time', 'start_service_time', 'priority', 'final_priority', 'jid')
+
 	def __init__(self, size, arrival_time, jid, priority=1, final_priority=None):
 		self.size = size
 		self.arrival_time = arrival_time
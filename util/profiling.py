@@ -0,0 +1,106 @@
+import sys
+import time
+import util.queue as queue
+
+try:
+	import resource
+except ImportError:
+	# Not available on Windows; peak RSS is then reported as None
+	resource = None
+
+# Opt-in instrumentation of the event-driven systems (system.profiler = Profiler(), or
+# simulate(profile=True)). For each replication the system's handle_arrival and
+# handle_service, its arrival stream's block draws and its collectors' calls are wrapped
+# with counters and perf_counter timers on the instance, so nothing changes when no
+# profiler is attached. Times are inclusive: handle_* contains the RNG and statistics
+# time spent inside it, and event handling gives what is left.
+
+def peak_rss_kb():
+	if resource is None:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# Kilobytes on Linux, bytes on macOS
+	if sys.platform == 'darwin':
+		return peak//1024
+	return peak
+
+def timed(function, totals, name, on_return=None):
+	def wrapper(*args):
+		start = time.perf_counter()
+		result = function(*args)
+		totals[name] += time.perf_counter() - start
+		if on_return is not None:
+			on_return()
+		return result
+	return wrapper
+
+class Profiler():
+	def __init__(self):
+		self.start_time = time.perf_counter()
+		# One dict per replication profiled, see end_run
+		self.runs = []
+		self.run_start = None
+
+	def start_run(self, system):
+		# Called by simulate_run once the run's queues and collectors are in place
+		self.times = {'arrival': 0.0, 'service': 0.0, 'rng': 0.0, 'statistics': 0.0}
+		self.events = {'arrival': 0, 'service': 0}
+		self.queues = [(name, value) for name, value in vars(system).items() if isinstance(value, queue.FCFSQueue)]
+		self.peak_queue = {name: 0 for name, _ in self.queues}
+
+		def count(name):
+			def counted():
+				self.events[name] += 1
+				for queue_name, q in self.queues:
+					if q.num_jobs() > self.peak_queue[queue_name]:
+						self.peak_queue[queue_name] = q.num_jobs()
+			return counted
+
+		cls = type(system)
+		system.handle_arrival = timed(cls.handle_arrival.__get__(system), self.times, 'arrival', count('arrival'))
+		system.handle_service = timed(cls.handle_service.__get__(system), self.times, 'service', count('service'))
+		system.arrivals.draw_block = timed(type(system.arrivals).draw_block.__get__(system.arrivals), self.times, 'rng')
+		for collector in system.collectors:
+			collector.arrival = timed(type(collector).arrival.__get__(collector), self.times, 'statistics')
+			collector.depart = timed(type(collector).depart.__get__(collector), self.times, 'statistics')
+		self.run_start = time.perf_counter()
+
+	def end_run(self, system):
+		wall = time.perf_counter() - self.run_start
+		# Back to the plain methods for anything run after this replication
+		for obj in [system, system.arrivals] + system.collectors:
+			for name in ('handle_arrival', 'handle_service', 'draw_block', 'arrival', 'depart'):
+				obj.__dict__.pop(name, None)
+		num_events = self.events['arrival'] + self.events['service']
+		times = dict(self.times)
+		times['event handling'] = times['arrival'] + times['service'] - times['rng'] - times['statistics']
+		self.runs.append({'events': dict(self.events), 'times': times, 'wall': wall,
+						  'events_per_sec': num_events/wall if wall > 0 else float('nan'),
+						  'peak_queue': dict(self.peak_queue), 'peak_rss_kb': peak_rss_kb()})
+
+	def report(self):
+		# Per-replication profiles and their ensemble totals as plain dicts
+		ensemble = {'num_runs': len(self.runs), 'wall': time.perf_counter() - self.start_time}
+		if self.runs:
+			events = {name: sum(run['events'][name] for run in self.runs) for name in self.runs[0]['events']}
+			run_time = sum(run['wall'] for run in self.runs)
+			ensemble.update({'events': events,
+							 'times': {name: sum(run['times'][name] for run in self.runs) for name in self.runs[0]['times']},
+							 'run_time': run_time,
+							 'events_per_sec': sum(events.values())/run_time if run_time > 0 else float('nan'),
+							 'peak_queue': {name: max(run['peak_queue'][name] for run in self.runs) for name in self.runs[0]['peak_queue']},
+							 'peak_rss_kb': max((run['peak_rss_kb'] for run in self.runs if run['peak_rss_kb'] is not None), default=None)})
+		return {'runs': list(self.runs), 'ensemble': ensemble}
+
+def format_report(report):
+	ensemble = report['ensemble']
+	if ensemble['num_runs'] == 0:
+		return "No replications profiled"
+	lines = ["{} replications in {:.2f}s ({:.2f}s simulating), {:,.0f} events/sec".format(
+			 ensemble['num_runs'], ensemble['wall'], ensemble['run_time'], ensemble['events_per_sec'])]
+	lines.append("  events: " + ", ".join("{} {}".format(name, count) for name, count in ensemble['events'].items()))
+	lines.append("  time: " + ", ".join("{} {:.3f}s".format(name, seconds) for name, seconds in ensemble['times'].items()))
+	lines.append("  peak queue lengths: " + ", ".join("{} {}".format(name, peak) for name, peak in ensemble['peak_queue'].items()))
+	if ensemble['peak_rss_kb'] is not None:
+		lines.append("  peak RSS: {:.1f} MB".format(ensemble['peak_rss_kb']/1024))
+	return "\n".join(lines)
@@ -1,20 +1,29 @@
+from collections import deque
+
 class FCFSQueue():
 	def __init__(self):
-		self.jobs_waiting = []
+		self.jobs_waiting = deque()
 		self.work = 0.0
+		# Number of waiting jobs by class and by final class, kept up to date on push/pop
+		self.priority_counts = {}
+		self.final_priority_counts = {}
 
 	def pop(self):
 		# Pop job from queue and update current work in queue
-		if len(self.jobs_waiting) == 0:
+		if not self.jobs_waiting:
 			return None
-		job = self.jobs_waiting.pop(0)
+		job = self.jobs_waiting.popleft()
 		self.work -= job.size
+		self.priority_counts[job.priority] -= 1
+		self.final_priority_counts[job.final_priority] -= 1
 		return job
 
 	def push(self, job):
 		if (job is not None):
 			self.work += job.size
 			self.jobs_waiting.append(job)
+			self.priority_counts[job.priority] = self.priority_counts.get(job.priority, 0) + 1
+			self.final_priority_counts[job.final_priority] = self.final_priority_counts.get(job.final_priority, 0) + 1
 
 	def work(self):
 		return self.work
@@ -23,9 +32,8 @@ class FCFSQueue():
 		return len(self.jobs_waiting)
 
 	def num_jobs_priority(self, priority):
-		count = 0
-		for job in self.jobs_waiting:
-			# We want the jobs with this actual class
-			if job.priority == priority:
-				count += 1
-		return count
\ No newline at end of file
+		# We want the jobs with this actual class
+		return self.priority_counts.get(priority, 0)
+
+	def num_jobs_final_priority(self, priority):
+		return self.final_priority_counts.get(priority, 0)
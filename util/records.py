@@ -0,0 +1,127 @@
+import os
+import json
+import numpy as np
+
+# Per-job records of simulated runs, written to disk as columns. A JobRecordSink is a
+# collector (attach(system, 'records_dir') adds one to a system) that fills a
+# preallocated NumPy block at every departure (one structured row per job, a single
+# assignment) and writes each full block as one chunk: one .npy file per column plus an
+# entry in index.json. RecordStore reads them back lazily,
+# memory-mapping only the chunks that overlap the requested rows. Records are in
+# departure order; run numbers the replications seen by the sink, which starts a new run
+# when the clock goes back to an earlier time, and num_seen is the number of jobs the job
+# found in the system on arrival. Like TraceCollector the sink only sees the
+# replications of its own process, so attach it to serial runs (workers=1) or batch
+# means, and close() it afterwards to write the last partial block.
+
+INDEX = 'index.json'
+COLUMNS = {'run': '<i4', 'jid': '<i8', 'class': '<i1', 'final_class': '<i1', 'arrival': '<f8', 'start': '<f8',
+		   'departure': '<f8', 'size': '<f8', 'num_seen': '<i4'}
+
+# Records per chunk
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+def chunk_file(path, chunk, name):
+	return os.path.join(path, "{:06d}.{}.npy".format(chunk, name))
+
+class JobRecordSink():
+	def __init__(self, path, arrivals, block_size=DEFAULT_BLOCK_SIZE):
+		self.path = path
+		# The system's arrival stream, whose last jid is the job of each arrival event
+		self.arrivals = arrivals
+		self.block_size = block_size
+		os.makedirs(path, exist_ok=True)
+		self.index = {'columns': COLUMNS, 'num_rows': 0, 'chunks': []}
+		self.block = np.empty(block_size, dtype=list(COLUMNS.items()))
+		self.rows = 0
+		self.run = -1
+		self.last_time = np.inf
+		# Jobs in system (for systems that report no counts), and what each job in the
+		# system found on arrival, by jid
+		self.num_jobs = 0
+		self.seen = {}
+
+	def advance(self, time):
+		if time < self.last_time:
+			# A new replication (or the first): jobs left in the previous one never depart
+			self.run += 1
+			self.num_jobs = 0
+			self.seen = {}
+		self.last_time = time
+
+	def arrival(self, time, *counts):
+		self.advance(time)
+		# The class counts the system reports, or the sink's own count (FCFS)
+		self.seen[self.arrivals.jid - 1] = counts[0] + counts[1] if counts else self.num_jobs
+		self.num_jobs += 1
+
+	def depart(self, curr_time, response_time, *args):
+		job = args[-1]
+		self.advance(curr_time)
+		self.num_jobs -= 1
+		# A job put straight into service at the start of a run has no arrival event and found it empty
+		self.block[self.rows] = (self.run, job.jid, job.priority, job.final_priority, job.arrival_time, job.start_service_time,
+								 curr_time, job.size, self.seen.pop(job.jid, 0))
+		self.rows += 1
+		if self.rows == self.block_size:
+			self.flush()
+
+	def flush(self):
+		if self.rows == 0:
+			return
+		chunk = len(self.index['chunks'])
+		for name in COLUMNS:
+			np.save(chunk_file(self.path, chunk, name), np.ascontiguousarray(self.block[name][:self.rows]))
+		self.index['chunks'].append({'rows': self.rows, 'first_row': self.index['num_rows']})
+		self.index['num_rows'] += self.rows
+		self.rows = 0
+		# Rewritten atomically after every chunk, so the records flushed so far stay readable
+		tmp_path = os.path.join(self.path, INDEX + '.tmp')
+		with open(tmp_path, 'w') as f:
+			json.dump(self.index, f, indent=1)
+		os.replace(tmp_path, os.path.join(self.path, INDEX))
+
+	def close(self):
+		self.flush()
+
+def attach(system, path, block_size=DEFAULT_BLOCK_SIZE):
+	# Records every job of the system's later runs under path; close() the returned sink when done
+	sink = JobRecordSink(path, system.arrivals, block_size)
+	system.add_collector(sink)
+	return sink
+
+class RecordStore():
+	def __init__(self, path):
+		self.path = path
+		with open(os.path.join(path, INDEX)) as f:
+			self.index = json.load(f)
+		self.columns = list(self.index['columns'])
+		self.num_rows = self.index['num_rows']
+
+	def chunk_column(self, chunk, name):
+		# Memory-mapped column of one chunk
+		return np.load(chunk_file(self.path, chunk, name), mmap_mode='r')
+
+	def chunks(self, columns=None, start=0, stop=None):
+		# (first row, dict of memory-mapped columns) for each chunk overlapping rows [start, stop),
+		# trimmed to that range
+		stop = self.num_rows if stop is None else min(stop, self.num_rows)
+		for chunk, entry in enumerate(self.index['chunks']):
+			first, rows = entry['first_row'], entry['rows']
+			if first + rows <= start or first >= stop:
+				continue
+			lo = max(start - first, 0)
+			hi = min(stop - first, rows)
+			yield first + lo, {name: self.chunk_column(chunk, name)[lo:hi] for name in columns or self.columns}
+
+	def read(self, columns=None, start=0, stop=None):
+		# Rows [start, stop) of the selected columns as in-memory arrays
+		columns = columns or self.columns
+		parts = {name: [] for name in columns}
+		for _, chunk in self.chunks(columns, start, stop):
+			for name in columns:
+				parts[name].append(chunk[name])
+		return {name: np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=self.index['columns'][name]) for name in columns}
+
+	def __len__(self):
+		return self.num_rows
@@ -1,4 +1,5 @@
 import util.jobs as jobs
+import analysis.statistic as statistic
 
 # Basic server class
 class Server():
@@ -7,8 +8,8 @@ class Server():
 		self.time_depart = float('inf')
 		self.last_time_served_job1 = None
 		self.last_time_served_job2 = None
-		self.time_between_job1s = []
-		self.time_between_job2s = []
+		self.time_between_job1s = statistic.RunningStat()
+		self.time_between_job2s = statistic.RunningStat()
 
 	def time_next_depart(self):
 		# Time for job to depart
@@ -29,11 +30,11 @@ class Server():
 			self.job_serving = job
 			if job.priority == 1:
 				if self.last_time_served_job1 is not None:
-					self.time_between_job1s.append(time_now - self.last_time_served_job1)
+					self.time_between_job1s.add(time_now - self.last_time_served_job1)
 				self.last_time_served_job1 = time_now + job.size
 			else:
 				if self.last_time_served_job2 is not None:
-					self.time_between_job2s.append(time_now - self.last_time_served_job2)
+					self.time_between_job2s.add(time_now - self.last_time_served_job2)
 				self.last_time_served_job2 = time_now + job.size
 
 	def work(self, time_now):
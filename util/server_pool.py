@@ -0,0 +1,65 @@
+import heapq
+import util.server as server
+import analysis.statistic as statistic
+
+# k identical servers with the same interface as a single Server. Busy servers are kept
+# in a binary heap keyed by departure time, so the next departure is read in O(1) and
+# completing or starting a job costs O(log k); idle servers are a heap of indices, so
+# the lowest-numbered idle server is always taken first. With k = 1 this behaves
+# exactly like Server.
+class ServerPool():
+	def __init__(self, num_servers=1):
+		self.servers = [server.Server() for _ in range(num_servers)]
+		self.busy = []
+		self.idle = list(range(num_servers))
+		# Number of jobs in service by class and by final class
+		self.priority_counts = {}
+		self.final_priority_counts = {}
+
+		# Time between jobs of the same class, pooled over all servers
+		self.time_between_job1s = statistic.RunningStat()
+		self.time_between_job2s = statistic.RunningStat()
+		for s in self.servers:
+			s.time_between_job1s = self.time_between_job1s
+			s.time_between_job2s = self.time_between_job2s
+
+	def time_next_depart(self):
+		# Earliest departure over all busy servers
+		if len(self.busy) == 0:
+			return float('inf')
+		return self.busy[0][0]
+
+	def has_idle(self):
+		return len(self.idle) > 0
+
+	def complete(self):
+		# Complete the job on the server that departs first
+		_, i = heapq.heappop(self.busy)
+		job = self.servers[i].complete()
+		heapq.heappush(self.idle, i)
+		self.priority_counts[job.priority] -= 1
+		self.final_priority_counts[job.final_priority] -= 1
+		return job
+
+	def push(self, job, time_now):
+		# Start the job on an idle server, if there is one
+		if job is not None and self.has_idle():
+			i = heapq.heappop(self.idle)
+			s = self.servers[i]
+			s.push(job, time_now)
+			heapq.heappush(self.busy, (s.time_next_depart(), i))
+			self.priority_counts[job.priority] = self.priority_counts.get(job.priority, 0) + 1
+			self.final_priority_counts[job.final_priority] = self.final_priority_counts.get(job.final_priority, 0) + 1
+
+	def work(self, time_now):
+		# Work left summed over the busy servers
+		return sum(time_depart - time_now for time_depart, _ in self.busy)
+
+	def num_jobs(self):
+		return len(self.busy)
+
+	def num_jobs_priority(self, priority):
+		return self.priority_counts.get(priority, 0)
+
+	def num_jobs_final_priority(self, priority):
+		return self.final_priority_counts.get(priority, 0)
@@ -0,0 +1,169 @@
+import csv
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import util.ensemble as ensemble
+import analysis.analytic as analytic
+import systems.basic_np_system as basic_np_system
+import systems.switching_np_system as switching_np_system
+import systems.bp_np_system as bp_np_system
+import systems.server_switch_np_system as server_switch_np_system
+
+def make_np_basic(point, num_jobs_per_run):
+	return basic_np_system.NPPrioritySystem(1, num_jobs_per_run, point['lambda1'], point['lambda2'], point['mu1'], point['mu2'], point.get('num_servers', 1))
+
+def make_switching(point, num_jobs_per_run):
+	return switching_np_system.SwitchingNPSystem(1, num_jobs_per_run, point['lambda1'], point['lambda2'], point['mu1'], point['mu2'], point['stay_prob'], point.get('num_servers', 1))
+
+def make_bp(point, num_jobs_per_run):
+	return bp_np_system.BusyPeriodNPSystem(1, num_jobs_per_run, point['lambda1'], point['lambda2'], point['mu1'], point['mu2'], point['stay_prob'], point.get('num_servers', 1))
+
+def make_server_switch(point, num_jobs_per_run):
+	return server_switch_np_system.ServerSwitchNPSystem(1, num_jobs_per_run, point['lambda1'], point['lambda2'], point['mu1'], point['mu2'], point['stay_prob'], point.get('num_servers', 1))
+
+# name -> constructor from a grid point
+SYSTEMS = {
+	'np_basic': make_np_basic,
+	'switching': make_switching,
+	'bp': make_bp,
+	'server_switch': make_server_switch,
+}
+
+def run_metrics(run_result):
+	# Metrics of one run; the warm-up truncation points are not averaged
+	return {name: value for name, value in vars(run_result).items() if name != 'truncated'}
+
+def make_grid(rho_pairs, stay_probs, mu1, mu2, num_servers=1):
+	# One point per (rho1, rho2, stay_prob); stay_prob is the routing/priority probability
+	# for the switching, busy-period and server-switch systems and ignored by np_basic.
+	# rho is the per-server load, so the arrival rates scale with num_servers
+	points = []
+	for rho1, rho2 in rho_pairs:
+		for p in stay_probs:
+			points.append({'rho1': rho1, 'rho2': rho2, 'stay_prob': p, 'mu1': mu1, 'mu2': mu2, 'num_servers': num_servers,
+						   'lambda1': rho1*mu1*num_servers, 'lambda2': rho2*mu2*num_servers})
+	return points
+
+def table_row(system_name, point, metric, mean, std_err, num_runs):
+	return {'system': system_name, 'rho1': point['rho1'], 'rho2': point['rho2'],
+			'stay_prob': point['stay_prob'], 'mu1': point['mu1'], 'mu2': point['mu2'],
+			'num_servers': point.get('num_servers', 1),
+			'metric': metric, 'mean': mean, 'std_err': std_err, 'num_runs': num_runs}
+
+def analytic_table(points, system_names):
+	# Rows like sweep()'s from the closed forms in analysis/analytic.py, evaluated on the
+	# whole grid at once (std_err 0 and num_runs 0). The formulas are single-server, so
+	# points with more servers are NaN
+	columns = {name: np.array([point[name] for point in points], dtype=float) for name in ('lambda1', 'lambda2', 'mu1', 'mu2', 'stay_prob')}
+	single_server = np.array([point.get('num_servers', 1) == 1 for point in points])
+	table = []
+	for system_name in system_names:
+		values = {metric: np.where(single_server, column, np.nan) for metric, column in analytic.FORMULAS[system_name](columns).items()}
+		for point_index, point in enumerate(points):
+			for metric, column in values.items():
+				table.append(table_row(system_name, point, metric, float(column[point_index]), 0.0, 0))
+	return table
+
+# Systems built so far in this process, so a worker reuses one system per (system, point, run length)
+system_cache = {}
+
+def run_task(task):
+	system_name, point_index, point, num_jobs_per_run, rep_seed = task
+	key = (system_name, tuple(sorted(point.items())), num_jobs_per_run)
+	if key not in system_cache:
+		system_cache[key] = SYSTEMS[system_name](point, num_jobs_per_run)
+	system = system_cache[key]
+	system.reset(rep_seed)
+	return system.simulate_run()
+
+def sweep(points, system_names, num_runs, num_jobs_per_run, seed=None, workers=1, chunk_size=1, cache=None, analytic_only=False,
+		  checkpoint=None):
+	# Runs num_runs replications of every system at every point and returns a tidy
+	# table: one row per (system, point, metric) with the ensemble mean and its standard error.
+	# Every (system, point, replication) is a separate task; the highest-load tasks are
+	# scheduled first so the long runs do not straggle at the end. Replication i at a point
+	# runs on the same seed for every system and any number of workers.
+	# With a cache (util/cache.py) and an explicit seed, cached replications are not rerun.
+	# With analytic_only the systems with a closed form are evaluated from it instead of simulated.
+	# With a checkpoint (util/checkpoint.py) every finished replication is recorded as it
+	# arrives, and rerunning the same sweep with it only runs the missing ones.
+	if analytic_only:
+		exact = [name for name in system_names if name in analytic.FORMULAS]
+		simulated = [name for name in system_names if name not in analytic.FORMULAS]
+		table = analytic_table(points, exact)
+		if simulated:
+			table.extend(sweep(points, simulated, num_runs, num_jobs_per_run, seed, workers, chunk_size, cache, checkpoint=checkpoint))
+		return table
+
+	if checkpoint is not None:
+		label = ('sweep', tuple(tuple(sorted(point.items())) for point in points), tuple(system_names), num_runs, num_jobs_per_run)
+		seed = checkpoint.master_seed(label, seed)
+	master = ensemble.seed_sequence(seed)
+	use_cache = cache is not None and seed is not None
+
+	tasks = []
+	runs = {}
+	cache_keys = {}
+	checkpoint_keys = {}
+	for point_index, point in enumerate(points):
+		point_seed = ensemble.child_seed(master, point_index)
+		for system_name in system_names:
+			cached = {}
+			if use_cache:
+				key = cache.key(SYSTEMS[system_name](point, num_jobs_per_run), point_seed, num_jobs_per_run)
+				cache_keys[(system_name, point_index)] = key
+				cached = cache.load(key)
+			cached = dict(cached)
+			if checkpoint is not None:
+				key = checkpoint.key(SYSTEMS[system_name](point, num_jobs_per_run), point_seed, num_jobs_per_run)
+				checkpoint_keys[(system_name, point_index)] = key
+				cached.update(checkpoint.runs(key))
+			runs[(system_name, point_index)] = cached
+			for i in range(num_runs):
+				if i not in cached:
+					tasks.append((system_name, point_index, point, num_jobs_per_run, ensemble.child_seed(point_seed, i)))
+	tasks.sort(key=lambda task: -(task[2]['rho1'] + task[2]['rho2']))
+
+	def record(task, result):
+		# Gather per-replication results back by (system, point); the replication index is
+		# the last entry of the seed's spawn key
+		system_point = (task[0], task[1])
+		runs[system_point][task[4].spawn_key[-1]] = result
+		if checkpoint is not None:
+			checkpoint.update(checkpoint_keys[system_point], {task[4].spawn_key[-1]: result})
+
+	try:
+		if workers is None or workers <= 1:
+			for task in tasks:
+				record(task, run_task(task))
+		else:
+			with ProcessPoolExecutor(max_workers=workers) as pool:
+				for task, result in zip(tasks, pool.map(run_task, tasks, chunksize=chunk_size)):
+					record(task, result)
+	finally:
+		# Also on an interruption, so the finished replications are kept
+		if checkpoint is not None:
+			checkpoint.save()
+	if use_cache:
+		for system_point, key in cache_keys.items():
+			cache.store(key, runs[system_point])
+
+	table = []
+	for point_index, point in enumerate(points):
+		for system_name in system_names:
+			point_runs = [run_metrics(runs[(system_name, point_index)][i]) for i in range(num_runs)]
+			for metric in point_runs[0]:
+				values = np.array([run[metric] for run in point_runs], dtype=float)
+				std_err = values.std(ddof=1)/math.sqrt(len(values)) if len(values) > 1 else float('nan')
+				table.append(table_row(system_name, point, metric, values.mean(), std_err, len(values)))
+	return table
+
+def select(table, system_name, metric):
+	# Rows of one system and metric, in grid order (e.g. for plotting against stay_prob)
+	return [row for row in table if row['system'] == system_name and row['metric'] == metric]
+
+def write_csv(table, path):
+	with open(path, 'w', newline='') as f:
+		writer = csv.DictWriter(f, fieldnames=list(table[0].keys()))
+		writer.writeheader()
+		writer.writerows(table)
@@ -0,0 +1,244 @@
+import os
+import json
+import argparse
+import itertools
+import numpy as np
+import util.jobs as jobs
+import util.arrivals as arrivals
+import systems.basic_np_system as basic_np_system
+import systems.switching_np_system as switching_np_system
+
+# Replay of recorded arrivals (arrival time, size, class) instead of Poisson arrivals
+# with sampled sizes. A trace is a directory holding one raw little-endian binary file
+# per column plus trace.json with the row count, column dtypes and per-class counts and
+# size moments. Replay maps only the rows of the current block (numpy.memmap windows
+# that are dropped once copied), so memory stays constant however long the trace is.
+
+HEADER = 'trace.json'
+COLUMNS = {'arrival_time': '<f8', 'size': '<f8', 'class': '<i1'}
+
+# Rows per replay block and per converter chunk
+DEFAULT_BLOCK_SIZE = 1 << 16
+DEFAULT_CHUNK_ROWS = 1 << 20
+
+class Trace():
+	def __init__(self, path):
+		self.path = path
+		with open(os.path.join(path, HEADER)) as f:
+			self.header = json.load(f)
+		self.num_jobs = self.header['num_jobs']
+
+	def column(self, name, lo, hi):
+		# Rows [lo, hi) of a column, mapped for as long as the returned array is referenced
+		if hi <= lo:
+			return np.empty(0, dtype=COLUMNS[name])
+		dtype = np.dtype(self.header['columns'][name])
+		return np.memmap(os.path.join(self.path, name + '.bin'), dtype=dtype, mode='r', offset=lo*dtype.itemsize, shape=(hi - lo,))
+
+	def chunks(self, name, start=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+		for lo in range(start, self.num_jobs, chunk_rows):
+			yield self.column(name, lo, min(lo + chunk_rows, self.num_jobs))
+
+	def class_counts(self, start=0):
+		if start == 0:
+			return self.header['class_counts']['1'], self.header['class_counts']['2']
+		counts = [0, 0]
+		for chunk in self.chunks('class', start):
+			counts[0] += int(np.count_nonzero(chunk == 1))
+			counts[1] += len(chunk) - int(np.count_nonzero(chunk == 1))
+		return tuple(counts)
+
+	def duration(self):
+		return self.header['end_time'] - self.header['start_time']
+
+	def class_sizes(self, job_class):
+		moments = self.header['size_moments'][str(job_class)]
+		return TraceSizes(moments[0], moments[1])
+
+# Moments of the sizes of one class over the whole trace, for the closed forms and
+# control variates. Not a distribution: the sizes themselves are replayed, never sampled
+class TraceSizes():
+	def __init__(self, mean, second_moment):
+		self.mean = mean
+		self.second_moment = second_moment
+
+	@property
+	def rate(self):
+		return 1.0/self.mean
+
+	def params(self):
+		return (self.mean, self.second_moment)
+
+	def __repr__(self):
+		return "TraceSizes{}".format(self.params())
+
+	def __eq__(self, other):
+		return type(self) is type(other) and self.params() == other.params()
+
+	def __hash__(self):
+		return hash(repr(self))
+
+# Arrival stream replaying a trace from row start, with time 0 at that row's arrival.
+# With stay_prob, every job keeps its class as its final priority with probability
+# stay_prob and swaps it otherwise (as SwitchingPriorityArrivals), drawn from the routing
+# stream of the seed; the trace itself is the same in every replication. Arriving after
+# the last row raises EOFError, so runs must end within the trace (see replay_np).
+class TraceArrivals(arrivals.BlockArrivals):
+	def __init__(self, path, stay_prob=None, start=0, seed=None, block_size=DEFAULT_BLOCK_SIZE):
+		self.trace = Trace(path)
+		if not 0 <= start < self.trace.num_jobs:
+			raise ValueError("Start row {} outside the trace of {} jobs".format(start, self.trace.num_jobs))
+		super().__init__(self.trace.num_jobs/self.trace.duration(), seed, block_size)
+		self.path = path
+		self.stay_prob = stay_prob
+		self.start = start
+		self.size1 = self.trace.class_sizes(1)
+		self.size2 = self.trace.class_sizes(2)
+		self.time_origin = float(self.trace.column('arrival_time', start, start + 1)[0])
+		self.next_row = start
+
+	def reset(self, seed=None, pair_member=None):
+		super().reset(seed, pair_member)
+		self.next_row = self.start
+		self.time_next_arrive = 0.0
+
+	def draw_block(self, n):
+		lo = self.next_row
+		hi = min(lo + n, self.trace.num_jobs)
+		self.next_row = hi
+		# Arrival time of the job after each job of the block, infinite after the last row
+		following = self.trace.column('arrival_time', lo + 1, min(hi + 1, self.trace.num_jobs)) - self.time_origin
+		if hi == self.trace.num_jobs:
+			following = np.append(following, np.inf)
+		self.next_times = following.tolist()
+		self.sizes = self.trace.column('size', lo, hi).tolist()
+		classes = np.asarray(self.trace.column('class', lo, hi))
+		self.classes = classes.tolist()
+		if self.stay_prob is None:
+			self.final_classes = self.classes
+		else:
+			do_stay = self.streams['routing'].random(hi - lo) < self.stay_prob
+			self.final_classes = np.where(do_stay, classes, 3 - classes).tolist()
+
+	def arrive(self):
+		curr_time = self.time_next_arrive
+		if curr_time == np.inf:
+			raise EOFError("Trace {} exhausted after {} jobs; use a shorter run".format(self.path, self.jid))
+		i = self.next_variates()
+		jid = self.jid
+
+		self.jid += 1
+		self.time_next_arrive = self.next_times[i]
+
+		return jobs.Job(size=self.sizes[i], arrival_time=curr_time, jid=jid, priority=self.classes[i], final_priority=self.final_classes[i])
+
+	def __repr__(self):
+		# Part of the replaying system's params, so cached results are keyed by the trace
+		return "TraceArrivals({!r}, {}, {}, {}, {})".format(os.path.abspath(self.path), self.stay_prob, self.start, self.trace.num_jobs, self.trace.header['end_time'])
+
+def trace_parameters(trace):
+	# Arrival rates and size moments of the two classes over the whole trace
+	count1, count2 = trace.class_counts()
+	return count1/trace.duration(), count2/trace.duration(), trace.class_sizes(1), trace.class_sizes(2)
+
+def run_length(trace, start):
+	# Longest run guaranteed to end within the trace: every job of the rarer class completes
+	return min(trace.class_counts(start))
+
+def replay_np(path, num_jobs_per_run=None, num_runs=1, start=0, num_servers=1, block_size=DEFAULT_BLOCK_SIZE):
+	# Strict NP priority system replaying the trace; by default one run over the whole trace
+	trace = Trace(path)
+	lambda1, lambda2, size1, size2 = trace_parameters(trace)
+	source = TraceArrivals(path, None, start, block_size=block_size)
+	if num_jobs_per_run is None:
+		num_jobs_per_run = run_length(trace, start)
+	return basic_np_system.NPPrioritySystem(num_runs, num_jobs_per_run, lambda1, lambda2, size1, size2, num_servers, source=source)
+
+def replay_switching(path, stay_prob, num_jobs_per_run=None, num_runs=1, start=0, num_servers=1, block_size=DEFAULT_BLOCK_SIZE):
+	# Arrival-switching NP system replaying the trace; replications differ in the routing draws only
+	trace = Trace(path)
+	lambda1, lambda2, size1, size2 = trace_parameters(trace)
+	source = TraceArrivals(path, stay_prob, start, block_size=block_size)
+	if num_jobs_per_run is None:
+		num_jobs_per_run = run_length(trace, start)
+	return switching_np_system.SwitchingNPSystem(num_runs, num_jobs_per_run, lambda1, lambda2, size1, size2, stay_prob, num_servers, source=source)
+
+def convert_csv(csv_path, trace_path, columns=('arrival_time', 'size', 'class'), delimiter=',', chunk_rows=DEFAULT_CHUNK_ROWS):
+	# Converts a CSV of arrival time, size and class (1 or 2) rows, sorted by arrival time,
+	# into a trace directory, chunk_rows lines at a time. A header line, if present, names
+	# the columns; otherwise they are in the order given by columns. Returns the Trace.
+	os.makedirs(trace_path, exist_ok=True)
+	outputs = {name: open(os.path.join(trace_path, name + '.bin'), 'wb') for name in COLUMNS}
+	num_jobs = 0
+	start_time = None
+	last_time = -np.inf
+	class_counts = {1: 0, 2: 0}
+	size_sums = {1: [0.0, 0.0], 2: [0.0, 0.0]}
+	try:
+		with open(csv_path) as f:
+			first = f.readline()
+			fields = [field.strip() for field in first.split(delimiter)]
+			try:
+				[float(field) for field in fields]
+				lines = itertools.chain([first], f)
+			except ValueError:
+				# Header line
+				columns = fields
+				lines = f
+			missing = [name for name in COLUMNS if name not in columns]
+			if missing:
+				raise ValueError("{} has no {} column".format(csv_path, ', '.join(missing)))
+			indices = [list(columns).index(name) for name in COLUMNS]
+
+			while True:
+				chunk = list(itertools.islice(lines, chunk_rows))
+				if not chunk:
+					break
+				table = np.loadtxt(chunk, delimiter=delimiter, usecols=indices, ndmin=2)
+				if len(table) == 0:
+					continue
+				times, sizes, classes = table[:, 0], table[:, 1], table[:, 2].astype(np.int8)
+				if times[0] < last_time or np.any(np.diff(times) < 0):
+					raise ValueError("{}: arrival times are not sorted near job {}".format(csv_path, num_jobs))
+				if np.any(sizes < 0):
+					raise ValueError("{}: negative size near job {}".format(csv_path, num_jobs))
+				if np.any((classes != 1) & (classes != 2)):
+					raise ValueError("{}: classes must be 1 or 2 near job {}".format(csv_path, num_jobs))
+
+				if start_time is None:
+					start_time = float(times[0])
+				last_time = float(times[-1])
+				for job_class in (1, 2):
+					class_sizes = sizes[classes == job_class]
+					class_counts[job_class] += len(class_sizes)
+					size_sums[job_class][0] += float(class_sizes.sum())
+					size_sums[job_class][1] += float(np.dot(class_sizes, class_sizes))
+				times.astype(COLUMNS['arrival_time']).tofile(outputs['arrival_time'])
+				sizes.astype(COLUMNS['size']).tofile(outputs['size'])
+				classes.astype(COLUMNS['class']).tofile(outputs['class'])
+				num_jobs += len(table)
+	finally:
+		for output in outputs.values():
+			output.close()
+	if num_jobs < 2:
+		raise ValueError("{} holds fewer than two jobs".format(csv_path))
+
+	header = {'num_jobs': num_jobs, 'columns': COLUMNS, 'start_time': start_time, 'end_time': last_time,
+			  'class_counts': {str(c): class_counts[c] for c in (1, 2)},
+			  'size_moments': {str(c): [size_sums[c][0]/class_counts[c], size_sums[c][1]/class_counts[c]] if class_counts[c] else [np.nan, np.nan] for c in (1, 2)}}
+	with open(os.path.join(trace_path, HEADER), 'w') as f:
+		json.dump(header, f, indent=1)
+	return Trace(trace_path)
+
+def main():
+	parser = argparse.ArgumentParser(description='Convert a CSV of arrival time, size and class rows into a replayable trace')
+	parser.add_argument('csv', type=str, help = 'CSV file, sorted by arrival time')
+	parser.add_argument('trace', type=str, help = 'Output trace directory')
+	parser.add_argument('--columns', nargs=3, type=str, help = 'Column order when the CSV has no header', default = ['arrival_time', 'size', 'class'])
+	parser.add_argument('--delimiter', type=str, help = 'Field delimiter', default = ',')
+	args = parser.parse_args()
+	trace = convert_csv(args.csv, args.trace, args.columns, args.delimiter)
+	print("Wrote {} jobs over {:.6g} time units to {}".format(trace.num_jobs, trace.duration(), args.trace))
+
+if __name__ == "__main__":
+	main()